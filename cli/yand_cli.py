@@ -6,7 +6,18 @@ import sys
 
 from yand import __version__
 
+from yand import batch
+from yand import container
+from yand import ecc
+from yand import erase
+from yand import farm
+from yand import ftdi_device
+from yand import manifest
+from yand import nand_file
 from yand import nand_interface
+from yand import nbd_server
+from yand import qualify
+from yand import voting
 from yand import errors
 
 def Confirm(message, yes=False):
@@ -75,6 +86,42 @@ class YandCli:
         functional_group.add_argument(
             '--write_pgm', action='store_true',
             help='use a .pgm source image file. Will write the image over and over until the end.')
+        functional_group.add_argument(
+            '--batch', action='store', metavar='JOB_FILE',
+            help=('run all operations listed in JOB_FILE ("-" means stdin) in one session. '
+                  'Each line is one of: "erase [start [end]]", "fill VALUE [start [end]]", '
+                  '"write FILE [start [end]]", "dump FILE [start [end]]", '
+                  '"verify FILE [start [end]]"'))
+        functional_group.add_argument(
+            '--nbd', action='store', type=int, nargs='?', const=nbd_server.NBD_DEFAULT_PORT,
+            metavar='PORT',
+            help=('serve the NAND Flash user data (without OOB) as a read only Network Block '
+                  'Device on localhost (default port: {0:d}). Pages are only read when '
+                  'needed.'.format(nbd_server.NBD_DEFAULT_PORT)))
+        functional_group.add_argument(
+            '--container', action='store', nargs='?', const='zlib',
+            choices=sorted(container.COMPRESSIONS), metavar='COMPRESSION',
+            help=('with -r, write a compressed container instead of a raw dump, where erased '
+                  'pages take almost no room. COMPRESSION is one of {0:s} (default: zlib). '
+                  'See yand_dump.py unpack'.format(', '.join(sorted(container.COMPRESSIONS)))))
+        functional_group.add_argument(
+            '--manifest', action='store', metavar='MANIFEST_FILE',
+            help=('with -r, also write the SHA-256 of every block to MANIFEST_FILE, to check '
+                  'the dump later (see --verify_manifest and yand_dump.py verify)'))
+        functional_group.add_argument(
+            '--verify_manifest', action='store', metavar='MANIFEST_FILE',
+            help='read the blocks listed in MANIFEST_FILE, and report the ones which differ')
+        functional_group.add_argument(
+            '--qualify', action='store', nargs='?', const=qualify.DEFAULT_PATTERNS,
+            metavar='PATTERNS',
+            help=('erase, write and read back every block with each of the comma separated '
+                  'test PATTERNS, among {0:s} (default: all). The random pattern can be given '
+                  'a seed with random:SEED. With -f, write the bit errors and operation times of '
+                  'every block to a CSV file'.format(', '.join(qualify.PATTERNS))))
+        functional_group.add_argument(
+            '--bad_blocks', action='store', metavar='BAD_BLOCKS_FILE',
+            help=('with -e or --qualify, skip the blocks listed in BAD_BLOCKS_FILE (one block '
+                  'number per line), and add the blocks which fail to erase or program to it'))
         functional_group.add_argument(
             '--start', action='store', type=int, default=0,
             help=('Set a start bound for the operation. This bound is included:  range(start, end)'
@@ -95,10 +142,83 @@ class YandCli:
         geometry_group.add_argument(
             '-K', '--number_of_blocks', action='store', help='total number of blocks')
 
+        ecc_group = self.parser.add_argument_group(
+            'ECC options', 'Check and correct pages with their ECC while reading (-r).')
+        ecc_group.add_argument(
+            '--ecc', action='store', metavar='SCHEME',
+            help=('ECC scheme: "hamming" (1 bit per 256 or 512 bytes step, as Linux software '
+                  'ECC), or "bch:STRENGTH" (STRENGTH bits per step). Corrected pages are '
+                  'written to the dump'))
+        ecc_group.add_argument(
+            '--ecc_step', action='store', type=int, default=None,
+            help='user data bytes per ECC step. Default is 256 for hamming, 512 for bch')
+        ecc_group.add_argument(
+            '--ecc_offset', action='store', type=int, default=None,
+            help='offset of the ECC bytes in the OOB. Default is at the end of the OOB')
+        ecc_group.add_argument(
+            '--ecc_layout', action='store', default='raw',
+            help=('page layout: "raw" (user data, then OOB), or "syndrome:STEP_SIZE:ECC_SIZE" '
+                  '(each data step followed by its ECC bytes). Default is "raw"'))
+        ecc_group.add_argument(
+            '--ecc_retries', action='store', type=int, default=3,
+            help='how many times to read again a page with uncorrectable errors. Default is 3')
+
+        voting_group = self.parser.add_argument_group(
+            'Voting options',
+            'Read unstable pages several times while reading (-r), and keep the majority of '
+            'every bit.')
+        voting_group.add_argument(
+            '--vote', action='store', type=int, metavar='READS',
+            help=('vote over READS reads of unstable pages: pages with uncorrectable ECC '
+                  'errors (see --ecc), or which read differently twice (see --double_read)'))
+        voting_group.add_argument(
+            '--double_read', action='store_true',
+            help=('read every page twice to find unstable pages. Always on when voting '
+                  'without --ecc'))
+
+        device_group = self.parser.add_argument_group(
+            'Device options', 'Select which FTDI device(s) to use.')
+        device_group.add_argument(
+            '-D', '--device', action='store',
+            help='use this device: either a USB serial number, or a "bus:address" USB path')
+        device_group.add_argument(
+            '--list_devices', action='store_true', help='list connected FTDI devices and exit')
+        device_group.add_argument(
+            '--farm', action='append', metavar='DEVICE=JOB_FILE',
+            help=('run a batch job file (see --batch) on a device, in its own process. '
+                  'Repeat for every device to drive concurrently. '
+                  'Each device logs to its own file, based on --logfile'))
 
         args = self.parser.parse_args()
         return args
 
+    def ParseGeometry(self, options):
+        """Parses the geometry options.
+
+        Args:
+            options(argparse.NameSpace): the parsed options.
+        Returns:
+            dict: the NandInterface attributes to set.
+        Raises:
+            errors.YandException: if the page size option is invalid.
+        """
+        geometry = {}
+        if options.page_size:
+            try:
+                page_size, oob_size = [
+                    int(opt) for opt in options.page_size.split(',')]
+                geometry['oob_size'] = oob_size
+                geometry['page_size'] = oob_size + page_size
+            except ValueError as value_error:
+                raise errors.YandException(
+                    'Please specify page size as such : "user_data,oob". For example: "2048,128"'
+                    ) from value_error
+        if options.pages_per_block:
+            geometry['pages_per_block'] = int(options.pages_per_block)
+        if options.number_of_blocks:
+            geometry['number_of_blocks'] = int(options.number_of_blocks)
+        return geometry
+
     def Main(self):
         """Main function"""
 
@@ -116,27 +236,34 @@ class YandCli:
                 datefmt='[%Y-%m-%d %H:%M:%S]'
             )
 
-        ftdi_nand = nand_interface.NandInterface()
+        if options.list_devices:
+            for device in ftdi_device.FtdiDevice.ListDevices():
+                print('{0:d}:{1:d}\t{2!s}\t{3!s}'.format(
+                    device.bus, device.address, device.sn, device.description))
+            sys.exit(0)
 
-        if not ftdi_nand:
-            self.parser.print_help()
-            raise errors.YandException('Need a source to read from')
+        geometry = self.ParseGeometry(options)
 
-        # Set up geometry
-        if options.page_size:
-            try:
-                page_size, oob_size = [
-                    int(opt) for opt in options.page_size.split(',')]
-                ftdi_nand.oob_size = oob_size
-                ftdi_nand.page_size = oob_size + page_size
-            except ValueError as value_error:
-                raise errors.YandException(
-                    'Please specify page size as such : "user_data,oob". For example: "2048,128"'
-                    ) from value_error
-        if options.pages_per_block:
-            ftdi_nand.pages_per_block = int(options.pages_per_block)
-        if options.number_of_blocks:
-            ftdi_nand.number_of_blocks = int(options.number_of_blocks)
+        if options.farm:
+            jobs = [farm.FarmJob.FromString(job_string) for job_string in options.farm]
+            if not Confirm(
+                    'About to run {0:d} jobs on {1:s}. Proceed?'.format(
+                        len(jobs), ', '.join(job.device_spec for job in jobs)), options.yes):
+                Die()
+            results = farm.Farm(
+                geometry=geometry, log_filename=options.logfile,
+                write_check=options.write_check).Run(jobs)
+            for device_spec, error in sorted(results.items()):
+                print('{0:s}: {1:s}'.format(device_spec, error or 'OK'))
+            if any(results.values()):
+                Die('Some jobs failed')
+            sys.exit(0)
+
+        ftdi_nand = nand_interface.NandInterface()
+        if options.device:
+            ftdi_nand.ftdi_device = ftdi_device.FtdiDevice.FromSpec(options.device)
+        for attribute, value in geometry.items():
+            setattr(ftdi_nand, attribute, value)
 
         ftdi_nand.Setup()
         infos = 'Chip info: '+ftdi_nand.GetInfos()
@@ -145,7 +272,38 @@ class YandCli:
         if not options.file == '-':
             print(infos)
 
-        if options.read:
+        if options.batch:
+            if options.batch == '-':
+                if not options.yes:
+                    Die('Reading a job file from stdin needs confirmations disabled (hint: -y)')
+                operations = batch.ParseJobFile(sys.stdin)
+            else:
+                with open(options.batch, 'r', encoding='utf-8') as job_file:
+                    operations = batch.ParseJobFile(job_file)
+            if not Confirm(
+                    'About to run {0:d} operations from {1:s} on NAND Flash. Proceed?'.format(
+                        len(operations), options.batch), options.yes):
+                Die()
+            logging.debug(
+                'Starting a batch operation with {0:d} operations (write check is {1!s})'.format(
+                    len(operations), options.write_check))
+            runner = batch.BatchRunner(ftdi_nand, write_check=options.write_check)
+            if not runner.Run(operations):
+                Die('Some verify operations failed, see {0:s}'.format(options.logfile))
+        elif options.nbd:
+            server = nbd_server.NbdServer(
+                nand_file.NandFile(ftdi_nand, include_oob=False),
+                address=('127.0.0.1', options.nbd))
+            print('Serving NAND Flash on nbd://127.0.0.1:{0:d}/{1:s}'.format(
+                options.nbd, server.export_name))
+            print('Hit Ctrl-C to quit')
+            logging.debug('Starting NBD server on port {0:d}'.format(options.nbd))
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                pass
+            server.server_close()
+        elif options.read:
             if not options.file:
                 Die('Need a destination file (hint: -f)')
             if os.path.exists(options.file):
@@ -157,8 +315,43 @@ class YandCli:
                 'Starting a read operation (start={0:d}, end={1:d}, destination={2:s})'.format(
                     options.start, options.end or -1, options.file))
 
-            ftdi_nand.DumpFlashToFile(options.file, start_page=options.start, end_page=options.end)
+            ecc_engine = None
+            if options.ecc:
+                ecc_engine = ecc.EccEngine.FromString(
+                    options.ecc, ftdi_nand.page_size, ftdi_nand.oob_size,
+                    step_size=options.ecc_step, layout_string=options.ecc_layout,
+                    ecc_offset=options.ecc_offset)
+
+            page_voter = None
+            if options.vote:
+                page_voter = voting.PageVoter(
+                    ftdi_nand, reads=options.vote,
+                    double_read=options.double_read or not ecc_engine)
+
+            uncorrectable_pages = ftdi_nand.DumpFlashToFile(
+                options.file, start_page=options.start, end_page=options.end,
+                ecc_engine=ecc_engine, ecc_retries=options.ecc_retries, page_voter=page_voter,
+                container_compression=options.container, manifest_path=options.manifest)
+            if page_voter and page_voter.instability and options.file != '-':
+                print('{0:d} unstable pages were voted on, see {1:s}'.format(
+                    len(page_voter.instability), options.logfile))
+            if uncorrectable_pages:
+                Die('{0:d} pages have uncorrectable errors, see {1:s}'.format(
+                    uncorrectable_pages, options.logfile))
+        elif options.verify_manifest:
+            block_manifest = manifest.Manifest.Load(options.verify_manifest)
+            logging.debug('Starting a manifest verify operation with {0:s}'.format(
+                options.verify_manifest))
+            differing_blocks = ftdi_nand.CompareManifestToFlash(block_manifest)
+            if differing_blocks:
+                Die('{0:d} blocks differ: {1:s}'.format(
+                    len(differing_blocks), ', '.join(str(block) for block in differing_blocks)))
+            print('All {0:d} blocks match the manifest'.format(len(block_manifest.hashes)))
         elif options.write:
+            if not options.file:
+                Die('Need a source file (hint: -f)')
+            if options.file == '-' and not options.yes:
+                Die('Reading a dump from stdin needs confirmations disabled (hint: -y)')
             if not Confirm(
                     'Reminder: '
                     'You need to erase the entire flash with -e for this to work as expected\n\n'
@@ -168,14 +361,56 @@ class YandCli:
             logging.debug(
                 'Starting an Dump write operation with file {0:s} (write check is {1!s})'.format(
                     options.file, options.write_check))
-            ftdi_nand.WriteFileToFlash(options.file, write_check=options.write_check)
+            ftdi_nand.WriteFileToFlash(
+                options.file, start_page=options.start, end_page=options.end,
+                write_check=options.write_check)
+        elif options.qualify:
+            patterns = qualify.ParsePatterns(options.qualify)
+            if not Confirm(
+                    'About to erase and write {0:d} test patterns to NAND Flash blocks. '
+                    'Proceed?'.format(len(patterns)), options.yes):
+                Die()
+            logging.debug(
+                'Starting a qualify operation (start={0:d}, end={1:d}, patterns={2:s})'.format(
+                    options.start, options.end or -1, options.qualify))
+            bad_blocks = set()
+            if options.bad_blocks:
+                bad_blocks = erase.LoadBadBlocks(options.bad_blocks)
+            results = ftdi_nand.Qualify(
+                patterns, start_block=options.start, end_block=options.end,
+                skip_blocks=bad_blocks)
+            if options.file:
+                qualify.WriteReport(options.file, results)
+            failed_blocks = set()
+            for pattern, pattern_results in results:
+                pattern_failed_blocks = {
+                    int(result['block']) for result in pattern_results
+                    if qualify.IsBadBlock(result)}
+                failed_blocks |= pattern_failed_blocks
+                print('{0!s}: {1:d} bit errors in {2:d} blocks, {3:d} failed blocks'.format(
+                    pattern, int(pattern_results['bit_errors'].sum()),
+                    int((pattern_results['bit_errors'] > 0).sum()), len(pattern_failed_blocks)))
+            if failed_blocks:
+                if options.bad_blocks:
+                    erase.SaveBadBlocks(options.bad_blocks, bad_blocks | failed_blocks)
+                Die('{0:d} blocks failed to erase or program: {1:s}'.format(
+                    len(failed_blocks), ', '.join(str(block) for block in sorted(failed_blocks))))
         elif options.erase:
             if not Confirm('About to erase NAND Flash blocks. Proceed?', options.yes):
                 Die()
             logging.debug(
                 'Starting an erase operation (start={0:d}, end={1:d})'.format(
                     options.start, options.end or -1))
-            ftdi_nand.Erase(start_block=options.start, end_block=options.end)
+            bad_blocks = set()
+            if options.bad_blocks:
+                bad_blocks = erase.LoadBadBlocks(options.bad_blocks)
+            failed_blocks = ftdi_nand.Erase(
+                start_block=options.start, end_block=options.end, skip_blocks=bad_blocks)
+            if failed_blocks:
+                if options.bad_blocks:
+                    erase.SaveBadBlocks(options.bad_blocks, bad_blocks | set(failed_blocks))
+                Die('{0:d} blocks failed to erase: {1:s}'.format(
+                    len(failed_blocks), ', '.join(str(block) for block in failed_blocks)))
         elif options.write_value is not None:
             if not Confirm(
                     'About to write value {0:d} in NAND Flash. Proceed?'.format(
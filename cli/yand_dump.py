@@ -0,0 +1,375 @@
+"""CLI tool working on dump files, offline."""
+import argparse
+import logging
+import os
+import sys
+
+import numpy
+from tqdm import tqdm
+
+from yand import __version__
+
+from yand import analysis
+from yand import container
+from yand import ecc
+from yand import errors
+from yand import layout
+from yand import manifest
+
+
+def Die(message='Aborting', error_code=1):
+    """Prints a message and quits."""
+    print(message)
+    sys.exit(error_code)
+
+
+def ParsePageSize(page_size):
+    """Parses a page size option.
+
+    Args:
+        page_size(str): the page size and OOB size in bytes, with the format: "2048,128".
+    Returns:
+        tuple(int, int): the full page size (user data + OOB) and the OOB size.
+    Raises:
+        errors.YandException: if the page size is invalid.
+    """
+    try:
+        user_size, oob_size = [int(opt) for opt in page_size.split(',')]
+    except ValueError as value_error:
+        raise errors.YandException(
+            'Please specify page size as such : "user_data,oob". For example: "2048,128"'
+            ) from value_error
+    return user_size + oob_size, oob_size
+
+
+class YandDumpCli:
+    """Tool to work on dumps made with the Yand module"""
+
+    def __init__(self):
+        """Initializes a YandDumpCli object."""
+        self.parser = None
+
+    def ParseArguments(self):
+        """Parses arguments.
+
+        Returns:
+            argparse.NameSpace: the parsed options.
+        """
+        self.parser = argparse.ArgumentParser()
+        self.parser.add_argument('-V', '--version', action='store_true', help='show version')
+        self.parser.add_argument(
+            '-l', '--logfile', action='store', default=None,
+            help='log debug information to the specified file')
+        self.parser.add_argument(
+            '-P', '--page_size', action='store',
+            help='page size and OOB size in bytes, with the format: "2048,128"')
+        self.parser.add_argument(
+            '-j', '--jobs', action='store', type=int, default=None,
+            help='number of worker processes. Default is the number of CPUs')
+
+        subparsers = self.parser.add_subparsers(dest='command', title='Commands')
+
+        analyze_parser = subparsers.add_parser(
+            'analyze', help=('compute entropy, erased/zeroed ratios and byte histograms of '
+                             'every page, and write them in an index file'))
+        analyze_parser.add_argument('dump', help='the raw dump file')
+        analyze_parser.add_argument(
+            '-o', '--output', action='store',
+            help='index file to write. Default is the dump file name, with a .idx extension')
+
+        convert_parser = subparsers.add_parser(
+            'convert', help='extract user data or OOB bytes from a dump, or change its layout')
+        convert_parser.add_argument('dump', help='the raw dump file')
+        convert_parser.add_argument('output', help='the converted file to write')
+        convert_parser.add_argument(
+            '-m', '--mode', action='store', choices=layout.MODES, default=layout.MODE_DATA,
+            help=('"data": keep only user data, "oob": keep only OOB bytes, "relayout": '
+                  'change the page layout (see --to). Default is "data"'))
+        convert_parser.add_argument(
+            '--from', action='store', dest='from_layout', default='raw',
+            help=('layout of the dump pages: "raw" (user data, then OOB), or '
+                  '"syndrome:STEP_SIZE:ECC_SIZE" (each data step followed by its ECC bytes, '
+                  'then the remaining OOB bytes). Default is "raw"'))
+        convert_parser.add_argument(
+            '--to', action='store', dest='to_layout', default='raw',
+            help='layout of the output pages, for the relayout mode. Default is "raw"')
+
+        ecc_parser = subparsers.add_parser(
+            'ecc', help='check the ECC of every page, and optionally write a corrected dump')
+        ecc_parser.add_argument('dump', help='the raw dump file')
+        ecc_parser.add_argument(
+            '-o', '--output', action='store', help='where to write the corrected dump')
+        ecc_parser.add_argument(
+            '-s', '--scheme', action='store', required=True,
+            help=('ECC scheme: "hamming" (1 bit per 256 or 512 bytes step, as Linux software '
+                  'ECC), or "bch:STRENGTH" (STRENGTH bits per step)'))
+        ecc_parser.add_argument(
+            '--step', action='store', type=int, default=None,
+            help='user data bytes per ECC step. Default is 256 for hamming, 512 for bch')
+        ecc_parser.add_argument(
+            '--offset', action='store', type=int, default=None,
+            help='offset of the ECC bytes in the OOB. Default is at the end of the OOB')
+        ecc_parser.add_argument(
+            '--layout', action='store', default='raw',
+            help=('page layout: "raw" (user data, then OOB), or "syndrome:STEP_SIZE:ECC_SIZE" '
+                  '(each data step followed by its ECC bytes). Default is "raw"'))
+
+        pack_parser = subparsers.add_parser(
+            'pack', help='compress a raw dump into a container, with random access to pages')
+        pack_parser.add_argument('dump', help='the raw dump file')
+        pack_parser.add_argument('output', help='the container to write')
+        pack_parser.add_argument(
+            '-c', '--compression', action='store', choices=sorted(container.COMPRESSIONS),
+            default='zlib', help='compression algorithm. Default is zlib')
+        pack_parser.add_argument(
+            '--level', action='store', type=int, default=None, help='compression level')
+        pack_parser.add_argument(
+            '--chunk_pages', action='store', type=int, default=64,
+            help='number of pages compressed together. Default is 64')
+
+        unpack_parser = subparsers.add_parser(
+            'unpack', help='extract pages of a container to a raw dump')
+        unpack_parser.add_argument('container', help='the container file')
+        unpack_parser.add_argument('output', nargs='?', help='the raw dump to write')
+        unpack_parser.add_argument(
+            '--start', action='store', type=int, default=0,
+            help='first page to extract. Default is 0')
+        unpack_parser.add_argument(
+            '--end', action='store', type=int, default=None,
+            help='page to stop extracting at (excluded). Default is to the end')
+        unpack_parser.add_argument(
+            '--verify', action='store_true',
+            help='only check the CRC32 of every chunk, don\'t write anything')
+
+        manifest_parser = subparsers.add_parser(
+            'manifest', help='write the SHA-256 of every block of a dump')
+        manifest_parser.add_argument('dump', help='the raw dump file')
+        manifest_parser.add_argument('output', help='the manifest to write')
+        manifest_parser.add_argument(
+            '-B', '--pages_per_block', action='store', type=int, required=True,
+            help='number of pages per block')
+        manifest_parser.add_argument(
+            '--start', action='store', type=int, default=0,
+            help='number of the first page of the dump. Default is 0')
+
+        verify_parser = subparsers.add_parser(
+            'verify', help='check a dump against a manifest, and list the blocks which differ')
+        verify_parser.add_argument('dump', help='the raw dump file')
+        verify_parser.add_argument('manifest', help='the manifest file')
+
+        args = self.parser.parse_args()
+        return args
+
+    def GetPageSize(self, options):
+        """Returns the page size and OOB size options.
+
+        Args:
+            options(argparse.NameSpace): the parsed options.
+        Returns:
+            tuple(int, int): the full page size (user data + OOB) and the OOB size.
+        """
+        if not options.page_size:
+            self.parser.print_usage()
+            Die('Need a page size (hint: -P)')
+        return ParsePageSize(options.page_size)
+
+    def Analyze(self, options):
+        """Runs the analyze command.
+
+        Args:
+            options(argparse.NameSpace): the parsed options.
+        """
+        page_size, oob_size = self.GetPageSize(options)
+        index_path = options.output or os.path.splitext(options.dump)[0] + '.idx'
+        total_pages = os.stat(options.dump).st_size // page_size
+        logging.debug('Analyzing {0:s} ({1:d} pages) to {2:s}'.format(
+            options.dump, total_pages, index_path))
+        with tqdm(total=total_pages, unit='page', dynamic_ncols=True) as progress_bar:
+            class_counts = analysis.AnalyzeDump(
+                options.dump, page_size, oob_size, index_path, workers=options.jobs,
+                progress_callback=progress_bar.update)
+        print('Wrote {0:s}'.format(index_path))
+        for page_class, name in sorted(analysis.CLASS_NAMES.items()):
+            print('{0:s}: {1:d} pages ({2:.1f}%)'.format(
+                name, class_counts[page_class],
+                100 * class_counts[page_class] / max(total_pages, 1)))
+
+    def Convert(self, options):
+        """Runs the convert command.
+
+        Args:
+            options(argparse.NameSpace): the parsed options.
+        """
+        page_size, oob_size = self.GetPageSize(options)
+        source_layout = layout.PageLayout.FromString(options.from_layout, page_size, oob_size)
+        destination_layout = None
+        if options.mode == layout.MODE_RELAYOUT:
+            destination_layout = layout.PageLayout.FromString(
+                options.to_layout, page_size, oob_size)
+        converter = layout.LayoutConverter(
+            source_layout, options.mode, destination_layout=destination_layout)
+        total_pages = os.stat(options.dump).st_size // page_size
+        logging.debug('Converting {0:s} to {1:s} (mode: {2:s})'.format(
+            options.dump, options.output, options.mode))
+        with tqdm(total=total_pages, unit='page', dynamic_ncols=True) as progress_bar:
+            layout.ConvertDump(
+                options.dump, options.output, converter, workers=options.jobs,
+                progress_callback=progress_bar.update)
+        print('Wrote {0:s}'.format(options.output))
+
+    def CheckEcc(self, options):
+        """Runs the ecc command.
+
+        Args:
+            options(argparse.NameSpace): the parsed options.
+        """
+        page_size, oob_size = self.GetPageSize(options)
+        engine = ecc.EccEngine.FromString(
+            options.scheme, page_size, oob_size, step_size=options.step,
+            layout_string=options.layout, ecc_offset=options.offset)
+        total_pages = os.stat(options.dump).st_size // page_size
+        logging.debug('Checking ECC of {0:s} ({1:d} pages, scheme {2:s})'.format(
+            options.dump, total_pages, options.scheme))
+        with tqdm(total=total_pages, unit='page', dynamic_ncols=True) as progress_bar:
+            statuses = ecc.CorrectDump(
+                options.dump, engine, destination_path=options.output, workers=options.jobs,
+                progress_callback=progress_bar.update)
+
+        for page_number in numpy.flatnonzero(statuses['corrected'] | statuses['uncorrectable']):
+            logging.debug('Page {0:d}: {1:d} bitflips corrected, {2:d} uncorrectable steps'.format(
+                page_number, int(statuses['corrected'][page_number]),
+                int(statuses['uncorrectable'][page_number])))
+        if options.output:
+            print('Wrote {0:s}'.format(options.output))
+        print('erased: {0:d} pages'.format(int(statuses['erased'].sum())))
+        print('corrected: {0:d} pages ({1:d} bitflips)'.format(
+            int((statuses['corrected'] > 0).sum()), int(statuses['corrected'].sum())))
+        print('uncorrectable: {0:d} pages'.format(int((statuses['uncorrectable'] > 0).sum())))
+
+    def Pack(self, options):
+        """Runs the pack command.
+
+        Args:
+            options(argparse.NameSpace): the parsed options.
+        """
+        page_size, oob_size = self.GetPageSize(options)
+        total_pages = os.stat(options.dump).st_size // page_size
+        logging.debug('Packing {0:s} to {1:s} ({2:s})'.format(
+            options.dump, options.output, options.compression))
+        with tqdm(total=total_pages, unit='page', dynamic_ncols=True) as progress_bar:
+            container.PackDump(
+                options.dump, options.output, page_size, oob_size,
+                pages_per_chunk=options.chunk_pages, compression=options.compression,
+                level=options.level, workers=options.jobs,
+                progress_callback=progress_bar.update)
+        print('Wrote {0:s} ({1:.1f}% of the dump size)'.format(
+            options.output,
+            100 * os.stat(options.output).st_size / max(os.stat(options.dump).st_size, 1)))
+
+    def Unpack(self, options):
+        """Runs the unpack command.
+
+        Args:
+            options(argparse.NameSpace): the parsed options.
+        """
+        with container.ContainerReader(options.container) as reader:
+            if options.verify:
+                corrupted_chunks = reader.Verify()
+                for chunk_number in corrupted_chunks:
+                    print('Chunk {0:d} (pages {1:d} to {2:d}) is corrupted'.format(
+                        chunk_number, chunk_number * reader.pages_per_chunk,
+                        (chunk_number + 1) * reader.pages_per_chunk - 1))
+                if corrupted_chunks:
+                    Die()
+                print('{0:s} is OK'.format(options.container))
+                return
+            if not options.output:
+                Die('Need a destination file')
+            end_page = min(options.end or reader.total_pages, reader.total_pages)
+            logging.debug('Extracting pages {0:d} to {1:d} of {2:s} to {3:s}'.format(
+                options.start, end_page, options.container, options.output))
+            with tqdm(
+                    total=max(end_page - options.start, 0), unit='page',
+                    dynamic_ncols=True) as progress_bar:
+                reader.ExtractToFile(
+                    options.output, start_page=options.start, end_page=end_page,
+                    progress_callback=progress_bar.update)
+        print('Wrote {0:s}'.format(options.output))
+
+    def WriteManifest(self, options):
+        """Runs the manifest command.
+
+        Args:
+            options(argparse.NameSpace): the parsed options.
+        """
+        page_size, _ = self.GetPageSize(options)
+        total_pages = os.stat(options.dump).st_size // page_size
+        logging.debug('Hashing {0:s} to {1:s}'.format(options.dump, options.output))
+        with tqdm(
+                total=-(-(total_pages + options.start % options.pages_per_block) //
+                        options.pages_per_block),
+                unit='block', dynamic_ncols=True) as progress_bar:
+            block_manifest = manifest.HashDump(
+                options.dump, page_size, options.pages_per_block, start_page=options.start,
+                workers=options.jobs, progress_callback=progress_bar.update)
+        block_manifest.Save(options.output)
+        print('Wrote {0:s}'.format(options.output))
+
+    def Verify(self, options):
+        """Runs the verify command.
+
+        Args:
+            options(argparse.NameSpace): the parsed options.
+        """
+        block_manifest = manifest.Manifest.Load(options.manifest)
+        logging.debug('Checking {0:s} against {1:s}'.format(options.dump, options.manifest))
+        with tqdm(
+                total=len(block_manifest.hashes), unit='block', dynamic_ncols=True) as progress_bar:
+            differing_blocks = manifest.VerifyDump(
+                options.dump, block_manifest, workers=options.jobs,
+                progress_callback=progress_bar.update)
+        for block in differing_blocks:
+            logging.debug('block {0:d} differs from manifest'.format(block))
+        if differing_blocks:
+            Die('{0:d} blocks differ: {1:s}'.format(
+                len(differing_blocks), ', '.join(str(block) for block in differing_blocks)))
+        print('All {0:d} blocks match the manifest'.format(len(block_manifest.hashes)))
+
+    def Main(self):
+        """Main function"""
+
+        options = self.ParseArguments()
+
+        if options.version:
+            print('{0:s}: {1:s}'.format(__file__, __version__))
+            sys.exit(0)
+
+        if options.logfile:
+            logging.basicConfig(
+                filename=options.logfile,
+                level=logging.DEBUG,
+                format='%(asctime)s %(message)s',
+                datefmt='[%Y-%m-%d %H:%M:%S]'
+            )
+
+        if options.command == 'analyze':
+            self.Analyze(options)
+        elif options.command == 'convert':
+            self.Convert(options)
+        elif options.command == 'ecc':
+            self.CheckEcc(options)
+        elif options.command == 'pack':
+            self.Pack(options)
+        elif options.command == 'unpack':
+            self.Unpack(options)
+        elif options.command == 'manifest':
+            self.WriteManifest(options)
+        elif options.command == 'verify':
+            self.Verify(options)
+        else:
+            self.parser.print_help()
+
+
+if __name__ == "__main__":
+    C = YandDumpCli()
+    C.Main()
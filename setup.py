@@ -24,6 +24,7 @@ setup(
     license='Apache License, Version 2.0',
     packages=find_packages(exclude=['cli']),
     install_requires=[
+        'numpy',
         'pyftdi',
         'tqdm',
     ],
@@ -32,5 +33,5 @@ setup(
         'Operating System :: OS Independent',
         'Programming Language :: Python',
     ],
-    scripts=['cli/yand_cli.py']
+    scripts=['cli/yand_cli.py', 'cli/yand_dump.py']
 )
@@ -0,0 +1,44 @@
+"""Build a tiles pyramid of a dump, to be served by viz_http.py."""
+import argparse
+import os
+import sys
+
+from tqdm import tqdm
+
+from yand import tiles
+
+parser = argparse.ArgumentParser()
+parser.add_argument('-f', '--dump', action='store', required=True, help='Raw dump file.')
+parser.add_argument(
+    '-d', '--dir', action='store', required=True, help='Where to write tiles.')
+parser.add_argument(
+    '-s', '--split', type=int, action='store',
+    help='Number of splits (columns).', default=8)
+parser.add_argument(
+    '-p', '--page_size', type=int, action='store', required=True,
+    help='Length of a page (userdata + oob)')
+parser.add_argument(
+    '-z', '--extra_zoom', type=int, action='store', default=1,
+    help='Number of zoom levels to build after the one where one byte is one pixel.')
+parser.add_argument(
+    '-j', '--jobs', type=int, action='store', default=None,
+    help='Number of worker processes. Default is the number of CPUs.')
+args = parser.parse_args()
+
+if not os.path.isfile(args.dump):
+    print('{0:s} is not a file'.format(args.dump))
+    sys.exit(1)
+
+builder = tiles.PyramidBuilder(
+    args.dump, args.page_size, args.dir, splits=args.split, extra_zoom=args.extra_zoom,
+    workers=args.jobs)
+print('Building {0:d} tiles ({1:d} zoom levels) in {2:s}'.format(
+    builder.GetTotalTiles(), builder.max_zoom + 1, args.dir))
+with tqdm(total=builder.GetTotalTiles(), unit='tile', dynamic_ncols=True) as progress_bar:
+    tiles_count, elapsed = builder.Build(progress_callback=progress_bar.update)
+print('Wrote {0:d} tiles in {1:.1f}s ({2:.1f} tiles/s)'.format(
+    tiles_count, elapsed, tiles_count / max(elapsed, 0.001)))
+print('Serve them with:')
+print('python3 {0:s} -d {1:s} -s {2:d} -t {3:d} -p {4:d}'.format(
+    os.path.join(os.path.dirname(__file__), 'viz_http.py'), args.dir, args.split,
+    os.stat(args.dump).st_size, args.page_size))
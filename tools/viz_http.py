@@ -1,31 +1,102 @@
-"""Serve pyramid files over HTTP."""
+"""Serve pyramid files over HTTP.
+
+Tiles are either read from a directory, or rendered on demand from the raw dump file.
+"""
 import argparse
+import email.utils
 import os
 import sys
 
-from http.server import BaseHTTPRequestHandler, HTTPServer
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from yand import analysis
+from yand import tiles
 
 parser = argparse.ArgumentParser()
-parser.add_argument('-d', '--dir', action='store', required=True, help='Tiles directory.')
 parser.add_argument(
-    '-s', '--split', type=int, action='store', required=True,
+    '-d', '--dir', action='store',
+    help=('Tiles directory. When serving a dump file, this is where rendered tiles are '
+          'cached.'))
+parser.add_argument(
+    '-f', '--dump', action='store',
+    help='Raw dump file to render tiles from, on demand. No need to pre-build tiles.')
+parser.add_argument(
+    '-s', '--split', type=int, action='store',
     help='Number of splits (columns).', default=8)
 parser.add_argument(
-    '-t', '--total_size', type=int, action='store', required=True,
+    '-t', '--total_size', type=int, action='store',
     help='Total file of the original dump file')
 parser.add_argument(
     '-p', '--page_size', type=int, action='store', required=True,
     help='Length of a page (userdata + oob)')
+parser.add_argument(
+    '-i', '--index', action='store',
+    help='Page index, from "yand_dump.py analyze", to show page classes as an overlay.')
+parser.add_argument(
+    '--cache_tiles', type=int, action='store', default=4096,
+    help='Number of rendered tiles to keep in memory.')
 args = parser.parse_args()
 
 tiles_dir = args.dir
 nb_splits = args.split
-total_size = args.total_size
 page_size = args.page_size
-if not os.path.isdir(tiles_dir):
-    print('{0:s} is not a directory'.format(tiles_dir))
-    sys.exit(1)
-map_id = os.path.basename(os.path.normpath(tiles_dir))
+dump_image = None
+dump_stat = None
+tile_cache = None
+if args.dump:
+    if not os.path.isfile(args.dump):
+        print('{0:s} is not a file'.format(args.dump))
+        sys.exit(1)
+    dump_image = tiles.DumpImage(args.dump, page_size, splits=nb_splits)
+    tile_cache = tiles.TileCache(
+        lambda z, y, x: tiles.EncodePNG(dump_image.RenderTile(z, y, x)),
+        max_tiles=args.cache_tiles, cache_dir=tiles_dir)
+    total_size = dump_image.total_size
+    dump_stat = os.stat(args.dump)
+    map_id = os.path.basename(args.dump)
+    tiles_extension = 'png'
+    max_zoom = max(9, dump_image.max_zoom + 1)
+else:
+    if not tiles_dir or not args.total_size:
+        parser.error('Need either a dump file (-f), or a tiles directory (-d) and total size (-t)')
+    if not os.path.isdir(tiles_dir):
+        print('{0:s} is not a directory'.format(tiles_dir))
+        sys.exit(1)
+    total_size = args.total_size
+    map_id = os.path.basename(os.path.normpath(tiles_dir))
+    # build_pyramid.py writes PNG tiles, vips JPEG ones.
+    if os.path.isfile(os.path.join(tiles_dir, '0', '0', '0.png')):
+        tiles_extension = 'png'
+    else:
+        tiles_extension = 'jpg'
+    max_zoom = 9
+
+overlay_id = '{0:s}-overlay'.format(map_id)
+overlay_cache = None
+index_stat = None
+OVERLAY_JS = ''
+if args.index:
+    index_stat = os.stat(args.index)
+    page_index = analysis.PageIndex(args.index)
+    if page_index.page_size != page_size:
+        print('Index page size ({0:d}) does not match page size ({1:d})'.format(
+            page_index.page_size, page_size))
+        sys.exit(1)
+    overlay_image = tiles.OverlayImage(page_index.GetPageColors(), page_size, splits=nb_splits)
+    overlay_cache = tiles.TileCache(
+        lambda z, y, x: tiles.EncodePNG(overlay_image.RenderTile(z, y, x)),
+        max_tiles=args.cache_tiles)
+    legend = ', '.join(
+        '<span style="color: rgb({1:d},{2:d},{3:d})">{0:s}</span>'.format(
+            name, *analysis.CLASS_COLORS[page_class][:3])
+        for page_class, name in sorted(analysis.CLASS_NAMES.items()))
+    OVERLAY_JS = """
+        var overlay = L.tileLayer('/%s/{z}/{y}/{x}.png',{
+            noWrap: true,
+        }).addTo(map);
+        L.control.layers({}, {'Page classes': overlay}).addTo(map);
+        document.getElementById('legend').innerHTML = 'Page classes: %s';
+"""%(overlay_id, legend)
 
 MAIN_HTML = """
 <!DOCTYPE html>
@@ -38,6 +109,7 @@ MAIN_HTML = """
       Lng at right of first col: <input type="text" id="onecol"><br>
       Lat at bottom of first col: <input type="text" id="maxlat"><br>
     </div>
+    <div id="legend"></div>
     <script>
     function getInputVal(input_id) {return parseFloat(document.getElementById(input_id).value) || -1};
     function latlng_to_page_num(latlng, nb_cols, total_size, page_size) {
@@ -77,61 +149,189 @@ MAIN_HTML = """
     };
 
         var map = L.map('mapid', {
-            maxZoom: 9,
+            maxZoom: %d,
             zoomControl: false,
             crs: L.CRS.Simple,
             attributionControl: false,
         }).setView([0, 0], 0);
-        var layer = L.tileLayer('/%s/{z}/{y}/{x}.jpg',{
+        var layer = L.tileLayer('/%s/{z}/{y}/{x}.%s',{
             noWrap: true,
         }).addTo(map);
+%s
         map.on('click', onMapClick);
     </script>
 </body></html>
-"""%(nb_splits, total_size, page_size, map_id)
+"""%(nb_splits, total_size, page_size, max_zoom, map_id, tiles_extension, OVERLAY_JS)
+
+# Tiles never change for a given dump, let browsers keep them.
+TILES_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+CONTENT_TYPES = {
+    '.jpg': 'image/jpeg',
+    '.png': 'image/png',
+}
+
 
 class RequestHandler(BaseHTTPRequestHandler):
     """Class to handle http requests."""
 
+    # Allows keep-alive, as every response has a Content-Length.
+    protocol_version = 'HTTP/1.1'
+
     def do_GET(self):  # pylint: disable=invalid-name
         """Handle GET requests"""
-        content = self.HandleHTTP()
-        self.wfile.write(content)
+        self.HandleHTTP()
+
+    def do_HEAD(self):  # pylint: disable=invalid-name
+        """Handle HEAD requests"""
+        self.HandleHTTP(send_body=False)
+
+    def IsNotModified(self, etag, mtime):
+        """Whether the client already has the current version of a resource.
 
-    def HandleHTTP(self):
-        """Actually handle the request for tiles & such..."""
-        res = b'ERROR'
-        if self.path in ['/', '/index.html']:
+        Args:
+            etag(str): the ETag of the resource.
+            mtime(float): when the resource was last modified.
+        Returns:
+            bool: True if a 304 response can be sent.
+        """
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match:
+            return etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match == '*'
+        if_modified_since = self.headers.get('If-Modified-Since')
+        if if_modified_since:
+            try:
+                since = email.utils.parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+            return int(mtime) <= since
+        return False
+
+    def SendTileHeaders(self, etag, mtime, content_type=None, length=None):
+        """Sends the response status & headers for a tile.
+
+        Args:
+            etag(str): the ETag of the tile.
+            mtime(float): when the tile was last modified.
+            content_type(str): the MIME type of the tile. None sends a 304 Not Modified.
+            length(int): the size of the tile, if known.
+        """
+        self.send_response(304 if content_type is None else 200)
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', email.utils.formatdate(mtime, usegmt=True))
+        self.send_header('Cache-Control', TILES_CACHE_CONTROL)
+        if content_type is not None:
+            self.send_header('Content-Type', content_type)
+        if length is not None:
+            self.send_header('Content-Length', str(length))
+        self.end_headers()
+
+    def SendRenderedTile(self, cache, source_stat, z, y, x, send_body=True):
+        """Sends a tile rendered on demand.
+
+        The tile is only rendered when its content is sent.
+
+        Args:
+            cache(tiles.TileCache): the cache rendering the tiles.
+            source_stat(os.stat_result): stat of the file tiles are rendered from.
+            z(str): the zoom level.
+            y(str): the tile row.
+            x(str): the tile column, with its extension.
+            send_body(bool): whether to send the response body.
+        """
+        x, ext = os.path.splitext(x)
+        if ext != '.png':
+            self.send_error(404, 'File Not Found: %s' % self.path)
+            return
+        etag = '"{0:x}-{1:x}-{2:s}-{3:s}-{4:s}"'.format(
+            source_stat.st_size, source_stat.st_mtime_ns, z, y, x)
+        if self.IsNotModified(etag, source_stat.st_mtime):
+            self.SendTileHeaders(etag, source_stat.st_mtime)
+        elif not send_body:
+            # The length is only sent if the tile is already rendered.
+            self.SendTileHeaders(
+                etag, source_stat.st_mtime, content_type='image/png',
+                length=cache.GetTileSize(int(z), int(y), int(x)))
+        else:
+            tile = cache.GetTile(int(z), int(y), int(x))
+            self.SendTileHeaders(
+                etag, source_stat.st_mtime, content_type='image/png', length=len(tile))
+            self.wfile.write(tile)
+
+    def HandleHTTP(self, send_body=True):
+        """Actually handle the request for tiles & such...
+
+        Args:
+            send_body(bool): whether to send the response body.
+        """
+        path = self.path.split('?', 1)[0]
+        if path in ['/', '/index.html']:
+            content = MAIN_HTML.encode()
             self.send_response(200)
-            self.send_header('Content-type', 'text/html')
+            self.send_header('Content-Type', 'text/html')
+            self.send_header('Content-Length', str(len(content)))
             self.end_headers()
-            res = MAIN_HTML.encode()
-        elif self.path.startswith('/{0:s}/'.format(map_id)):
-            _, _, z, y, x = self.path.split('/')
-            tile = os.path.join(args.dir, z, y, x)
-            if os.path.isfile(tile):
-                self.send_response(200)
-                ext = os.path.splitext(tile)
-                if ext == '.png':
-                    self.send_header('Content-type', 'image/png')
-                elif ext == '.jpg':
-                    self.send_header('Content-type', 'image/jpeg')
-                self.end_headers()
-                with open(tile, 'rb') as f:
-                    res = f.read()
-            else:
-                self.send_error(404, 'File Not Found: %s' % self.path)
-        else:
-            self.send_error(404, 'File Not Found: %s' % self.path)
-        return res
+            if send_body:
+                self.wfile.write(content)
+            return
+
+        if path.count('/') != 4:
+            self.send_error(404, 'File Not Found: %s' % path)
+            return
+        _, tiles_id, z, y, x = path.split('/')
+        # Only tile coordinates, so that no path outside of the tiles can be asked for.
+        if not all(
+                coordinate.isascii() and coordinate.isdigit()
+                for coordinate in (z, y, os.path.splitext(x)[0])):
+            self.send_error(404, 'File Not Found: %s' % path)
+            return
+        if tiles_id == overlay_id and overlay_cache:
+            self.SendRenderedTile(overlay_cache, index_stat, z, y, x, send_body)
+            return
+        if tiles_id != map_id:
+            self.send_error(404, 'File Not Found: %s' % path)
+            return
+
+        if tile_cache:
+            self.SendRenderedTile(tile_cache, dump_stat, z, y, x, send_body)
+            return
+
+        tile_path = os.path.join(tiles_dir, z, y, x)
+        content_type = CONTENT_TYPES.get(os.path.splitext(tile_path)[1])
+        try:
+            tile_file = open(tile_path, 'rb')
+        except OSError:
+            self.send_error(404, 'File Not Found: %s' % path)
+            return
+        with tile_file:
+            tile_stat = os.fstat(tile_file.fileno())
+            etag = '"{0:x}-{1:x}"'.format(tile_stat.st_size, tile_stat.st_mtime_ns)
+            if self.IsNotModified(etag, tile_stat.st_mtime):
+                self.SendTileHeaders(etag, tile_stat.st_mtime)
+                return
+            self.SendTileHeaders(
+                etag, tile_stat.st_mtime, content_type=content_type or 'application/octet-stream',
+                length=tile_stat.st_size)
+            if send_body:
+                # Headers are already flushed, send the file without copying it in userspace.
+                self.connection.sendfile(tile_file)
 
 start_port = 8000
 end_port = 9000
+httpd = None
 for port in range(start_port, end_port):
     try:
-        httpd = HTTPServer(('', port), RequestHandler)
-        print('Starting Webserver on http://localhost:{0:d}/'.format(port))
-        print('Hit Ctrl-C to quit')
-        httpd.serve_forever()
+        httpd = ThreadingHTTPServer(('', port), RequestHandler)
+        break
     except OSError:
         pass
+if not httpd:
+    print('Could not find a free port between {0:d} and {1:d}'.format(start_port, end_port))
+    sys.exit(1)
+httpd.daemon_threads = True
+print('Starting Webserver on http://localhost:{0:d}/'.format(port))
+print('Hit Ctrl-C to quit')
+try:
+    httpd.serve_forever()
+except KeyboardInterrupt:
+    pass
+httpd.server_close()
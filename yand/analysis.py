@@ -0,0 +1,204 @@
+"""Per page statistics of a dump: entropy, erased / zeroed ratios and byte histograms."""
+
+import concurrent.futures
+import mmap
+import os
+import struct
+
+import numpy
+
+from yand import errors
+
+# Page classes
+CLASS_DATA = 0
+CLASS_ERASED = 1
+CLASS_ZEROED = 2
+CLASS_HIGH_ENTROPY = 3
+
+CLASS_NAMES = {
+    CLASS_DATA: 'data',
+    CLASS_ERASED: 'erased',
+    CLASS_ZEROED: 'zeroed',
+    CLASS_HIGH_ENTROPY: 'compressed/encrypted',
+}
+
+# RGBA colors of each class, for visualization overlays
+CLASS_COLORS = numpy.array([
+    [0x00, 0xC0, 0x00, 0x60],  # data: green
+    [0x00, 0x00, 0xFF, 0x60],  # erased: blue
+    [0x00, 0x00, 0x00, 0x00],  # zeroed: transparent
+    [0xFF, 0x00, 0x00, 0x60],  # compressed/encrypted: red
+], dtype=numpy.uint8)
+
+# A page with more than this ratio of 0xFF (or 0x00) bytes is erased (or zeroed).
+FILL_RATIO_THRESHOLD = 0.99
+# In bits per byte. Compressed or encrypted pages are above this.
+HIGH_ENTROPY_THRESHOLD = 7.5
+
+INDEX_MAGIC = b'YANDIDX1'
+# magic, page_size, oob_size, number of pages
+INDEX_HEADER = struct.Struct('<8sIIQ')
+# Ratios are scaled from [0, 1] to [0, 255], entropies from [0, 8] to [0, 255]. The histogram
+# has 16 buckets (0x00-0x0F, 0x10-0x1F, ...) of scaled ratios.
+INDEX_DTYPE = numpy.dtype([
+    ('page_class', numpy.uint8),
+    ('data_entropy', numpy.uint8),
+    ('oob_entropy', numpy.uint8),
+    ('ff_ratio', numpy.uint8),
+    ('zero_ratio', numpy.uint8),
+    ('oob_ff_ratio', numpy.uint8),
+    ('histogram', numpy.uint8, (16,)),
+])
+
+
+def _Histograms(blocks):
+    """Returns the byte histogram of each row of a 2D uint8 array."""
+    rows = blocks.shape[0]
+    offsets = blocks.astype(numpy.int32) + (numpy.arange(rows, dtype=numpy.int32) * 256)[:, None]
+    return numpy.bincount(offsets.ravel(), minlength=rows * 256).reshape(rows, 256)
+
+
+def _Entropies(histograms, length):
+    """Returns the Shannon entropy, in bits per byte, from byte histograms."""
+    if not length:
+        return numpy.zeros(histograms.shape[0])
+    probabilities = histograms / length
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        logs = numpy.where(probabilities > 0, numpy.log2(probabilities), 0)
+    return -(probabilities * logs).sum(axis=1)
+
+
+def _Scale(values, maximum):
+    return numpy.clip(numpy.rint(values * (255 / maximum)), 0, 255).astype(numpy.uint8)
+
+
+def AnalyzePages(pages, oob_size):
+    """Computes statistics of pages.
+
+    Args:
+        pages(numpy.ndarray): uint8 array of shape (number of pages, page size).
+        oob_size(int): the size of the OOB area, at the end of each page.
+    Returns:
+        numpy.ndarray: one INDEX_DTYPE record per page.
+    """
+    user_size = pages.shape[1] - oob_size
+    records = numpy.zeros(pages.shape[0], dtype=INDEX_DTYPE)
+
+    histograms = _Histograms(pages[:, :user_size])
+    entropies = _Entropies(histograms, user_size)
+    ff_ratios = histograms[:, 0xFF] / user_size
+    zero_ratios = histograms[:, 0x00] / user_size
+
+    records['data_entropy'] = _Scale(entropies, 8)
+    records['ff_ratio'] = _Scale(ff_ratios, 1)
+    records['zero_ratio'] = _Scale(zero_ratios, 1)
+    records['histogram'] = _Scale(histograms.reshape((-1, 16, 16)).sum(axis=2) / user_size, 1)
+
+    if oob_size:
+        oob_histograms = _Histograms(pages[:, user_size:])
+        records['oob_entropy'] = _Scale(_Entropies(oob_histograms, oob_size), 8)
+        records['oob_ff_ratio'] = _Scale(oob_histograms[:, 0xFF] / oob_size, 1)
+
+    page_classes = numpy.full(pages.shape[0], CLASS_DATA, dtype=numpy.uint8)
+    page_classes[entropies >= HIGH_ENTROPY_THRESHOLD] = CLASS_HIGH_ENTROPY
+    page_classes[zero_ratios >= FILL_RATIO_THRESHOLD] = CLASS_ZEROED
+    page_classes[ff_ratios >= FILL_RATIO_THRESHOLD] = CLASS_ERASED
+    records['page_class'] = page_classes
+    return records
+
+
+# Memory mapped dump of an analysis worker process
+_worker_data = None
+
+
+def _InitAnalysisWorker(dump_path):
+    global _worker_data  # pylint: disable=global-statement
+    with open(dump_path, 'rb') as dump_file:
+        _worker_data = numpy.frombuffer(
+            mmap.mmap(dump_file.fileno(), 0, access=mmap.ACCESS_READ), dtype=numpy.uint8)
+
+
+def _AnalyzeChunk(start_page, end_page, page_size, oob_size):
+    pages = _worker_data[start_page * page_size:end_page * page_size].reshape(-1, page_size)
+    return start_page, AnalyzePages(pages, oob_size)
+
+
+def AnalyzeDump(
+        dump_path, page_size, oob_size, index_path, workers=None, chunk_pages=1024,
+        progress_callback=None):
+    """Computes statistics for every page of a dump, and writes them in an index file.
+
+    Args:
+        dump_path(str): path to the raw dump.
+        page_size(int): length of a page (userdata + oob).
+        oob_size(int): length of the OOB area of a page.
+        index_path(str): where to write the index.
+        workers(int): number of worker processes. Default is the number of CPUs.
+        chunk_pages(int): number of pages processed by a worker at once.
+        progress_callback(callable): called with the number of pages processed.
+    Returns:
+        numpy.ndarray: the number of pages in each class.
+    Raises:
+        errors.YandException: if the geometry is invalid.
+    """
+    if oob_size >= page_size:
+        raise errors.YandException(
+            'OOB size ({0:d}) must be less than page size ({1:d})'.format(oob_size, page_size))
+    total_pages = os.stat(dump_path).st_size // page_size
+    class_counts = numpy.zeros(len(CLASS_NAMES), dtype=numpy.int64)
+
+    with open(index_path, 'wb') as index_file:
+        index_file.write(INDEX_HEADER.pack(INDEX_MAGIC, page_size, oob_size, total_pages))
+        if not total_pages:
+            return class_counts
+        with concurrent.futures.ProcessPoolExecutor(
+                max_workers=workers, initializer=_InitAnalysisWorker,
+                initargs=(dump_path,)) as executor:
+            futures = [
+                executor.submit(
+                    _AnalyzeChunk, start_page, min(start_page + chunk_pages, total_pages),
+                    page_size, oob_size)
+                for start_page in range(0, total_pages, chunk_pages)]
+            for future in concurrent.futures.as_completed(futures):
+                start_page, records = future.result()
+                index_file.seek(INDEX_HEADER.size + start_page * INDEX_DTYPE.itemsize)
+                index_file.write(records.tobytes())
+                class_counts += numpy.bincount(
+                    records['page_class'], minlength=len(CLASS_NAMES))[:len(CLASS_NAMES)]
+                if progress_callback:
+                    progress_callback(len(records))
+    return class_counts
+
+
+class PageIndex:
+    """Reads an index file written by AnalyzeDump."""
+
+    def __init__(self, index_path):
+        """Initializes a PageIndex object.
+
+        Args:
+            index_path(str): path to the index file.
+        Raises:
+            errors.YandException: if the file is not a valid index.
+        """
+        with open(index_path, 'rb') as index_file:
+            header = index_file.read(INDEX_HEADER.size)
+        if len(header) != INDEX_HEADER.size:
+            raise errors.YandException('{0:s} is not a page index'.format(index_path))
+        magic, self.page_size, self.oob_size, self.total_pages = INDEX_HEADER.unpack(header)
+        if magic != INDEX_MAGIC:
+            raise errors.YandException('{0:s} is not a page index'.format(index_path))
+        if self.total_pages:
+            self.records = numpy.memmap(
+                index_path, dtype=INDEX_DTYPE, mode='r', offset=INDEX_HEADER.size,
+                shape=(self.total_pages,))
+        else:
+            self.records = numpy.zeros(0, dtype=INDEX_DTYPE)
+
+    def GetClassCounts(self):
+        """Returns the number of pages in each class."""
+        return numpy.bincount(self.records['page_class'], minlength=len(CLASS_NAMES))
+
+    def GetPageColors(self):
+        """Returns the RGBA color of each page, depending on its class."""
+        return CLASS_COLORS[self.records['page_class']]
@@ -0,0 +1,62 @@
+"""Tests for the analysis module."""
+
+import os
+import tempfile
+import unittest
+
+import numpy
+
+from yand import analysis
+from yand import tiles
+
+
+class AnalysisTest(unittest.TestCase):
+    """Tests for the analysis module"""
+
+    def testAnalyzePages(self):
+        """Tests analysis.AnalyzePages."""
+        pages = numpy.zeros((4, 4096 + 128), dtype=numpy.uint8)
+        pages[0, :] = 0xFF
+        pages[2, :] = numpy.random.default_rng(0).integers(0, 256, 4096 + 128, dtype=numpy.uint8)
+        pages[3, :4096] = numpy.arange(4096) % 16
+        pages[3, 4096:] = 0xFF
+
+        records = analysis.AnalyzePages(pages, 128)
+        self.assertEqual(list(records['page_class']), [
+            analysis.CLASS_ERASED, analysis.CLASS_ZEROED, analysis.CLASS_HIGH_ENTROPY,
+            analysis.CLASS_DATA])
+        self.assertEqual(list(records['ff_ratio']), [255, 0, 1, 0])
+        self.assertEqual(list(records['zero_ratio']), [0, 255, 1, 16])
+        # 16 equiprobable values: 4 bits per byte.
+        self.assertEqual(records['data_entropy'][3], 128)
+        self.assertEqual(records['oob_entropy'][3], 0)
+        self.assertEqual(records['oob_ff_ratio'][3], 255)
+        self.assertEqual(list(records['histogram'][3]), [255] + [0] * 15)
+        self.assertEqual(list(records['histogram'][0]), [0] * 15 + [255])
+
+    def testAnalyzeDump(self):
+        """Tests analysis.AnalyzeDump and PageIndex."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            dump_path = os.path.join(temp_dir, 'dump.bin')
+            index_path = os.path.join(temp_dir, 'dump.idx')
+            pages = numpy.zeros((100, 512 + 16), dtype=numpy.uint8)
+            pages[10:40] = 0xFF
+            pages.tofile(dump_path)
+
+            class_counts = analysis.AnalyzeDump(
+                dump_path, 512 + 16, 16, index_path, workers=2, chunk_pages=16)
+            self.assertEqual(list(class_counts), [0, 30, 70, 0])
+
+            page_index = analysis.PageIndex(index_path)
+            self.assertEqual((page_index.page_size, page_index.oob_size), (528, 16))
+            self.assertEqual(list(page_index.GetClassCounts()), [0, 30, 70, 0])
+            self.assertEqual(page_index.records['page_class'][10], analysis.CLASS_ERASED)
+
+            # 2 columns of 50 pages, page 10 is on the 10th row of the first column.
+            overlay = tiles.OverlayImage(page_index.GetPageColors(), 528, splits=2)
+            tile = overlay.RenderTile(overlay.max_zoom, 0, 0)
+            numpy.testing.assert_array_equal(
+                tile[10, 0], analysis.CLASS_COLORS[analysis.CLASS_ERASED])
+            numpy.testing.assert_array_equal(
+                tile[9, 0], analysis.CLASS_COLORS[analysis.CLASS_ZEROED])
+            self.assertFalse(tile[50:].any())
@@ -0,0 +1,123 @@
+"""asyncio front-end for NandInterface."""
+
+import asyncio
+import concurrent.futures
+import functools
+
+
+class AsyncNandInterface:
+    """Runs NandInterface operations without blocking the event loop.
+
+    Every device gets its own executor thread, so USB I/O for one device is serialized while
+    one event loop can drive several devices concurrently. Multi-page operations run one page
+    per executor call, so they can be cancelled between pages.
+    """
+
+    def __init__(self, nand, name=None):
+        """Initializes a AsyncNandInterface object.
+
+        Args:
+            nand(NandInterface): the NAND Flash to operate on.
+            name(str): the name of the device, used to name the executor thread.
+        """
+        self.nand = nand
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='yand-{0:s}'.format(name or 'nand'))
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self.Close()
+
+    def Close(self):
+        """Stops the executor thread, once pending operations are done."""
+        self._executor.shutdown(wait=False)
+
+    async def _Run(self, method, *args, **kwargs):
+        """Runs a blocking method on the device executor thread."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(method, *args, **kwargs))
+
+    async def Setup(self):
+        """Sets the underlying IO and flash characteristics"""
+        await self._Run(self.nand.Setup)
+
+    async def ReadPage(self, page_number):
+        """Returns the content of a page.
+
+        Args:
+            page_number(int): the page to read.
+        Returns:
+            bytearray: the content of the page.
+        """
+        return await self._Run(self.nand.ReadPage, page_number)
+
+    async def ReadPages(self, start_page, count):
+        """Returns the content of consecutive pages.
+
+        Args:
+            start_page(int): the first page to read.
+            count(int): the number of pages to read.
+        Returns:
+            list(bytearray): the content of each page.
+        """
+        return [data async for _, data in self.IterPages(start_page, start_page + count)]
+
+    async def IterPages(self, start_page=0, end_page=None):
+        """Yields pages as they are read.
+
+        Args:
+            start_page(int): the first page to read.
+            end_page(int): the page to stop reading at. Default is to the end.
+        Yields:
+            tuple(int, bytearray): the page number and its content.
+        """
+        if not end_page:
+            end_page = self.nand.GetTotalPages()
+        for page_number in range(start_page, end_page):
+            yield page_number, await self.ReadPage(page_number)
+
+    async def DumpFlashToFile(self, destination, start_page=0, end_page=None):
+        """Reads pages from the flash, and writes them to a file.
+
+        Args:
+            destination(str): the destination file.
+            start_page(int): Page to start dumping from.
+            end_page(int): Page to stop dumping at. Default is to the end.
+        """
+        loop = asyncio.get_running_loop()
+        with open(destination, 'wb') as dest_file:
+            async for _, data in self.IterPages(start_page, end_page):
+                await loop.run_in_executor(None, dest_file.write, data)
+
+    async def WritePage(self, page_number, data, write_check=False):
+        """Writes a page to the NAND Flash
+
+        Args:
+            page_number(int): the number of the page.
+            data(bytearray): the data to program.
+            write_check(bool): Whether to check the page written by reading it.
+        """
+        await self._Run(self.nand.WritePage, page_number, data, write_check=write_check)
+
+    async def EraseBlock(self, block):
+        """Erase a block
+
+        Args:
+            block(int): the block to erase.
+        """
+        await self._Run(self.nand.EraseBlock, block)
+
+    async def Erase(self, start_block=0, end_block=None):
+        """Erase blocks, one at a time.
+
+        Args:
+            start_block(int): erase from this block number.
+            end_block(int): erase up to this block. Default is to the end.
+        """
+        if not end_block:
+            end_block = self.nand.number_of_blocks
+        for block in range(start_block, end_block):
+            await self.EraseBlock(block)
@@ -0,0 +1,85 @@
+"""Tests for the async_nand module."""
+
+import asyncio
+import threading
+import time
+import unittest
+
+from yand import async_nand
+from yand import test_lib
+
+
+class SlowNand(test_lib.FakeNand):
+    """FakeNand with slow page reads, where page N contains 'NAME-N'.
+
+    With a barrier, the first page read waits for the other devices to be reading too.
+    With a pause_page, reading that page sets the paused event, then waits for the resume event.
+    """
+
+    def __init__(self, name, barrier=None, pause_page=None):
+        super().__init__(3, 8, 1, data=''.join(
+            '{0:s}-{1:d}'.format(name, page) for page in range(8)).encode())
+        self.barrier = barrier
+        self.pause_page = pause_page
+        self.paused = threading.Event()
+        self.resume = threading.Event()
+        self.threads = set()
+
+    def ReadPage(self, page_number):
+        """Returns the content of a page."""
+        self.threads.add(threading.current_thread().name)
+        if self.barrier and not self.pages_read:
+            self.barrier.wait()
+        time.sleep(0.01)
+        data = super().ReadPage(page_number)
+        if page_number == self.pause_page:
+            self.paused.set()
+            self.resume.wait(timeout=5)
+        return data
+
+
+class AsyncNandInterfaceTest(unittest.TestCase):
+    """Tests for the async_nand module"""
+
+    def testConcurrentDevices(self):
+        """Tests driving several devices from one event loop."""
+        # Reads done one device at a time would break the barrier, after its timeout.
+        barrier = threading.Barrier(2, timeout=5)
+        nands = [SlowNand('a', barrier), SlowNand('b', barrier)]
+
+        async def ReadAll():
+            async with async_nand.AsyncNandInterface(nands[0], 'a') as nand_a, \
+                    async_nand.AsyncNandInterface(nands[1], 'b') as nand_b:
+                return await asyncio.gather(nand_a.ReadPages(0, 8), nand_b.ReadPages(2, 2))
+
+        pages_a, pages_b = asyncio.run(ReadAll())
+        self.assertFalse(barrier.broken)
+        self.assertEqual(pages_a, ['a-{0:d}'.format(page).encode() for page in range(8)])
+        self.assertEqual(pages_b, [b'b-2', b'b-3'])
+        self.assertEqual(len(nands[0].threads), 1)
+        self.assertNotEqual(nands[0].threads, nands[1].threads)
+
+    def testCancel(self):
+        """Tests cancelling an operation between pages."""
+        nand = SlowNand('a', pause_page=4)
+
+        async def ReadSome():
+            async with async_nand.AsyncNandInterface(nand) as async_interface:
+                pages = []
+                async for page_number, data in async_interface.IterPages():
+                    pages.append(data)
+                    if page_number == 2:
+                        break
+                task = asyncio.ensure_future(async_interface.ReadPages(0, 8))
+                paused = await asyncio.get_running_loop().run_in_executor(
+                    None, nand.paused.wait, 5)
+                self.assertTrue(paused)
+                # Page 4 is being read: cancelling stops before page 5.
+                task.cancel()
+                nand.resume.set()
+                with self.assertRaises(asyncio.CancelledError):
+                    await task
+                return pages
+
+        self.assertEqual(asyncio.run(ReadSome()), [b'a-0', b'a-1', b'a-2'])
+        self.assertEqual(nand.pages_read, [0, 1, 2, 0, 1, 2, 3, 4])
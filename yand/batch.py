@@ -0,0 +1,211 @@
+"""Runs a list of operations on a NAND Flash, in one session."""
+
+import logging
+import shlex
+
+from yand import errors
+
+
+class BatchOperation:
+    """Class for one operation of a batch job."""
+
+    # Operation name: whether it takes a file (or value) argument
+    OPERATIONS = {
+        'dump': 'file',
+        'erase': None,
+        'fill': 'value',
+        'verify': 'file',
+        'write': 'file',
+    }
+
+    def __init__(self, name, start=0, end=None, filename=None, value=None):
+        """Initializes a BatchOperation object.
+
+        Args:
+            name(str): the operation name, one of OPERATIONS.
+            start(int): start bound (included) of the operation. The unit is a block for erase,
+                a page otherwise.
+            end(int): end bound (excluded) of the operation. None means the end of the Flash.
+            filename(str): the file to read from or write to.
+            value(int): the value to fill pages with.
+        """
+        self.name = name
+        self.start = start
+        self.end = end
+        self.filename = filename
+        self.value = value
+
+    def __eq__(self, other):
+        return vars(self) == vars(other)
+
+    def __repr__(self):
+        return 'BatchOperation({0:s})'.format(
+            ', '.join('{0:s}={1!r}'.format(k, v) for k, v in sorted(vars(self).items())))
+
+    def CanMergeWith(self, other):
+        """Whether other can be done in the same pass, right after this operation.
+
+        Args:
+            other(BatchOperation): the operation following this one.
+        Returns:
+            bool: True if both operations can be merged.
+        """
+        if self.name != other.name or self.end is None or other.start > self.end:
+            return False
+        if self.name == 'erase':
+            return other.end is None or other.end >= self.start
+        if self.name == 'fill':
+            return self.value == other.value and other.start == self.end
+        return False
+
+
+def ParseJobFile(job_file):
+    """Parses a batch job file.
+
+    Each line is an operation, followed by its arguments:
+        erase [start_block [end_block]]
+        fill VALUE [start_page [end_page]]
+        write FILE [start_page [end_page]]
+        dump FILE [start_page [end_page]]
+        verify FILE [start_page [end_page]]
+    Empty lines, and lines starting with '#' are ignored. Numbers can be written in hex (0xff).
+
+    Args:
+        job_file(file): the opened job file.
+    Returns:
+        list(BatchOperation): the operations to run.
+    Raises:
+        errors.YandException: if the job file is invalid.
+    """
+    operations = []
+    for line_number, line in enumerate(job_file, start=1):
+        tokens = shlex.split(line, comments=True)
+        if not tokens:
+            continue
+        name = tokens.pop(0).lower()
+        if name not in BatchOperation.OPERATIONS:
+            raise errors.YandException(
+                'Line {0:d}: unknown operation \'{1:s}\''.format(line_number, name))
+        operation = BatchOperation(name)
+        argument = BatchOperation.OPERATIONS[name]
+        try:
+            if argument:
+                if not tokens:
+                    raise errors.YandException(
+                        'Line {0:d}: operation {1:s} needs a {2:s}'.format(
+                            line_number, name, argument))
+                if argument == 'file':
+                    operation.filename = tokens.pop(0)
+                else:
+                    operation.value = int(tokens.pop(0), 0)
+                    if not 0 <= operation.value <= 0xFF:
+                        raise errors.YandException(
+                            'Line {0:d}: {1:s} value must be a byte, not {2:d}'.format(
+                                line_number, name, operation.value))
+            if len(tokens) > 2:
+                raise errors.YandException(
+                    'Line {0:d}: too many arguments for {1:s}'.format(line_number, name))
+            if tokens:
+                operation.start = int(tokens[0], 0)
+            if len(tokens) == 2:
+                operation.end = int(tokens[1], 0)
+        except ValueError as value_error:
+            raise errors.YandException(
+                'Line {0:d}: invalid number in \'{1:s}\''.format(
+                    line_number, line.strip())) from value_error
+        operations.append(operation)
+    return operations
+
+
+def ScheduleOperations(operations):
+    """Merges adjacent operations that can run in a single pass.
+
+    Args:
+        operations(list(BatchOperation)): the operations, in order.
+    Returns:
+        list(BatchOperation): the operations to actually run.
+    """
+    scheduled = []
+    for operation in operations:
+        previous = scheduled[-1] if scheduled else None
+        if previous and previous.CanMergeWith(operation):
+            previous.start = min(previous.start, operation.start)
+            if operation.end is None:
+                previous.end = None
+            else:
+                previous.end = max(previous.end, operation.end)
+            continue
+        scheduled.append(BatchOperation(**vars(operation)))
+    return scheduled
+
+
+class BatchRunner:
+    """Runs batch operations on an already set up NandInterface."""
+
+    def __init__(self, nand, write_check=False):
+        """Initializes a BatchRunner object.
+
+        Args:
+            nand(NandInterface): the NAND Flash to operate on.
+            write_check(bool): Whether to check every page written.
+        """
+        self.nand = nand
+        self.write_check = write_check
+        self.logger = logging.getLogger()
+
+    def _ResolveBounds(self, operation):
+        """Replaces the default end bound by the actual end of the Flash."""
+        if operation.end is None:
+            if operation.name == 'erase':
+                operation.end = self.nand.number_of_blocks
+            else:
+                operation.end = self.nand.GetTotalPages()
+
+    def Run(self, operations):
+        """Runs all operations.
+
+        The job stops before a write or fill operation, if blocks failed to erase.
+
+        Args:
+            operations(list(BatchOperation)): the operations to run, in order.
+        Returns:
+            bool: False if blocks failed to erase, or a verify operation found differences.
+        """
+        result = True
+        failed_blocks = []
+        operations = [BatchOperation(**vars(operation)) for operation in operations]
+        for operation in operations:
+            self._ResolveBounds(operation)
+        for operation in ScheduleOperations(operations):
+            self.logger.debug('Running batch operation {0!r}'.format(operation))
+            if operation.name in ('fill', 'write') and failed_blocks:
+                self.logger.error('Stopping before {0:s}, blocks {1:s} failed to erase'.format(
+                    operation.name, ', '.join(str(block) for block in failed_blocks)))
+                return False
+            if operation.name == 'erase':
+                erase_failed_blocks = self.nand.Erase(
+                    start_block=operation.start, end_block=operation.end)
+                if erase_failed_blocks:
+                    self.logger.error('Blocks {0:s} failed to erase'.format(
+                        ', '.join(str(block) for block in erase_failed_blocks)))
+                    failed_blocks += erase_failed_blocks
+                    result = False
+            elif operation.name == 'fill':
+                self.nand.FillWithValue(
+                    operation.value, start_page=operation.start, end_page=operation.end,
+                    write_check=self.write_check)
+            elif operation.name == 'write':
+                self.nand.WriteFileToFlash(
+                    operation.filename, start_page=operation.start, end_page=operation.end,
+                    write_check=self.write_check)
+            elif operation.name == 'dump':
+                self.nand.DumpFlashToFile(
+                    operation.filename, start_page=operation.start, end_page=operation.end)
+            elif operation.name == 'verify':
+                differing_pages = self.nand.CompareFileToFlash(
+                    operation.filename, start_page=operation.start, end_page=operation.end)
+                if differing_pages:
+                    self.logger.error('{0:s} differs from NAND Flash in {1:d} pages'.format(
+                        operation.filename, len(differing_pages)))
+                    result = False
+        return result
@@ -0,0 +1,86 @@
+"""Tests for the batch module."""
+
+import io
+import unittest
+from unittest import mock
+
+from yand import batch
+from yand import errors
+
+
+class BatchTest(unittest.TestCase):
+    """Tests for the batch module"""
+
+    def testParseJobFile(self):
+        """Tests batch.ParseJobFile."""
+        job_file = io.StringIO("""
+# Provisioning
+erase
+fill 0xff 10 20
+write "boot loader.bin" 0 64  # comment
+dump out.bin
+verify out.bin 0x10
+""")
+        self.assertEqual(batch.ParseJobFile(job_file), [
+            batch.BatchOperation('erase'),
+            batch.BatchOperation('fill', start=10, end=20, value=0xff),
+            batch.BatchOperation('write', start=0, end=64, filename='boot loader.bin'),
+            batch.BatchOperation('dump', filename='out.bin'),
+            batch.BatchOperation('verify', start=16, filename='out.bin'),
+        ])
+
+        with self.assertRaises(errors.YandException):
+            batch.ParseJobFile(io.StringIO('format 0 1'))
+        with self.assertRaises(errors.YandException):
+            batch.ParseJobFile(io.StringIO('fill'))
+        for line in ['fill 0x1FF', 'fill -1']:
+            with self.assertRaisesRegex(errors.YandException, 'Line 2: fill value must be a byte'):
+                batch.ParseJobFile(io.StringIO('erase\n' + line))
+        with self.assertRaises(errors.YandException):
+            batch.ParseJobFile(io.StringIO('erase 0 one'))
+        with self.assertRaises(errors.YandException):
+            batch.ParseJobFile(io.StringIO('erase 0 1 2'))
+
+    def testScheduleOperations(self):
+        """Tests batch.ScheduleOperations."""
+        operations = [
+            batch.BatchOperation('erase', start=0, end=10),
+            batch.BatchOperation('erase', start=10, end=20),
+            batch.BatchOperation('erase', start=5, end=15),
+            batch.BatchOperation('fill', start=0, end=64, value=0),
+            batch.BatchOperation('fill', start=64, end=128, value=0),
+            batch.BatchOperation('fill', start=128, end=256, value=1),
+            batch.BatchOperation('dump', start=0, end=256, filename='a.bin'),
+            batch.BatchOperation('verify', start=0, end=256, filename='a.bin'),
+            batch.BatchOperation('verify', start=0, end=256, filename='b.bin'),
+        ]
+        self.assertEqual(batch.ScheduleOperations(operations), [
+            batch.BatchOperation('erase', start=0, end=20),
+            batch.BatchOperation('fill', start=0, end=128, value=0),
+            batch.BatchOperation('fill', start=128, end=256, value=1),
+            batch.BatchOperation('dump', start=0, end=256, filename='a.bin'),
+            # Verifying a dump reads the pages again, it is never skipped.
+            batch.BatchOperation('verify', start=0, end=256, filename='a.bin'),
+            batch.BatchOperation('verify', start=0, end=256, filename='b.bin'),
+        ])
+        # Input operations are not modified
+        self.assertEqual(operations[0].end, 10)
+
+    def testRunEraseFailure(self):
+        """Tests BatchRunner stops before writing, when blocks failed to erase."""
+        nand = mock.MagicMock(number_of_blocks=16)
+        nand.GetTotalPages.return_value = 1024
+        nand.Erase.return_value = [3]
+        nand.CompareFileToFlash.return_value = []
+        operations = batch.ParseJobFile(
+            io.StringIO('erase\ndump a.bin\nwrite b.bin\nverify b.bin\n'))
+        with self.assertLogs(level='ERROR'):
+            self.assertFalse(batch.BatchRunner(nand).Run(operations))
+        nand.Erase.assert_called_once_with(start_block=0, end_block=16)
+        nand.DumpFlashToFile.assert_called_once()
+        nand.WriteFileToFlash.assert_not_called()
+        nand.CompareFileToFlash.assert_not_called()
+
+        nand.Erase.return_value = []
+        self.assertTrue(batch.BatchRunner(nand).Run(operations))
+        nand.WriteFileToFlash.assert_called_once()
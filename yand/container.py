@@ -0,0 +1,446 @@
+"""Compressed dump container, with random access to pages.
+
+A container is made of:
+  - a header (see CONTAINER_HEADER),
+  - compressed chunks of `pages_per_chunk` consecutive pages,
+  - the chunk table, with the offset, compressed size and CRC32 of every chunk.
+
+Each chunk is compressed on its own. Once decompressed, it holds one flag per page (see PAGE_*),
+followed by the content of the pages flagged PAGE_DATA only: erased and zeroed pages take no
+room besides their flag.
+"""
+
+import collections
+import concurrent.futures
+import io
+import lzma
+import os
+import struct
+import zlib
+
+import numpy
+
+from yand import errors
+
+CONTAINER_MAGIC = b'YANDCNT1'
+# magic, page_size, oob_size, pages_per_chunk, compression, total_pages, chunk table offset
+CONTAINER_HEADER = struct.Struct('<8sIIIIQQ')
+CHUNK_DTYPE = numpy.dtype([('offset', '<u8'), ('size', '<u4'), ('crc32', '<u4')])
+
+COMPRESSION_NONE = 0
+COMPRESSION_ZLIB = 1
+COMPRESSION_LZMA = 2
+COMPRESSIONS = {'none': COMPRESSION_NONE, 'zlib': COMPRESSION_ZLIB, 'lzma': COMPRESSION_LZMA}
+
+PAGE_DATA = 0
+PAGE_ERASED = 1
+PAGE_ZEROED = 2
+
+
+def _Compress(data, compression, level):
+    if compression == COMPRESSION_ZLIB:
+        return zlib.compress(data, 6 if level is None else level)
+    if compression == COMPRESSION_LZMA:
+        return lzma.compress(data, check=lzma.CHECK_NONE, preset=level)
+    return bytes(data)
+
+
+def _Decompress(data, compression):
+    if compression == COMPRESSION_ZLIB:
+        return zlib.decompress(data)
+    if compression == COMPRESSION_LZMA:
+        return lzma.decompress(data)
+    return data
+
+
+def PackChunk(data, page_size, compression, level=None):
+    """Compresses a chunk of pages.
+
+    Args:
+        data(bytes): the content of consecutive pages.
+        page_size(int): length of a page (userdata + oob).
+        compression(int): one of COMPRESSION_*.
+        level(int): the compression level. Default is the compressor default.
+    Returns:
+        tuple(bytes, int): the compressed chunk, and the CRC32 of the uncompressed chunk.
+    """
+    pages = numpy.frombuffer(data, dtype=numpy.uint8).reshape((-1, page_size))
+    flags = numpy.full(len(pages), PAGE_DATA, dtype=numpy.uint8)
+    flags[(pages == 0x00).all(axis=1)] = PAGE_ZEROED
+    flags[(pages == 0xFF).all(axis=1)] = PAGE_ERASED
+    if flags.any():
+        payload = flags.tobytes() + pages[flags == PAGE_DATA].tobytes()
+    else:
+        payload = flags.tobytes() + bytes(data)
+    return _Compress(payload, compression, level), zlib.crc32(payload)
+
+
+def UnpackChunk(data, page_size, pages_in_chunk, compression, crc32):
+    """Decompresses a chunk of pages.
+
+    Args:
+        data(bytes): the compressed chunk.
+        page_size(int): length of a page (userdata + oob).
+        pages_in_chunk(int): the number of pages in the chunk.
+        compression(int): one of COMPRESSION_*.
+        crc32(int): the expected CRC32 of the uncompressed chunk.
+    Returns:
+        numpy.ndarray: uint8 array of shape (pages_in_chunk, page_size).
+    Raises:
+        errors.YandException: if the chunk is corrupted.
+    """
+    try:
+        payload = _Decompress(data, compression)
+    except (zlib.error, lzma.LZMAError) as decompress_error:
+        raise errors.YandException('Corrupted chunk') from decompress_error
+    if zlib.crc32(payload) != crc32:
+        raise errors.YandException('Corrupted chunk, bad CRC32')
+    flags = numpy.frombuffer(payload, dtype=numpy.uint8, count=pages_in_chunk)
+    data_pages = flags == PAGE_DATA
+    if len(payload) != pages_in_chunk + int(data_pages.sum()) * page_size:
+        raise errors.YandException('Corrupted chunk, bad size')
+    pages = numpy.empty((pages_in_chunk, page_size), dtype=numpy.uint8)
+    pages[flags == PAGE_ERASED] = 0xFF
+    pages[flags == PAGE_ZEROED] = 0x00
+    pages[data_pages] = numpy.frombuffer(
+        payload, dtype=numpy.uint8, offset=pages_in_chunk).reshape((-1, page_size))
+    return pages
+
+
+class ContainerWriter(io.RawIOBase):
+    """Writes pages to a new container, as a write only file object.
+
+    Chunks are compressed by a pool of threads, and written in order. The header is only
+    completed by close(): a container left by an exception within a with block stays invalid.
+    """
+
+    def __init__(
+            self, path, page_size, oob_size, pages_per_chunk=64, compression='zlib', level=None,
+            workers=None):
+        """Initializes a ContainerWriter object.
+
+        Args:
+            path(str): the container to create.
+            page_size(int): length of a page (userdata + oob).
+            oob_size(int): length of the spare area.
+            pages_per_chunk(int): the number of pages compressed together.
+            compression(str): one of COMPRESSIONS.
+            level(int): the compression level. Default is the compressor default.
+            workers(int): number of compression threads. Default is the number of CPUs.
+        Raises:
+            errors.YandException: if the compression is unknown.
+        """
+        super().__init__()
+        # Set first, as close() is called even if initialization fails.
+        self._file = None
+        if compression not in COMPRESSIONS:
+            raise errors.YandException('Unknown compression \'{0:s}\''.format(compression))
+        self.page_size = page_size
+        self.oob_size = oob_size
+        self.pages_per_chunk = pages_per_chunk
+        self.compression = COMPRESSIONS[compression]
+        self.level = level
+        self.total_pages = 0
+
+        # The file is open as long as the writer is, close() closes it.
+        self._file = open(path, 'wb')  # pylint: disable=consider-using-with
+        self._file.write(CONTAINER_HEADER.pack(
+            CONTAINER_MAGIC, page_size, oob_size, pages_per_chunk, self.compression, 0, 0))
+        self._offset = CONTAINER_HEADER.size
+        self._buffer = bytearray()
+        self._chunks = []
+        self._workers = workers or os.cpu_count() or 1
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=self._workers)
+        self._pending = collections.deque()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        """Adds the content of pages to the container.
+
+        Args:
+            data(bytes): the content to add. Pages can span several writes.
+        Returns:
+            int: the amount of bytes written.
+        """
+        self._buffer += data
+        chunk_length = self.pages_per_chunk * self.page_size
+        consumed = 0
+        while len(self._buffer) - consumed >= chunk_length:
+            self._SubmitChunk(bytes(self._buffer[consumed:consumed + chunk_length]))
+            consumed += chunk_length
+        del self._buffer[:consumed]
+        return len(data)
+
+    def _SubmitChunk(self, data):
+        self.total_pages += len(data) // self.page_size
+        self._pending.append(self._executor.submit(
+            PackChunk, data, self.page_size, self.compression, self.level))
+        # Bounds memory use, when compressing is slower than adding pages.
+        while len(self._pending) > 2 * self._workers:
+            self._WriteChunk(self._pending.popleft().result())
+
+    def _WriteChunk(self, packed_chunk):
+        compressed, crc32 = packed_chunk
+        self._file.write(compressed)
+        self._chunks.append((self._offset, len(compressed), crc32))
+        self._offset += len(compressed)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.Abort()
+
+    def Abort(self):
+        """Closes the container, without writing the remaining pages nor the chunk table.
+
+        The header is left incomplete, so the container can't be read.
+        """
+        if self.closed:
+            return
+        try:
+            if self._file:
+                for future in self._pending:
+                    future.cancel()
+                self._executor.shutdown()
+                self._file.close()
+        finally:
+            super().close()
+
+    def close(self):
+        """Writes the remaining pages and the chunk table, and closes the container.
+
+        Raises:
+            errors.YandException: if the content added doesn't end on a page boundary.
+        """
+        if self.closed:
+            return
+        if not self._file:
+            super().close()
+            return
+        try:
+            if len(self._buffer) % self.page_size:
+                raise errors.YandException(
+                    'Container content is not a multiple of page size ({0:d})'.format(
+                        self.page_size))
+            if self._buffer:
+                self._SubmitChunk(bytes(self._buffer))
+                self._buffer.clear()
+            while self._pending:
+                self._WriteChunk(self._pending.popleft().result())
+            self._file.write(numpy.array(self._chunks, dtype=CHUNK_DTYPE).tobytes())
+            self._file.seek(0)
+            self._file.write(CONTAINER_HEADER.pack(
+                CONTAINER_MAGIC, self.page_size, self.oob_size, self.pages_per_chunk,
+                self.compression, self.total_pages, self._offset))
+        finally:
+            self._executor.shutdown()
+            self._file.close()
+            super().close()
+
+
+class ContainerReader(io.RawIOBase):
+    """Reads a container, as a read only file object of the raw dump, or page by page."""
+
+    def __init__(self, path, cache_size=4):
+        """Initializes a ContainerReader object.
+
+        Args:
+            path(str): the container to read.
+            cache_size(int): the number of decompressed chunks to keep in memory.
+        Raises:
+            errors.YandException: if the file is not a complete container.
+        """
+        super().__init__()
+        self.path = path
+        # Set first, as close() is called even if initialization fails.
+        self._file = None
+        # The file is open as long as the reader is, close() closes it.
+        self._file = open(path, 'rb')  # pylint: disable=consider-using-with
+        header = self._file.read(CONTAINER_HEADER.size)
+        if len(header) != CONTAINER_HEADER.size:
+            self._file.close()
+            raise errors.YandException('{0:s} is not a dump container'.format(path))
+        (magic, self.page_size, self.oob_size, self.pages_per_chunk, self.compression,
+         self.total_pages, table_offset) = CONTAINER_HEADER.unpack(header)
+        if magic != CONTAINER_MAGIC or not table_offset:
+            self._file.close()
+            raise errors.YandException(
+                '{0:s} is not a complete dump container'.format(path))
+        number_of_chunks = -(-self.total_pages // self.pages_per_chunk)
+        self._file.seek(table_offset)
+        self.chunks = numpy.frombuffer(
+            self._file.read(number_of_chunks * CHUNK_DTYPE.itemsize), dtype=CHUNK_DTYPE)
+        if len(self.chunks) != number_of_chunks:
+            self._file.close()
+            raise errors.YandException('{0:s} has a truncated chunk table'.format(path))
+        self._cache = collections.OrderedDict()
+        self._cache_size = cache_size
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def close(self):
+        if self._file:
+            self._file.close()
+        super().close()
+
+    def GetSize(self):
+        """Returns the size of the raw dump."""
+        return self.total_pages * self.page_size
+
+    def ReadChunk(self, chunk_number):
+        """Returns the pages of a chunk.
+
+        Args:
+            chunk_number(int): the chunk to read.
+        Returns:
+            numpy.ndarray: uint8 array of shape (pages in the chunk, page_size).
+        Raises:
+            errors.YandException: if the chunk is corrupted.
+        """
+        pages = self._cache.get(chunk_number)
+        if pages is not None:
+            self._cache.move_to_end(chunk_number)
+            return pages
+        chunk = self.chunks[chunk_number]
+        self._file.seek(int(chunk['offset']))
+        pages_in_chunk = min(
+            self.pages_per_chunk, self.total_pages - chunk_number * self.pages_per_chunk)
+        try:
+            pages = UnpackChunk(
+                self._file.read(int(chunk['size'])), self.page_size, pages_in_chunk,
+                self.compression, int(chunk['crc32']))
+        except errors.YandException as chunk_error:
+            raise errors.YandException('{0:s}: chunk {1:d}: {2!s}'.format(
+                self.path, chunk_number, chunk_error)) from chunk_error
+        self._cache[chunk_number] = pages
+        if len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+        return pages
+
+    def ReadPages(self, start_page, count):
+        """Returns the content of consecutive pages.
+
+        Only the chunks holding these pages are decompressed.
+
+        Args:
+            start_page(int): the first page to read.
+            count(int): the number of pages to read.
+        Returns:
+            bytes: the content of the pages.
+        """
+        end_page = min(start_page + count, self.total_pages)
+        parts = []
+        page = start_page
+        while page < end_page:
+            chunk_number, first = divmod(page, self.pages_per_chunk)
+            last = min(self.pages_per_chunk, first + end_page - page)
+            parts.append(self.ReadChunk(chunk_number)[first:last].tobytes())
+            page += last - first
+        return b''.join(parts)
+
+    def ExtractToFile(self, destination, start_page=0, end_page=None, progress_callback=None):
+        """Writes pages to a raw dump file.
+
+        Args:
+            destination(str): the file to write.
+            start_page(int): Page to start extracting from.
+            end_page(int): Page to stop extracting at. Default is to the end.
+            progress_callback(callable): called with the number of pages written.
+        """
+        if end_page is None or end_page > self.total_pages:
+            end_page = self.total_pages
+        with open(destination, 'wb') as dest_file:
+            page = start_page
+            while page < end_page:
+                # Read up to the end of the current chunk
+                count = min(self.pages_per_chunk - page % self.pages_per_chunk, end_page - page)
+                dest_file.write(self.ReadPages(page, count))
+                page += count
+                if progress_callback:
+                    progress_callback(count)
+
+    def Verify(self):
+        """Checks every chunk.
+
+        Returns:
+            list(int): the numbers of corrupted chunks.
+        """
+        corrupted_chunks = []
+        for chunk_number in range(len(self.chunks)):
+            self._cache.pop(chunk_number, None)
+            try:
+                self.ReadChunk(chunk_number)
+            except errors.YandException:
+                corrupted_chunks.append(chunk_number)
+        return corrupted_chunks
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            self._position = offset
+        elif whence == io.SEEK_CUR:
+            self._position += offset
+        elif whence == io.SEEK_END:
+            self._position = self.GetSize() + offset
+        else:
+            raise ValueError('Invalid whence ({0!s})'.format(whence))
+        self._position = max(self._position, 0)
+        return self._position
+
+    def tell(self):
+        return self._position
+
+    def readinto(self, buffer):
+        size = self.GetSize()
+        if self._position >= size:
+            return 0
+        length = min(len(buffer), size - self._position)
+        start_page, skip = divmod(self._position, self.page_size)
+        pages_to_read = -(-(skip + length) // self.page_size)
+        data = self.ReadPages(start_page, pages_to_read)
+        buffer[:length] = data[skip:skip + length]
+        self._position += length
+        return length
+
+
+def PackDump(
+        dump_path, container_path, page_size, oob_size, pages_per_chunk=64, compression='zlib',
+        level=None, workers=None, progress_callback=None):
+    """Writes a raw dump to a new container.
+
+    Args:
+        dump_path(str): path to the raw dump.
+        container_path(str): the container to create.
+        page_size(int): length of a page (userdata + oob).
+        oob_size(int): length of the spare area.
+        pages_per_chunk(int): the number of pages compressed together.
+        compression(str): one of COMPRESSIONS.
+        level(int): the compression level.
+        workers(int): number of compression threads. Default is the number of CPUs.
+        progress_callback(callable): called with the number of pages written.
+    Raises:
+        errors.YandException: if the dump size is not a multiple of the page size.
+    """
+    dump_size = os.stat(dump_path).st_size
+    if dump_size % page_size:
+        raise errors.YandException(
+            '{0:s} size ({1:d}) is not a multiple of page size ({2:d})'.format(
+                dump_path, dump_size, page_size))
+    read_length = 16 * pages_per_chunk * page_size
+    with open(dump_path, 'rb') as dump_file, ContainerWriter(
+            container_path, page_size, oob_size, pages_per_chunk=pages_per_chunk,
+            compression=compression, level=level, workers=workers) as writer:
+        while True:
+            data = dump_file.read(read_length)
+            if not data:
+                break
+            writer.write(data)
+            if progress_callback:
+                progress_callback(len(data) // page_size)
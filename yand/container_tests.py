@@ -0,0 +1,101 @@
+"""Tests for the container module."""
+
+import io
+import os
+import tempfile
+import unittest
+
+import numpy
+
+from yand import container
+from yand import errors
+
+
+class ContainerTest(unittest.TestCase):
+    """Tests for the container module"""
+
+    def setUp(self):
+        # 50 pages of 64 bytes: random, erased every 3 pages, zeroed every 7 pages.
+        self.pages = numpy.random.default_rng(0).integers(0, 4, (50, 64), dtype=numpy.uint8)
+        self.pages[::3] = 0xFF
+        self.pages[::7] = 0x00
+        self.temp_dir = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.dump_path = os.path.join(self.temp_dir.name, 'dump.bin')
+        self.container_path = os.path.join(self.temp_dir.name, 'dump.ynd')
+        self.pages.tofile(self.dump_path)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def testPackChunk(self):
+        """Tests PackChunk and UnpackChunk."""
+        data = self.pages[:10].tobytes()
+        compressed, crc32 = container.PackChunk(data, 64, container.COMPRESSION_NONE)
+        # Flags, then pages 1, 2, 4, 5 and 8.
+        self.assertEqual(len(compressed), 10 + 5 * 64)
+        self.assertEqual(list(compressed[:10]), [2, 0, 0, 1, 0, 0, 1, 2, 0, 1])
+        unpacked = container.UnpackChunk(compressed, 64, 10, container.COMPRESSION_NONE, crc32)
+        numpy.testing.assert_array_equal(unpacked, self.pages[:10])
+
+        with self.assertRaises(errors.YandException):
+            container.UnpackChunk(compressed, 64, 10, container.COMPRESSION_NONE, crc32 ^ 1)
+
+    def testRoundTrip(self):
+        """Tests packing a dump, and reading it back."""
+        for compression in sorted(container.COMPRESSIONS):
+            container.PackDump(
+                self.dump_path, self.container_path, 64, 8, pages_per_chunk=8,
+                compression=compression, workers=2)
+            with container.ContainerReader(self.container_path) as reader:
+                self.assertEqual(reader.total_pages, 50)
+                self.assertEqual(reader.GetSize(), 50 * 64)
+                self.assertEqual(reader.ReadPages(5, 20), self.pages[5:25].tobytes())
+                self.assertEqual(reader.ReadPages(45, 20), self.pages[45:].tobytes())
+                self.assertEqual(reader.Verify(), [])
+
+                extract_path = os.path.join(self.temp_dir.name, 'extract.bin')
+                reader.ExtractToFile(extract_path, start_page=3, end_page=30)
+                with open(extract_path, 'rb') as extract_file:
+                    self.assertEqual(extract_file.read(), self.pages[3:30].tobytes())
+
+                reader.seek(100)
+                self.assertEqual(reader.read(1000), self.pages.tobytes()[100:1100])
+                self.assertEqual(
+                    io.BufferedReader(reader).read(), self.pages.tobytes()[1100:])
+
+    def testCorruption(self):
+        """Tests corrupted and incomplete containers."""
+        container.PackDump(self.dump_path, self.container_path, 64, 8, pages_per_chunk=8)
+        with container.ContainerReader(self.container_path) as reader:
+            chunk_offset = int(reader.chunks[2]['offset'])
+        with open(self.container_path, 'r+b') as container_file:
+            container_file.seek(chunk_offset + 4)
+            byte = container_file.read(1)
+            container_file.seek(chunk_offset + 4)
+            container_file.write(bytes([byte[0] ^ 0x01]))
+        with container.ContainerReader(self.container_path) as reader:
+            self.assertEqual(reader.Verify(), [2])
+            self.assertEqual(reader.ReadPages(0, 16), self.pages[:16].tobytes())
+            with self.assertRaises(errors.YandException):
+                reader.ReadPages(16, 1)
+
+        writer = container.ContainerWriter(self.container_path, 64, 8)
+        writer.write(b'\x00' * 100)
+        with self.assertRaises(errors.YandException):
+            writer.close()
+        with open(self.container_path, 'r+b') as container_file:
+            container_file.truncate(container.CONTAINER_HEADER.size)
+        with self.assertRaises(errors.YandException):
+            container.ContainerReader(self.container_path)
+
+        # An exception while writing leaves an incomplete container.
+        with self.assertRaises(KeyboardInterrupt):
+            with container.ContainerWriter(
+                    self.container_path, 64, 8, pages_per_chunk=8) as writer:
+                writer.write(self.pages[:20].tobytes())
+                raise KeyboardInterrupt()
+        self.assertTrue(writer.closed)
+        with self.assertRaises(errors.YandException):
+            container.ContainerReader(self.container_path)
+        with self.assertRaises(errors.YandException):
+            container.ContainerReader(self.container_path)
@@ -0,0 +1,615 @@
+"""Checks and corrects pages with Hamming or BCH error correcting codes.
+
+ECC bytes are computed on batches of steps with NumPy. Only the steps where the computed ECC
+differs from the stored one are decoded one at a time.
+"""
+
+import concurrent.futures
+import mmap
+import os
+
+import numpy
+
+from yand import errors
+from yand import layout
+
+# Per page result of a check
+STATUS_DTYPE = numpy.dtype([
+    # Total number of bits corrected in the page
+    ('corrected', numpy.uint16),
+    # Highest number of bits corrected in one step
+    ('max_bitflips', numpy.uint8),
+    # Number of steps with too many bitflips to be corrected
+    ('uncorrectable', numpy.uint8),
+    # Whether every step is erased (all 0xFF)
+    ('erased', numpy.bool_),
+])
+
+# Default primitive polynomials of GF(2^m), the same as the Linux kernel BCH library.
+PRIMITIVE_POLYNOMIALS = {
+    5: 0x25, 6: 0x43, 7: 0x83, 8: 0x11d, 9: 0x211, 10: 0x409, 11: 0x805, 12: 0x1053,
+    13: 0x201b, 14: 0x402b, 15: 0x8003, 16: 0x1002d}
+
+# Parity (0 or 1) of every byte value
+_PARITY = numpy.array([bin(value).count('1') & 1 for value in range(256)], dtype=numpy.uint8)
+_POPCOUNT = numpy.array([bin(value).count('1') for value in range(256)], dtype=numpy.uint8)
+
+
+class EccScheme:
+    """Base class for error correcting codes working on fixed size steps.
+
+    Attributes:
+        step_size(int): length of user data covered by one ECC.
+        ecc_size(int): length of one ECC, in bytes.
+        strength(int): the number of bitflips a step can have and still be corrected.
+    """
+
+    step_size = 0
+    ecc_size = 0
+    strength = 0
+
+    def CalculateEcc(self, steps):
+        """Computes ECC bytes.
+
+        Args:
+            steps(numpy.ndarray): uint8 array of shape (number of steps, step_size).
+        Returns:
+            numpy.ndarray: uint8 array of shape (number of steps, ecc_size).
+        """
+        raise NotImplementedError
+
+    def _CorrectStep(self, step, ecc_difference):
+        """Corrects one step, where the computed ECC differs from the stored one.
+
+        Args:
+            step(numpy.ndarray): the step data, corrected in place.
+            ecc_difference(numpy.ndarray): the computed ECC bytes XOR the stored ones.
+        Returns:
+            int: the number of bits corrected, or -1 if the step is uncorrectable.
+        """
+        raise NotImplementedError
+
+    def CorrectSteps(self, steps, stored_ecc):
+        """Checks steps against their stored ECC, and corrects them in place.
+
+        A step where both data and ECC are all 0xFF is erased, and is not an error, as is a
+        step whose data is all 0xFF once corrected. An uncorrectable step with at most
+        `strength` bits set to 0 is an erased step with bitflips, and is reset to all 0xFF.
+
+        Args:
+            steps(numpy.ndarray): uint8 array of shape (number of steps, step_size).
+            stored_ecc(numpy.ndarray): uint8 array of shape (number of steps, ecc_size).
+        Returns:
+            tuple(numpy.ndarray, numpy.ndarray): for every step, the number of bits corrected
+                (or -1 if uncorrectable), and whether it is erased.
+        """
+        erased = (steps == 0xFF).all(axis=1) & (stored_ecc == 0xFF).all(axis=1)
+        differences = self.CalculateEcc(steps) ^ stored_ecc
+        bitflips = numpy.zeros(len(steps), dtype=numpy.int32)
+        for index in numpy.flatnonzero(differences.any(axis=1) & ~erased):
+            bitflips[index] = self._CorrectStep(steps[index], differences[index])
+            if bitflips[index] < 0:
+                zero_bits = int(
+                    _POPCOUNT[~steps[index]].sum() + _POPCOUNT[~stored_ecc[index]].sum())
+                if zero_bits <= self.strength:
+                    steps[index] = 0xFF
+                    bitflips[index] = zero_bits
+                    erased[index] = True
+            elif (steps[index] == 0xFF).all():
+                erased[index] = True
+        return bitflips, erased
+
+
+class HammingEcc(EccScheme):
+    """The 3 bytes Hamming code of the Linux kernel software ECC, for 256 or 512 bytes steps.
+
+    It corrects 1 bitflip, and detects 2 bitflips, per step.
+    """
+
+    def __init__(self, step_size=256):
+        """Initializes a HammingEcc object.
+
+        Args:
+            step_size(int): 256 or 512.
+        Raises:
+            errors.YandException: if the step size is not supported.
+        """
+        if step_size not in (256, 512):
+            raise errors.YandException(
+                'Hamming ECC works on 256 or 512 bytes steps, not {0:d}'.format(step_size))
+        self.step_size = step_size
+        self.ecc_size = 3
+        self.strength = 1
+        self._address_bits = step_size.bit_length() - 1
+        # For every byte offset bit, whether each offset has it set. Parities are counted with a
+        # float matrix product, which is much faster than an integer one, and exact here.
+        self._offset_bits = (
+            (numpy.arange(step_size)[:, None] >> numpy.arange(self._address_bits)[None, :]) & 1
+        ).astype(numpy.float32)
+
+    def CalculateEcc(self, steps):
+        """Computes ECC bytes.
+
+        Args:
+            steps(numpy.ndarray): uint8 array of shape (number of steps, step_size).
+        Returns:
+            numpy.ndarray: uint8 array of shape (number of steps, 3).
+        """
+        columns = numpy.bitwise_xor.reduce(steps, axis=1)
+        total_parity = _PARITY[columns].astype(numpy.int32)
+        # Line parities: rp(2k + 1) covers the bytes at offsets with bit k set, rp(2k) the others.
+        odd_parities = (
+            _PARITY[steps].astype(numpy.float32) @ self._offset_bits).astype(numpy.int32) & 1
+        even_parities = odd_parities ^ total_parity[:, None]
+        line_parities = numpy.empty((len(steps), 2 * self._address_bits), dtype=numpy.int32)
+        line_parities[:, 0::2] = even_parities
+        line_parities[:, 1::2] = odd_parities
+        # The code stores inverted parities, so that an erased step has an all 0xFF ECC.
+        line_parities ^= 1
+
+        weights = 1 << numpy.arange(8)
+        ecc = numpy.empty((len(steps), 3), dtype=numpy.uint8)
+        # Same byte order as the kernel default (not the SmartMedia one)
+        ecc[:, 0] = line_parities[:, 8:16] @ weights
+        ecc[:, 1] = line_parities[:, 0:8] @ weights
+        column_parities = numpy.zeros(len(steps), dtype=numpy.int32)
+        for bit, mask in enumerate([0xF0, 0x0F, 0xCC, 0x33, 0xAA, 0x55]):
+            column_parities |= (_PARITY[columns & mask] ^ 1).astype(numpy.int32) << (7 - bit)
+        if self.step_size == 512:
+            column_parities |= line_parities[:, 16] | (line_parities[:, 17] << 1)
+        else:
+            column_parities |= 0x03
+        ecc[:, 2] = column_parities
+        return ecc
+
+    def _CorrectStep(self, step, ecc_difference):
+        """Corrects one step, where the computed ECC differs from the stored one.
+
+        Args:
+            step(numpy.ndarray): the step data, corrected in place.
+            ecc_difference(numpy.ndarray): the computed ECC bytes XOR the stored ones.
+        Returns:
+            int: the number of bits corrected, or -1 if the step is uncorrectable.
+        """
+        high, low, column = [int(value) for value in ecc_difference]
+        # A single bitflip in the data flips exactly one parity of each pair.
+        column_mask = 0x55 if self.step_size == 512 else 0x54
+        if (((low ^ (low >> 1)) & 0x55) == 0x55 and
+                ((high ^ (high >> 1)) & 0x55) == 0x55 and
+                ((column ^ (column >> 1)) & column_mask) == column_mask):
+            offset = _OddBits(low) | (_OddBits(high) << 4)
+            if self.step_size == 512:
+                offset |= _OddBits(column & 0x03) << 8
+            step[offset] ^= 1 << _OddBits(column >> 2)
+            return 1
+        if bin(high).count('1') + bin(low).count('1') + bin(column).count('1') == 1:
+            # The bitflip is in the ECC itself
+            return 1
+        return -1
+
+
+def _OddBits(value):
+    """Returns the number made of bits 1, 3, 5 and 7 of a byte."""
+    return ((value >> 1) & 1) | ((value >> 2) & 2) | ((value >> 3) & 4) | ((value >> 4) & 8)
+
+
+class BchEcc(EccScheme):
+    """A binary BCH code over GF(2^m), as used by the Linux kernel software BCH ECC.
+
+    Data bytes are the highest degree coefficients of the codeword polynomial, most significant
+    bit first, followed by the ECC bits. As in the kernel, the stored ECC is XORed with a mask,
+    so that an erased step has an all 0xFF ECC.
+    """
+
+    def __init__(self, step_size=512, strength=4, m=None):
+        """Initializes a BchEcc object.
+
+        Args:
+            step_size(int): length of user data covered by one ECC.
+            strength(int): the number of bitflips to correct per step.
+            m(int): the Galois field order. Default is the smallest one fitting a step.
+        Raises:
+            errors.YandException: if the parameters are not supported.
+        """
+        if strength < 1:
+            raise errors.YandException('BCH strength must be at least 1')
+        if m is None:
+            m = next(
+                (order for order in sorted(PRIMITIVE_POLYNOMIALS)
+                 if (1 << order) - 1 >= step_size * 8 + order * strength), None)
+        if m not in PRIMITIVE_POLYNOMIALS:
+            raise errors.YandException(
+                'No supported Galois field for {0:d} bytes steps, strength {1:d}'.format(
+                    step_size, strength))
+        self.step_size = step_size
+        self.strength = strength
+        self.m = m
+        self._field_size = (1 << m) - 1
+
+        # Exponential & logarithm tables of GF(2^m)
+        self._exp = [0] * (2 * self._field_size)
+        self._log = [0] * (self._field_size + 1)
+        element = 1
+        for power in range(self._field_size):
+            self._exp[power] = self._exp[power + self._field_size] = element
+            self._log[element] = power
+            element <<= 1
+            if element >> m:
+                element ^= PRIMITIVE_POLYNOMIALS[m]
+        self._exp_array = numpy.array(self._exp, dtype=numpy.int64)
+
+        self._generator = self._GeneratorPolynomial()
+        self.ecc_bits = self._generator.bit_length() - 1
+        if self.ecc_bits + step_size * 8 > self._field_size:
+            raise errors.YandException(
+                'Steps of {0:d} bytes are too long for GF(2^{1:d})'.format(step_size, m))
+        self.ecc_size = (self.ecc_bits + 7) // 8
+        self._ecc_padding = self.ecc_size * 8 - self.ecc_bits
+        self._words = (self.ecc_size + 7) // 8
+        self._tables = self._ByteTables()
+        # Number of steps encoded at once, to bound memory use
+        self._batch_steps = max(1, (1 << 20) // step_size)
+        # The inverted ECC of an erased step, computed without a mask.
+        self._ecc_mask = numpy.zeros(self.ecc_size, dtype=numpy.uint8)
+        self._ecc_mask = ~self.CalculateEcc(numpy.full((1, step_size), 0xFF, dtype=numpy.uint8))[0]
+
+    def _GeneratorPolynomial(self):
+        """Returns the generator polynomial, as the product of the minimal polynomials of
+        alpha^1 ... alpha^(2 * strength).
+        """
+        generator = 1
+        done = set()
+        for power in range(1, 2 * self.strength, 2):
+            if power in done:
+                continue
+            # Coefficients, lowest degree first, of the product of (x + alpha^conjugate)
+            minimal = [1]
+            conjugate = power
+            while conjugate not in done:
+                done.add(conjugate)
+                root = self._exp[conjugate]
+                product = [0] + minimal
+                for degree, coefficient in enumerate(minimal):
+                    product[degree] ^= self._Multiply(coefficient, root)
+                minimal = product
+                conjugate = (conjugate * 2) % self._field_size
+            minimal_bits = sum(coefficient << degree for degree, coefficient in enumerate(minimal))
+            generator = _CarrylessMultiply(generator, minimal_bits)
+        return generator
+
+    def _Multiply(self, a, b):
+        if not a or not b:
+            return 0
+        return self._exp[self._log[a] + self._log[b]]
+
+    def _ByteTables(self):
+        """Returns the ECC of every byte value at every offset of a step.
+
+        Returns:
+            list(numpy.ndarray): the ECC bytes, zero padded to a number of 64 bits words. There
+                is one uint64 table per word, indexed by offset * 256 + byte value.
+        """
+        degree_mask = (1 << self.ecc_bits) - 1
+        remainder = self._generator ^ (1 << self.ecc_bits)
+        bit_eccs = bytearray()
+        for _ in range(self.step_size * 8):
+            ecc = (remainder << self._ecc_padding).to_bytes(self.ecc_size, 'big')
+            bit_eccs += ecc.ljust(self._words * 8, b'\x00')
+            remainder <<= 1
+            if remainder >> self.ecc_bits:
+                remainder = (remainder ^ self._generator) & degree_mask
+        # bit_eccs has the ECC of every bit, from the last bit of the step, upwards.
+        bit_tables = numpy.frombuffer(bytes(bit_eccs), dtype=numpy.uint64).reshape(
+            (self.step_size, 8, self._words))[::-1]
+        tables = numpy.zeros((self.step_size, 256, self._words), dtype=numpy.uint64)
+        for bit in range(8):
+            tables[:, 1 << bit:2 << bit] = tables[:, :1 << bit] ^ bit_tables[:, bit, None, :]
+        # One contiguous table per word makes lookups much faster.
+        return [
+            numpy.ascontiguousarray(tables[:, :, word].ravel()) for word in range(self._words)]
+
+    def CalculateEcc(self, steps):
+        """Computes ECC bytes.
+
+        Args:
+            steps(numpy.ndarray): uint8 array of shape (number of steps, step_size).
+        Returns:
+            numpy.ndarray: uint8 array of shape (number of steps, ecc_size).
+        """
+        ecc = numpy.empty((len(steps), self._words), dtype=numpy.uint64)
+        offsets = (numpy.arange(self.step_size, dtype=numpy.int32) * 256)[None, :]
+        for start in range(0, len(steps), self._batch_steps):
+            indexes = steps[start:start + self._batch_steps].astype(numpy.int32) + offsets
+            for word, table in enumerate(self._tables):
+                ecc[start:start + len(indexes), word] = numpy.bitwise_xor.reduce(
+                    table[indexes], axis=1)
+        return ecc.view(numpy.uint8)[:, :self.ecc_size] ^ self._ecc_mask
+
+    def _CorrectStep(self, step, ecc_difference):
+        """Corrects one step, where the computed ECC differs from the stored one.
+
+        Args:
+            step(numpy.ndarray): the step data, corrected in place.
+            ecc_difference(numpy.ndarray): the computed ECC bytes XOR the stored ones.
+        Returns:
+            int: the number of bits corrected, or -1 if the step is uncorrectable.
+        """
+        # The masks cancel out, so the difference is the received codeword modulo the generator
+        # polynomial, which has the same value as the codeword at alpha^1 ... alpha^(2 * strength).
+        remainder = int.from_bytes(ecc_difference.tobytes(), 'big') >> self._ecc_padding
+        degrees = [degree for degree in range(self.ecc_bits) if remainder >> degree & 1]
+        syndromes = []
+        for power in range(1, 2 * self.strength + 1):
+            if power % 2:
+                syndrome = 0
+                for degree in degrees:
+                    syndrome ^= self._exp[(power * degree) % self._field_size]
+            else:
+                syndrome = self._Multiply(syndromes[power // 2 - 1], syndromes[power // 2 - 1])
+            syndromes.append(syndrome)
+
+        locator, errors_count = self._BerlekampMassey(syndromes)
+        if errors_count > self.strength or len(locator) - 1 != errors_count:
+            return -1
+        error_degrees = self._ChienSearch(locator)
+        if len(error_degrees) != errors_count:
+            return -1
+        for degree in error_degrees:
+            if degree >= self.ecc_bits:
+                bit = degree - self.ecc_bits
+                step[self.step_size - 1 - bit // 8] ^= 1 << (bit % 8)
+        return errors_count
+
+    def _BerlekampMassey(self, syndromes):
+        """Returns the error locator polynomial.
+
+        Returns:
+            tuple(list(int), int): the locator coefficients, lowest degree first, and the
+                number of errors it locates.
+        """
+        locator = [1]
+        previous = [1]
+        length = 0
+        previous_discrepancy = 1
+        shift = 1
+        for index, syndrome in enumerate(syndromes):
+            discrepancy = syndrome
+            for degree in range(1, min(len(locator), index + 1)):
+                discrepancy ^= self._Multiply(locator[degree], syndromes[index - degree])
+            if not discrepancy:
+                shift += 1
+                continue
+            scale = self._exp[
+                self._log[discrepancy] - self._log[previous_discrepancy] + self._field_size]
+            updated = locator + [0] * max(0, len(previous) + shift - len(locator))
+            for degree, coefficient in enumerate(previous):
+                updated[degree + shift] ^= self._Multiply(scale, coefficient)
+            if 2 * length <= index:
+                previous, previous_discrepancy, shift = locator, discrepancy, 1
+                length = index + 1 - length
+            else:
+                shift += 1
+            locator = updated
+        while len(locator) > 1 and not locator[-1]:
+            locator.pop()
+        return locator, length
+
+    def _ChienSearch(self, locator):
+        """Returns the degrees of the codeword bits in error, where the locator has a root."""
+        codeword_bits = self.step_size * 8 + self.ecc_bits
+        degrees = numpy.arange(codeword_bits, dtype=numpy.int64)
+        values = numpy.zeros(codeword_bits, dtype=numpy.int64)
+        for power, coefficient in enumerate(locator):
+            if coefficient:
+                values ^= self._exp_array[
+                    (self._log[coefficient] - degrees * power) % self._field_size]
+        return [int(degree) for degree in numpy.flatnonzero(values == 0)]
+
+
+def _CarrylessMultiply(a, b):
+    """Multiplies two polynomials over GF(2), represented as integers."""
+    product = 0
+    while b:
+        if b & 1:
+            product ^= a
+        a <<= 1
+        b >>= 1
+    return product
+
+
+def ParseScheme(scheme_string, step_size=None):
+    """Returns an ECC scheme from its description.
+
+    Args:
+        scheme_string(str): either 'hamming', or 'bch:STRENGTH'.
+        step_size(int): length of user data covered by one ECC. Default is 256 for Hamming, and
+            512 for BCH.
+    Returns:
+        EccScheme: the scheme.
+    Raises:
+        errors.YandException: if the description is invalid.
+    """
+    name, *parameters = scheme_string.split(':')
+    try:
+        if name == 'hamming' and not parameters:
+            return HammingEcc(step_size or 256)
+        if name == 'bch' and len(parameters) == 1:
+            return BchEcc(step_size or 512, int(parameters[0]))
+    except ValueError as value_error:
+        raise errors.YandException(
+            'Invalid ECC scheme \'{0:s}\''.format(scheme_string)) from value_error
+    raise errors.YandException(
+        'Invalid ECC scheme \'{0:s}\', expected \'hamming\' or \'bch:STRENGTH\''.format(
+            scheme_string))
+
+
+class EccEngine:
+    """Checks and corrects whole pages.
+
+    The ECC bytes of every step are stored one after the other in the spare area, from
+    `ecc_offset`.
+    """
+
+    def __init__(self, scheme, page_layout, ecc_offset=None):
+        """Initializes a EccEngine object.
+
+        Args:
+            scheme(EccScheme): the error correcting code.
+            page_layout(layout.PageLayout): where user data and spare bytes are in a page.
+            ecc_offset(int): offset of the ECC bytes in the spare area. Default is to have
+                them at the end of the spare area.
+        Raises:
+            errors.YandException: if the ECC doesn't fit the page.
+        """
+        user_size = len(page_layout.data_indexes)
+        oob_size = len(page_layout.oob_indexes)
+        if user_size % scheme.step_size:
+            raise errors.YandException(
+                'User data size ({0:d}) is not a multiple of ECC step size ({1:d})'.format(
+                    user_size, scheme.step_size))
+        self.steps = user_size // scheme.step_size
+        ecc_length = self.steps * scheme.ecc_size
+        if ecc_offset is None:
+            ecc_offset = oob_size - ecc_length
+        if ecc_offset < 0 or ecc_offset + ecc_length > oob_size:
+            raise errors.YandException(
+                '{0:d} ECC bytes at offset {1:d} do not fit in {2:d} OOB bytes'.format(
+                    ecc_length, ecc_offset, oob_size))
+        self.scheme = scheme
+        self.page_size = page_layout.page_size
+        self._data_indexes = page_layout.data_indexes
+        self._ecc_indexes = page_layout.oob_indexes[ecc_offset:ecc_offset + ecc_length]
+
+    @classmethod
+    def FromString(
+            cls, scheme_string, page_size, oob_size, step_size=None, layout_string='raw',
+            ecc_offset=None):
+        """Returns an engine from option strings.
+
+        Args:
+            scheme_string(str): the ECC scheme, see ParseScheme.
+            page_size(int): length of a page (userdata + oob).
+            oob_size(int): length of the spare area.
+            step_size(int): length of user data covered by one ECC.
+            layout_string(str): the page layout, see layout.PageLayout.FromString.
+            ecc_offset(int): offset of the ECC bytes in the spare area.
+        Returns:
+            EccEngine: the engine.
+        """
+        return cls(
+            ParseScheme(scheme_string, step_size),
+            layout.PageLayout.FromString(layout_string, page_size, oob_size),
+            ecc_offset=ecc_offset)
+
+    def CorrectPages(self, pages):
+        """Checks pages, and corrects them in place.
+
+        Args:
+            pages(numpy.ndarray): uint8 array of shape (number of pages, page size).
+        Returns:
+            numpy.ndarray: one STATUS_DTYPE record per page.
+        """
+        number_of_pages = len(pages)
+        steps = pages[:, self._data_indexes].reshape((-1, self.scheme.step_size))
+        stored_ecc = pages[:, self._ecc_indexes].reshape((-1, self.scheme.ecc_size))
+        bitflips, erased = self.scheme.CorrectSteps(steps, stored_ecc)
+
+        bitflips = bitflips.reshape((number_of_pages, self.steps))
+        corrected_pages = numpy.flatnonzero((bitflips > 0).any(axis=1))
+        if len(corrected_pages):
+            pages[corrected_pages[:, None], self._data_indexes[None, :]] = steps.reshape(
+                (number_of_pages, -1))[corrected_pages]
+
+        statuses = numpy.zeros(number_of_pages, dtype=STATUS_DTYPE)
+        statuses['corrected'] = numpy.where(bitflips > 0, bitflips, 0).sum(axis=1)
+        statuses['max_bitflips'] = bitflips.max(axis=1).clip(0)
+        statuses['uncorrectable'] = (bitflips < 0).sum(axis=1)
+        statuses['erased'] = erased.reshape((number_of_pages, self.steps)).all(axis=1)
+        return statuses
+
+    def CorrectBuffer(self, data):
+        """Checks pages, and corrects them in place.
+
+        Args:
+            data(bytearray): the content of consecutive pages.
+        Returns:
+            numpy.ndarray: one STATUS_DTYPE record per page.
+        """
+        pages = numpy.frombuffer(data, dtype=numpy.uint8).reshape((-1, self.page_size))
+        return self.CorrectPages(pages)
+
+
+# ECC engine, memory mapped dump, and destination file descriptor of a correction worker process
+_worker_engine = None
+_worker_source = None
+_worker_destination = None
+
+
+def _InitCorrectionWorker(engine, source_path, destination_path):
+    global _worker_engine, _worker_source, _worker_destination  # pylint: disable=global-statement
+    _worker_engine = engine
+    with open(source_path, 'rb') as source_file:
+        _worker_source = numpy.frombuffer(
+            mmap.mmap(source_file.fileno(), 0, access=mmap.ACCESS_READ), dtype=numpy.uint8)
+    if destination_path:
+        _worker_destination = os.open(destination_path, os.O_WRONLY)
+
+
+def _CorrectChunk(start_page, end_page):
+    page_size = _worker_engine.page_size
+    pages = _worker_source[start_page * page_size:end_page * page_size].reshape(
+        (-1, page_size)).copy()
+    statuses = _worker_engine.CorrectPages(pages)
+    if _worker_destination is not None:
+        data = memoryview(pages).cast('B')
+        offset = start_page * page_size
+        while data:
+            written = os.pwrite(_worker_destination, data, offset)
+            data = data[written:]
+            offset += written
+    return start_page, statuses
+
+
+def CorrectDump(
+        dump_path, engine, destination_path=None, workers=None, chunk_pages=1024,
+        progress_callback=None):
+    """Checks every page of a dump, and optionally writes a corrected copy.
+
+    Args:
+        dump_path(str): path to the raw dump.
+        engine(EccEngine): the ECC engine.
+        destination_path(str): where to write the corrected dump.
+        workers(int): number of worker processes. Default is the number of CPUs.
+        chunk_pages(int): number of pages checked by a worker at once.
+        progress_callback(callable): called with the number of pages checked.
+    Returns:
+        numpy.ndarray: one STATUS_DTYPE record per page.
+    Raises:
+        errors.YandException: if the dump size is not a multiple of the page size.
+    """
+    dump_size = os.stat(dump_path).st_size
+    if dump_size % engine.page_size:
+        raise errors.YandException(
+            '{0:s} size ({1:d}) is not a multiple of page size ({2:d})'.format(
+                dump_path, dump_size, engine.page_size))
+    total_pages = dump_size // engine.page_size
+    statuses = numpy.zeros(total_pages, dtype=STATUS_DTYPE)
+    if destination_path:
+        with open(destination_path, 'wb') as destination_file:
+            destination_file.truncate(dump_size)
+    if not total_pages:
+        return statuses
+
+    with concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers, initializer=_InitCorrectionWorker,
+            initargs=(engine, dump_path, destination_path)) as executor:
+        futures = [
+            executor.submit(
+                _CorrectChunk, start_page, min(start_page + chunk_pages, total_pages))
+            for start_page in range(0, total_pages, chunk_pages)]
+        for future in concurrent.futures.as_completed(futures):
+            start_page, chunk_statuses = future.result()
+            statuses[start_page:start_page + len(chunk_statuses)] = chunk_statuses
+            if progress_callback:
+                progress_callback(len(chunk_statuses))
+    return statuses
@@ -0,0 +1,201 @@
+"""Tests for the ecc module."""
+
+import os
+import tempfile
+import unittest
+
+import numpy
+
+from yand import ecc
+from yand import errors
+from yand import layout
+from yand import test_lib
+
+
+def _FlipBits(data, bits):
+    """Flips bits of a uint8 array in place."""
+    for bit in bits:
+        data[bit // 8] ^= 1 << (bit % 8)
+
+
+class FakeNand(test_lib.FakeNand):
+    """FakeNand with 2 bitflips in the first read of some pages."""
+
+    def __init__(self, pages, corrupted_pages):
+        super().__init__(pages.shape[1], len(pages), 1, data=pages)
+        self.corrupted_pages = corrupted_pages
+
+    def ReadPage(self, page_number):
+        """Returns the content of a page."""
+        first_read = page_number not in self.pages_read
+        page = super().ReadPage(page_number)
+        if page_number in self.corrupted_pages and first_read:
+            page[0] ^= 0x03
+        return page
+
+
+class EccTest(unittest.TestCase):
+    """Tests for the ecc module"""
+
+    def setUp(self):
+        self.random = numpy.random.default_rng(0)
+
+    def _RandomSteps(self, scheme, count):
+        return self.random.integers(0, 256, (count, scheme.step_size), dtype=numpy.uint8)
+
+    def testHamming(self):
+        """Tests HammingEcc."""
+        for step_size in (256, 512):
+            scheme = ecc.HammingEcc(step_size)
+            steps = numpy.zeros((2, step_size), dtype=numpy.uint8)
+            steps[1] = 0xFF
+            self.assertEqual(scheme.CalculateEcc(steps).tobytes(), b'\xff' * 6)
+
+            steps = self._RandomSteps(scheme, 4)
+            stored_ecc = scheme.CalculateEcc(steps)
+            corrupted = steps.copy()
+            _FlipBits(corrupted[1], [step_size * 8 - 1])
+            _FlipBits(corrupted[2], [3, 1000])
+            stored_ecc[3, 2] ^= 0x80
+            bitflips, erased = scheme.CorrectSteps(corrupted, stored_ecc)
+            self.assertEqual(list(bitflips), [0, 1, -1, 1])
+            self.assertFalse(erased.any())
+            numpy.testing.assert_array_equal(corrupted[[0, 1, 3]], steps[[0, 1, 3]])
+
+        with self.assertRaises(errors.YandException):
+            ecc.HammingEcc(1024)
+
+    def testHammingKnownAnswers(self):
+        """Tests HammingEcc against the ECC of the Linux kernel software Hamming code."""
+        # A single bit set, at the first and last offsets: the kernel stores the inverted line
+        # parities rp15..rp8 then rp7..rp0, and the inverted column parities (rp17 & rp16 for
+        # 512 bytes steps).
+        for step_size, offset, value, expected_ecc in [
+                (256, 0, 0x01, b'\xaa\xaa\xab'), (256, 255, 0x80, b'\x55\x55\x57'),
+                (512, 511, 0x80, b'\x55\x55\x55')]:
+            scheme = ecc.HammingEcc(step_size)
+            steps = numpy.zeros((1, step_size), dtype=numpy.uint8)
+            steps[0, offset] = value
+            self.assertEqual(scheme.CalculateEcc(steps).tobytes(), expected_ecc)
+
+    def testBch(self):
+        """Tests BchEcc."""
+        scheme = ecc.BchEcc(512, 8)
+        self.assertEqual(scheme.m, 13)
+        self.assertEqual(scheme.ecc_bits, 104)
+        self.assertEqual(scheme.ecc_size, 13)
+
+        steps = self._RandomSteps(scheme, 20)
+        stored_ecc = scheme.CalculateEcc(steps)
+        # Every codeword, without the ECC mask, is a multiple of the generator polynomial.
+        codeword = int.from_bytes(
+            steps[0].tobytes() + (stored_ecc[0] ^ scheme._ecc_mask).tobytes(), 'big')  # pylint: disable=protected-access
+        remainder = codeword
+        for degree in range(remainder.bit_length() - 1, scheme.ecc_bits - 1, -1):
+            if remainder >> degree & 1:
+                remainder ^= scheme._generator << (degree - scheme.ecc_bits)  # pylint: disable=protected-access
+        self.assertEqual(remainder, 0)
+
+        corrupted = steps.copy()
+        expected_bitflips = []
+        for index in range(len(steps)):
+            bits = self.random.choice(512 * 8, index % 10, replace=False)
+            _FlipBits(corrupted[index], bits)
+            expected_bitflips.append(index % 10 if index % 10 <= 8 else -1)
+        bitflips, _ = scheme.CorrectSteps(corrupted, stored_ecc)
+        self.assertEqual(list(bitflips), expected_bitflips)
+        correctable = numpy.array(expected_bitflips) >= 0
+        numpy.testing.assert_array_equal(corrupted[correctable], steps[correctable])
+
+    def testBchKnownAnswers(self):
+        """Tests BchEcc against the ECC of the Linux kernel software BCH code."""
+        # Computed with the kernel BCH library (lib/bch.c), and masked as nand_bch does.
+        steps = numpy.tile(numpy.arange(256, dtype=numpy.uint8), 2)[None, :]
+        erased_steps = numpy.full((1, 512), 0xFF, dtype=numpy.uint8)
+        for strength, expected_ecc in [
+                (4, 'c4c32c9ec768ef'), (8, '46edc5b80cdebee92938a39761')]:
+            scheme = ecc.BchEcc(512, strength)
+            self.assertEqual(scheme.CalculateEcc(steps).tobytes().hex(), expected_ecc)
+            self.assertEqual(
+                scheme.CalculateEcc(erased_steps).tobytes(), b'\xff' * scheme.ecc_size)
+
+            corrupted = steps.copy()
+            _FlipBits(corrupted[0], [0, 4095])
+            stored_ecc = numpy.frombuffer(bytes.fromhex(expected_ecc), dtype=numpy.uint8)
+            bitflips, erased = scheme.CorrectSteps(corrupted, stored_ecc[None, :])
+            self.assertEqual((list(bitflips), list(erased)), ([2], [False]))
+            numpy.testing.assert_array_equal(corrupted, steps)
+
+    def testErased(self):
+        """Tests erased steps, with and without bitflips."""
+        scheme = ecc.BchEcc(512, 4)
+        steps = numpy.full((3, 512), 0xFF, dtype=numpy.uint8)
+        stored_ecc = numpy.full((3, scheme.ecc_size), 0xFF, dtype=numpy.uint8)
+        _FlipBits(steps[1], [5, 700])
+        _FlipBits(steps[2], range(0, 80, 8))
+        bitflips, erased = scheme.CorrectSteps(steps, stored_ecc)
+        self.assertEqual(list(bitflips), [0, 2, -1])
+        self.assertEqual(list(erased), [True, True, False])
+        self.assertTrue((steps[1] == 0xFF).all())
+
+    def testEngine(self):
+        """Tests EccEngine and CorrectDump, with a syndrome layout."""
+        page_layout = layout.PageLayout.Syndrome(1024 + 64, 64, 512, 13)
+        engine = ecc.EccEngine(ecc.BchEcc(512, 8), page_layout, ecc_offset=0)
+        with self.assertRaises(errors.YandException):
+            ecc.EccEngine(ecc.BchEcc(512, 8), page_layout, ecc_offset=50)
+        with self.assertRaises(errors.YandException):
+            ecc.EccEngine.FromString('bch', 1024 + 64, 64)
+
+        pages = numpy.full((6, 1024 + 64), 0xFF, dtype=numpy.uint8)
+        data = self.random.integers(0, 256, (5, 1024), dtype=numpy.uint8)
+        pages[:5, page_layout.data_indexes] = data
+        pages[:5, page_layout.oob_indexes[:26]] = engine.scheme.CalculateEcc(
+            data.reshape((-1, 512))).reshape((5, 26))
+        clean_pages = pages.copy()
+        _FlipBits(pages[1], [1, 2, 3])
+        pages[2, 0] ^= 0x01
+        pages[2, 600] ^= 0x01
+        pages[3, :100] ^= 0xFF
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            dump_path = os.path.join(temp_dir, 'dump.bin')
+            fixed_path = os.path.join(temp_dir, 'fixed.bin')
+            pages.tofile(dump_path)
+            statuses = ecc.CorrectDump(
+                dump_path, engine, destination_path=fixed_path, workers=2, chunk_pages=4)
+            fixed_pages = numpy.fromfile(fixed_path, dtype=numpy.uint8).reshape(pages.shape)
+
+        self.assertEqual(list(statuses['corrected']), [0, 3, 2, 0, 0, 0])
+        self.assertEqual(list(statuses['uncorrectable']), [0, 0, 0, 1, 0, 0])
+        self.assertEqual(list(statuses['erased']), [False] * 5 + [True])
+        numpy.testing.assert_array_equal(
+            fixed_pages[:, page_layout.data_indexes][[0, 1, 2, 4, 5]],
+            clean_pages[:, page_layout.data_indexes][[0, 1, 2, 4, 5]])
+        numpy.testing.assert_array_equal(fixed_pages[3], pages[3])
+
+    def testDumpFlashToFile(self):
+        """Tests correcting pages while dumping, and reading again uncorrectable ones."""
+        engine = ecc.EccEngine.FromString('hamming', 512 + 16, 16)
+        pages = numpy.full((100, 512 + 16), 0xFF, dtype=numpy.uint8)
+        pages[:, :512] = self.random.integers(0, 256, (100, 512), dtype=numpy.uint8)
+        pages[:, 16 - 6 + 512:] = engine.scheme.CalculateEcc(
+            pages[:, :512].reshape((-1, 256))).reshape((100, 6))
+        nand = FakeNand(pages, corrupted_pages=[3, 70])
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            dump_path = os.path.join(temp_dir, 'dump.bin')
+            self.assertEqual(nand.DumpFlashToFile(dump_path, ecc_engine=engine), 0)
+            with open(dump_path, 'rb') as dump_file:
+                self.assertEqual(dump_file.read(), pages.tobytes())
+        self.assertEqual(nand.pages_read, list(range(64)) + [3] + list(range(64, 100)) + [70])
+
+        # Page 5 always reads with 2 bitflips in its first step.
+        nand = FakeNand(pages.copy(), corrupted_pages=[])
+        nand.pages[5, 0] ^= 0x03
+        with tempfile.TemporaryDirectory() as temp_dir:
+            dump_path = os.path.join(temp_dir, 'dump.bin')
+            with self.assertLogs(level='WARNING'):
+                self.assertEqual(nand.DumpFlashToFile(
+                    dump_path, end_page=10, ecc_engine=engine, ecc_retries=2), 1)
+        self.assertEqual(nand.pages_read, list(range(10)) + [5, 5])
@@ -0,0 +1,176 @@
+"""Erases blocks in large batches of commands, checking their status afterwards.
+
+Every erase is queued with a wait for the Flash to be ready, and a status read. The FTDI device
+runs a whole batch on its own, while the next one is sent, so erasing is bounded by the erase
+time of the Flash (tBERS), not by USB round trips.
+"""
+
+import logging
+import os
+
+from yand import errors
+
+# Status register bits
+STATUS_FAIL = 0x01
+STATUS_READY = 0x40
+
+
+def LoadBadBlocks(path):
+    """Reads a bad block list file.
+
+    The file has one block number per line. Empty lines, and text after a '#', are ignored.
+
+    Args:
+        path(str): the file to read. A missing file is an empty list.
+    Returns:
+        set(int): the bad blocks.
+    Raises:
+        errors.YandException: if the file is not a valid bad block list.
+    """
+    bad_blocks = set()
+    if not os.path.exists(path):
+        return bad_blocks
+    with open(path, 'r', encoding='utf-8') as bad_blocks_file:
+        for line_number, line in enumerate(bad_blocks_file, start=1):
+            line = line.partition('#')[0].strip()
+            if not line:
+                continue
+            try:
+                bad_blocks.add(int(line, 0))
+            except ValueError as value_error:
+                raise errors.YandException(
+                    'Line {0:d} of {1:s}: invalid block number \'{2:s}\''.format(
+                        line_number, path, line)) from value_error
+    return bad_blocks
+
+
+def SaveBadBlocks(path, bad_blocks):
+    """Writes a bad block list file.
+
+    Args:
+        path(str): the file to write.
+        bad_blocks(iterable(int)): the bad blocks.
+    """
+    with open(path, 'w', encoding='utf-8') as bad_blocks_file:
+        bad_blocks_file.write('# yand bad blocks\n')
+        for block in sorted(bad_blocks):
+            bad_blocks_file.write('{0:d}\n'.format(block))
+
+
+class EraseEngine:
+    """Erases blocks of a NAND Flash, in pipelined batches."""
+
+    NAND_CMD_MULTI_PLANE_ERASE_START = 0xD1
+
+    # Number of blocks erased by a single batch of commands
+    BATCH_BLOCKS = 64
+
+    def __init__(self, nand, batch_blocks=None, multi_plane=True):
+        """Initializes an EraseEngine object.
+
+        Args:
+            nand(NandInterface): the NAND Flash to erase, already set up.
+            batch_blocks(int): number of blocks erased by a single batch of commands.
+            multi_plane(bool): whether to erase a block in every plane at once, when the Flash
+                supports it.
+        """
+        self.nand = nand
+        self.batch_blocks = batch_blocks or self.BATCH_BLOCKS
+        self.planes = nand.planes if multi_plane else 1
+        self.logger = logging.getLogger()
+
+    def _GroupBlocks(self, start_block, end_block, skip_blocks):
+        """Returns the groups of blocks to erase at once, one block per plane."""
+        groups = []
+        for block in range(start_block, end_block):
+            if block in skip_blocks:
+                continue
+            if groups and groups[-1][-1] // self.planes == block // self.planes:
+                groups[-1].append(block)
+            else:
+                groups.append([block])
+        return groups
+
+    def QueueErase(self, batch, blocks):
+        """Queues erasing blocks of different planes at once, then reading the status.
+
+        Args:
+            batch(ftdi_device.CommandBatch): the batch to queue commands in.
+            blocks(list(int)): the blocks to erase, one per plane.
+        """
+        for index, block in enumerate(blocks):
+            row = block * self.nand.pages_per_block
+            batch.Write(bytearray([self.nand.NAND_CMD_ERASE]), command=True)
+            batch.Write(
+                row.to_bytes(8, byteorder='little')[:self.nand.row_address_cycles], address=True)
+            if index == len(blocks) - 1:
+                batch.Write(bytearray([self.nand.NAND_CMD_ERASE_START]), command=True)
+            else:
+                batch.Write(bytearray([self.NAND_CMD_MULTI_PLANE_ERASE_START]), command=True)
+            batch.WaitReady()
+        batch.Write(bytearray([self.nand.NAND_CMD_STATUS]), command=True)
+        batch.Read(1)
+
+    def _SendBatch(self, groups):
+        """Sends the commands erasing groups of blocks, and returns the batch."""
+        batch = self.nand.ftdi_device.NewBatch()
+        batch.write_protect = False
+        for blocks in groups:
+            self.QueueErase(batch, blocks)
+        self.nand.ftdi_device.SendBatch(batch)
+        return batch
+
+    def _CheckBatch(self, batch, groups):
+        """Reads the statuses of a batch sent, and returns the groups to erase again."""
+        statuses = self.nand.ftdi_device.ReadBatchResult(batch)
+        retry_groups = []
+        for blocks, status in zip(groups, statuses):
+            if status & STATUS_READY and not status & STATUS_FAIL:
+                self.logger.debug('erased blocks {0:s}'.format(
+                    ', '.join(str(block) for block in blocks)))
+                continue
+            self.logger.debug('erasing blocks {0:s} returned status 0x{1:02x}'.format(
+                ', '.join(str(block) for block in blocks), status))
+            retry_groups.extend([block] for block in blocks)
+        return retry_groups
+
+    def Erase(self, start_block, end_block, skip_blocks=None, progress_callback=None):
+        """Erases blocks.
+
+        Blocks which fail as part of a multi-plane erase, or whose status could not be read,
+        are erased again one at a time.
+
+        Args:
+            start_block(int): erase from this block number.
+            end_block(int): erase up to this block (excluded).
+            skip_blocks(set(int)): blocks not to erase, such as known bad blocks.
+            progress_callback(callable): called with the number of blocks erased.
+        Returns:
+            list(int): the blocks which failed to erase.
+        """
+        groups = self._GroupBlocks(start_block, end_block, skip_blocks or set())
+        groups_per_batch = max(1, self.batch_blocks // self.planes)
+
+        retry_groups = []
+        pending = None
+        for index in range(0, len(groups), groups_per_batch):
+            batch_groups = groups[index:index + groups_per_batch]
+            batch = self._SendBatch(batch_groups)
+            # The previous batch ran while this one was being sent.
+            if pending:
+                retry_groups += self._CheckBatch(*pending)
+                if progress_callback:
+                    progress_callback(sum(len(blocks) for blocks in pending[1]))
+            pending = (batch, batch_groups)
+        if pending:
+            retry_groups += self._CheckBatch(*pending)
+            if progress_callback:
+                progress_callback(sum(len(blocks) for blocks in pending[1]))
+
+        failed_blocks = []
+        for blocks in retry_groups:
+            if not self._CheckBatch(self._SendBatch([blocks]), [blocks]):
+                continue
+            failed_blocks.append(blocks[0])
+            self.logger.warning('Block {0:d} failed to erase'.format(blocks[0]))
+        return failed_blocks
@@ -0,0 +1,74 @@
+"""Tests for the erase module."""
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from yand import erase
+from yand import errors
+from yand import ftdi_device
+from yand import nand_interface
+from yand import test_lib
+
+
+class EraseTest(unittest.TestCase):
+    """Tests for the erase module"""
+
+    def _NewNand(self, fake_ftdi):
+        nand = nand_interface.NandInterface()
+        nand.ftdi_device = ftdi_device.FtdiDevice()
+        nand.ftdi_device.ftdi = fake_ftdi
+        nand.page_size = 2048 + 64
+        nand.oob_size = 64
+        nand.pages_per_block = 64
+        nand.number_of_blocks = 300
+        nand.planes = 2
+        nand.progress_bar_class = mock.MagicMock()
+        return nand
+
+    def testErase(self):
+        """Tests NandInterface.Erase with multi-plane erase, and failing blocks."""
+        fake_ftdi = test_lib.FakeFtdi(
+            2048 + 64, 64, 300, bad_blocks=[10], multi_plane_bad_blocks=[21])
+        nand = self._NewNand(fake_ftdi)
+        with self.assertLogs(level='WARNING'):
+            self.assertEqual(nand.Erase(skip_blocks={7}), [10])
+
+        erased_blocks = [block for blocks in fake_ftdi.erased for block in blocks]
+        self.assertEqual(sorted(set(erased_blocks)), [block for block in range(300) if block != 7])
+        self.assertEqual(fake_ftdi.erased[:6], [(0, 1), (2, 3), (4, 5), (6,), (8, 9), (10, 11)])
+        self.assertEqual(fake_ftdi.erased[-4:], [(10,), (11,), (20,), (21,)])
+        # 150 erase groups, in batches of 32, then one write per block erased again.
+        self.assertEqual(fake_ftdi.writes, 5 + 4)
+
+        fake_ftdi = test_lib.FakeFtdi(2048 + 64, 64, 300)
+        engine = erase.EraseEngine(self._NewNand(fake_ftdi), batch_blocks=16, multi_plane=False)
+        progress_callback = mock.MagicMock()
+        self.assertEqual(engine.Erase(3, 40, progress_callback=progress_callback), [])
+        self.assertEqual(fake_ftdi.erased, [(block,) for block in range(3, 40)])
+        self.assertEqual(fake_ftdi.writes, 3)
+        self.assertEqual(
+            [call.args[0] for call in progress_callback.call_args_list], [16, 16, 5])
+
+    def testTimeout(self):
+        """Tests a device not returning the statuses."""
+        nand = self._NewNand(mock.MagicMock())
+        nand.ftdi_device.ftdi.read_data_bytes.return_value = bytearray()
+        with mock.patch.object(ftdi_device.FtdiDevice, 'BUSY_TIMEOUT', 0):
+            with self.assertRaises(errors.YandException):
+                nand.Erase(0, 4)
+
+    def testBadBlocks(self):
+        """Tests LoadBadBlocks and SaveBadBlocks."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, 'bad_blocks.txt')
+            self.assertEqual(erase.LoadBadBlocks(path), set())
+            erase.SaveBadBlocks(path, {12, 3})
+            with open(path, 'a', encoding='utf-8') as bad_blocks_file:
+                bad_blocks_file.write('\n0x20  # factory marked\n')
+            self.assertEqual(erase.LoadBadBlocks(path), {3, 12, 32})
+            with open(path, 'a', encoding='utf-8') as bad_blocks_file:
+                bad_blocks_file.write('block 4\n')
+            with self.assertRaises(errors.YandException):
+                erase.LoadBadBlocks(path)
@@ -0,0 +1,192 @@
+"""Drives several FTDI devices concurrently, one worker process per device."""
+
+import logging
+import multiprocessing
+import os
+import queue
+
+# Make dynamic_ncols True for all progress bars
+from functools import partial
+from tqdm import tqdm as std_tqdm
+
+from yand import batch
+from yand import errors
+from yand import ftdi_device
+from yand import nand_interface
+
+tqdm = partial(std_tqdm, dynamic_ncols=True)
+
+
+class QueueProgressBar:
+    """Progress bar sending its updates to the farm main process."""
+
+    def __init__(self, progress_queue, name, total=None, **_):
+        """Initializes a QueueProgressBar object.
+
+        Args:
+            progress_queue(multiprocessing.Queue): where to send updates.
+            name(str): the name of the device.
+            total(int): the amount of bytes the operation will process.
+        """
+        self.progress_queue = progress_queue
+        self.name = name
+        self.progress_queue.put(('start', self.name, total))
+
+    def update(self, amount):  # pylint: disable=invalid-name
+        """Sends a progress update.
+
+        Args:
+            amount(int): the amount of bytes processed since the last update.
+        """
+        self.progress_queue.put(('update', self.name, amount))
+
+
+class FarmJob:
+    """A batch job to run on one specific device."""
+
+    def __init__(self, device_spec, job_filename):
+        """Initializes a FarmJob object.
+
+        Args:
+            device_spec(str): the device to use, see FtdiDevice.FromSpec().
+            job_filename(str): path to the batch job file to run on that device.
+        """
+        self.device_spec = device_spec
+        self.job_filename = job_filename
+
+    @classmethod
+    def FromString(cls, job_string):
+        """Returns a FarmJob from a "DEVICE=JOB_FILE" string.
+
+        Args:
+            job_string(str): the job description.
+        Returns:
+            FarmJob: the job.
+        Raises:
+            errors.YandException: if the description is invalid.
+        """
+        device_spec, sep, job_filename = job_string.partition('=')
+        if not (sep and device_spec and job_filename):
+            raise errors.YandException(
+                'Invalid farm job \'{0:s}\', expected DEVICE=JOB_FILE'.format(job_string))
+        return cls(device_spec, job_filename)
+
+
+def RunFarmJob(job, geometry, log_filename, progress_queue, write_check=False):
+    """Runs a batch job on its device. This is the entry point of worker processes.
+
+    Args:
+        job(FarmJob): the job to run.
+        geometry(dict): NandInterface attributes to set before setting the Flash up.
+        log_filename(str): where to log debug information for this device.
+        progress_queue(multiprocessing.Queue): where to send progress and result messages.
+        write_check(bool): Whether to check every page written.
+    """
+    logger = logging.getLogger()
+    if log_filename:
+        handler = logging.FileHandler(log_filename)
+        handler.setFormatter(logging.Formatter('%(asctime)s %(message)s', '[%Y-%m-%d %H:%M:%S]'))
+        logger.handlers = [handler]
+        logger.setLevel(logging.DEBUG)
+
+    error = None
+    try:
+        with open(job.job_filename, 'r', encoding='utf-8') as job_file:
+            operations = batch.ParseJobFile(job_file)
+        nand = nand_interface.NandInterface()
+        for attribute, value in geometry.items():
+            setattr(nand, attribute, value)
+        nand.ftdi_device = ftdi_device.FtdiDevice.FromSpec(job.device_spec)
+        nand.progress_bar_class = partial(QueueProgressBar, progress_queue, job.device_spec)
+        nand.Setup()
+        logger.debug('Chip info: {0:s}'.format(nand.GetInfos()))
+        if not batch.BatchRunner(nand, write_check=write_check).Run(operations):
+            error = 'some verify operations failed'
+    except Exception as exception:  # pylint: disable=broad-except
+        logger.exception('Job {0:s} failed'.format(job.job_filename))
+        error = str(exception) or exception.__class__.__name__
+    progress_queue.put(('done', job.device_spec, error))
+
+
+class Farm:
+    """Runs jobs on several devices concurrently, and shows their progress."""
+
+    def __init__(self, geometry=None, log_filename=None, write_check=False):
+        """Initializes a Farm object.
+
+        Args:
+            geometry(dict): NandInterface attributes to set on every device, if the Flash
+                can't be detected with ONFI.
+            log_filename(str): base name for per device log files. 'yand.log' will log
+                device '1:4' to 'yand.1-4.log'.
+            write_check(bool): Whether to check every page written.
+        """
+        self.geometry = geometry or {}
+        self.log_filename = log_filename
+        self.write_check = write_check
+
+    def GetLogFilename(self, device_spec):
+        """Returns the log file for a device.
+
+        Args:
+            device_spec(str): the device.
+        Returns:
+            str: the path to the log file, or None.
+        """
+        if not self.log_filename:
+            return None
+        base, extension = os.path.splitext(self.log_filename)
+        return '{0:s}.{1:s}{2:s}'.format(base, device_spec.replace(':', '-'), extension)
+
+    def Run(self, jobs):
+        """Runs all jobs, and waits for them to finish.
+
+        Args:
+            jobs(list(FarmJob)): the jobs. There must be only one job per device.
+        Returns:
+            dict: error message (or None on success) per device.
+        Raises:
+            errors.YandException: if one device has more than one job.
+        """
+        device_specs = [job.device_spec for job in jobs]
+        if len(set(device_specs)) != len(device_specs):
+            raise errors.YandException('Only one job per device can run in a farm')
+
+        progress_queue = multiprocessing.Queue()
+        workers = {}
+        progress_bars = {}
+        for position, job in enumerate(jobs):
+            worker = multiprocessing.Process(
+                target=RunFarmJob,
+                args=(job, self.geometry, self.GetLogFilename(job.device_spec), progress_queue,
+                      self.write_check),
+                name='yand-{0:s}'.format(job.device_spec))
+            worker.start()
+            workers[job.device_spec] = worker
+            progress_bars[job.device_spec] = tqdm(
+                desc=job.device_spec, position=position, unit_scale=True, unit_divisor=1024,
+                unit='B')
+
+        results = {}
+        while len(results) < len(workers):
+            try:
+                message, device_spec, value = progress_queue.get(timeout=1)
+            except queue.Empty:
+                for device_spec, worker in workers.items():
+                    if device_spec not in results and not worker.is_alive():
+                        results[device_spec] = 'worker exited with code {0!s}'.format(
+                            worker.exitcode)
+                continue
+            progress_bar = progress_bars[device_spec]
+            if message == 'start':
+                progress_bar.reset(total=value)
+            elif message == 'update':
+                progress_bar.update(value)
+            elif message == 'done':
+                results[device_spec] = value
+                progress_bar.set_postfix_str(value or 'done')
+
+        for device_spec, worker in workers.items():
+            worker.join()
+            progress_bars[device_spec].close()
+        return results
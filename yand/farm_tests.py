@@ -0,0 +1,49 @@
+"""Tests for the farm module."""
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from yand import errors
+from yand import farm
+from yand import ftdi_device
+
+
+class FarmTest(unittest.TestCase):
+    """Tests for the farm module"""
+
+    def testFarmJob(self):
+        """Tests FarmJob.FromString and device specifications."""
+        job = farm.FarmJob.FromString('1:12=jobs/dump.job')
+        self.assertEqual(job.device_spec, '1:12')
+        self.assertEqual(job.job_filename, 'jobs/dump.job')
+        device = ftdi_device.FtdiDevice.FromSpec(job.device_spec)
+        self.assertEqual((device.bus, device.address, device.serial), (1, 12, None))
+
+        device = ftdi_device.FtdiDevice.FromSpec('FT4Z2XKA')
+        self.assertEqual((device.bus, device.address, device.serial), (None, None, 'FT4Z2XKA'))
+
+        with self.assertRaises(errors.YandException):
+            farm.FarmJob.FromString('jobs/dump.job')
+
+    def testRun(self):
+        """Tests Farm.Run error reporting."""
+        nand_farm = farm.Farm(log_filename='/tmp/yand.log')
+        self.assertEqual(nand_farm.GetLogFilename('1:12'), '/tmp/yand.1-12.log')
+        self.assertIsNone(farm.Farm().GetLogFilename('1:12'))
+
+        with self.assertRaises(errors.YandException):
+            nand_farm.Run([farm.FarmJob('1:12', 'a.job'), farm.FarmJob('1:12', 'b.job')])
+
+        with tempfile.TemporaryDirectory() as temp_dir, \
+                mock.patch.object(farm, 'tqdm') as tqdm_mock:
+            log_filename = os.path.join(temp_dir, 'yand.log')
+            results = farm.Farm(log_filename=log_filename).Run(
+                [farm.FarmJob('1:12', '/nonexistent/a.job')])
+            self.assertTrue(os.path.exists(os.path.join(temp_dir, 'yand.1-12.log')))
+        self.assertEqual(list(results.keys()), ['1:12'])
+        self.assertIn('No such file', results['1:12'])
+        progress_bar = tqdm_mock.return_value
+        progress_bar.set_postfix_str.assert_called_once_with(results['1:12'])
+        progress_bar.close.assert_called_once_with()
@@ -1,9 +1,75 @@
 """Classes for a FTDI device"""
 
+import time
+
 from pyftdi import ftdi
 
 from yand import errors
 
+class CommandBatch:
+    """MCU host bus commands queued to be sent to a FtdiDevice at once.
+
+    Attributes:
+        commands(bytearray): the queued commands.
+        read_size(int): the number of bytes the queued commands will read.
+        waits(int): the number of queued waits for the Flash to be ready.
+        write_protect(bool): whether writes are queued with write protect on.
+    """
+
+    def __init__(self, write_protect=True):
+        """Initializes a CommandBatch object.
+
+        Args:
+            write_protect(bool): whether writes are queued with write protect on.
+        """
+        self.commands = bytearray()
+        self.read_size = 0
+        self.waits = 0
+        self.write_protect = write_protect
+
+    def Write(self, data, command=False, address=False):
+        """Queues writing a set of bytes to the device.
+
+        Args:
+            data(bytearray): the data to write.
+            command(bool): if it is a command.
+            address(bool): if it is an address.
+        Raises:
+            errors.YandException: if both command & address types are set.
+        """
+        cmd_type = 0
+        if command and address:
+            raise errors.YandException('Can\'t set command and address latch simultaneously')
+        if command:
+            cmd_type |= 0x40
+        elif address:
+            cmd_type |= 0x80
+        if not self.write_protect:
+            cmd_type |= 0x20
+
+        self.commands += bytearray([ftdi.Ftdi.WRITE_EXTENDED, cmd_type, 0, data[0]])
+        # One WRITE_SHORT, 0, value command per following byte
+        short_writes = bytearray(3 * (len(data) - 1))
+        short_writes[0::3] = bytes([ftdi.Ftdi.WRITE_SHORT]) * (len(data) - 1)
+        short_writes[2::3] = data[1:]
+        self.commands += short_writes
+
+    def Read(self, size):
+        """Queues reading a set of bytes from the device.
+
+        Args:
+            size(int): the amount of bytes to read.
+        """
+        self.commands += bytearray([ftdi.Ftdi.READ_EXTENDED, 0, 0])
+        self.commands += bytearray([ftdi.Ftdi.READ_SHORT, 0]) * (size - 1)
+        self.read_size += size
+
+    def WaitReady(self):
+        """Queues waiting for the Flash to be ready (its R/B# line going high)."""
+        self.commands.append(ftdi.Ftdi.WAIT_ON_HIGH)
+        self.waits += 1
+
+
 class FtdiDevice:
     """Class for a Ftdi Device."""
 
@@ -11,11 +77,59 @@ class FtdiDevice:
     DEFAULT_USB_DEVICEID = 0x6010
     DEFAULT_INTERFACE_NUMBER = 1 # starts at 1
 
-    def __init__(self):
-        """Initializes a FtdiDevice object"""
+    # Seconds to wait for the results of each Flash operation of a batch
+    BUSY_TIMEOUT = 0.1
+
+    def __init__(self, serial=None, bus=None, address=None):
+        """Initializes a FtdiDevice object
+
+        Args:
+            serial(str): the USB serial number of the device to use.
+            bus(int): the USB bus of the device to use.
+            address(int): the USB address of the device to use, on that bus.
+        Without any of these, the first device found is used.
+        """
         self.ftdi = None
         self.write_protect = True
 
+        self.serial = serial
+        self.bus = bus
+        self.address = address
+
+    @classmethod
+    def ListDevices(cls):
+        """Lists the FTDI devices connected to the host.
+
+        Returns:
+            list(pyftdi.usbtools.UsbDeviceDescriptor): the devices found.
+        """
+        devices = ftdi.Ftdi.find_all([(cls.DEFAULT_USB_VENDOR, cls.DEFAULT_USB_DEVICEID)])
+        return sorted(
+            (descriptor for descriptor, _ in devices),
+            key=lambda descriptor: (descriptor.bus, descriptor.address))
+
+    @classmethod
+    def FromSpec(cls, spec):
+        """Returns a FtdiDevice object from a device specification.
+
+        Args:
+            spec(str): either a "bus:address" USB path, or a USB serial number.
+        Returns:
+            FtdiDevice: the device.
+        """
+        bus, sep, address = spec.partition(':')
+        if sep and bus.isdigit() and address.isdigit():
+            return cls(bus=int(bus), address=int(address))
+        return cls(serial=spec)
+
+    def GetName(self):
+        """Returns a string describing which device this is."""
+        if self.serial:
+            return self.serial
+        if self.bus is not None:
+            return '{0:d}:{1:d}'.format(self.bus, self.address or 0)
+        return 'default'
+
     def Setup(self):
         """Sets up the FTDI device."""
         self.ftdi = ftdi.Ftdi()
@@ -23,11 +137,14 @@ class FtdiDevice:
             self.ftdi.open(
                 self.DEFAULT_USB_VENDOR,
                 self.DEFAULT_USB_DEVICEID,
+                bus=self.bus,
+                address=self.address,
+                serial=self.serial,
                 interface=self.DEFAULT_INTERFACE_NUMBER)
         except OSError as oserror:
             raise errors.YandException(
-                'Could not open FTDI device\n'
-                'Check USB connections') from oserror
+                'Could not open FTDI device ({0:s})\n'
+                'Check USB connections'.format(self.GetName())) from oserror
 
         self.ftdi.set_bitmode(0, ftdi.Ftdi.BitMode.MCU)
         self.ftdi.write_data(bytearray([ftdi.Ftdi.DISABLE_CLK_DIV5]))
@@ -61,20 +178,9 @@ class FtdiDevice:
         Raises:
             errors.YandException: if both command & address types are set.
         """
-        cmd_type = 0
-        if command and address:
-            raise errors.YandException('Can\'t set command and address latch simultaneously')
-        if command:
-            cmd_type |= 0x40
-        elif address:
-            cmd_type |= 0x80
-        if not self.write_protect:
-            cmd_type |= 0x20
-
-        cmds = [ftdi.Ftdi.WRITE_EXTENDED, cmd_type, 0, data[0]]
-        for i in range(len(data)-1):
-            cmds += [ftdi.Ftdi.WRITE_SHORT, 0, data[i+1]]
-        self.ftdi.write_data(bytearray(cmds))
+        batch = self.NewBatch()
+        batch.Write(data, command=command, address=address)
+        self.ftdi.write_data(batch.commands)
 
     def Read(self, size):
         """Reads a set of bytes from the device.
@@ -84,12 +190,45 @@ class FtdiDevice:
         Returns:
             bytearray: the data.
         """
-        cmds = [ftdi.Ftdi.READ_EXTENDED, 0, 0]
-        for _ in range(size-1):
-            cmds += [ftdi.Ftdi.READ_SHORT, 0]
-        cmds.append(ftdi.Ftdi.SEND_IMMEDIATE)
+        batch = self.NewBatch()
+        batch.Read(size)
+        batch.commands.append(ftdi.Ftdi.SEND_IMMEDIATE)
 
-        self.ftdi.write_data(cmds)
+        self.ftdi.write_data(batch.commands)
 
         data = self.ftdi.read_data(size)
         return data
+
+    def NewBatch(self):
+        """Returns a new, empty, CommandBatch, using the current write protect state."""
+        return CommandBatch(write_protect=self.write_protect)
+
+    def SendBatch(self, batch):
+        """Sends all the commands of a batch, without waiting for their results.
+
+        The device runs them in order, while more commands can be sent.
+
+        Args:
+            batch(CommandBatch): the commands to send.
+        """
+        self.ftdi.write_data(batch.commands + bytearray([ftdi.Ftdi.SEND_IMMEDIATE]))
+
+    def ReadBatchResult(self, batch):
+        """Reads the bytes read by the commands of a batch already sent.
+
+        Args:
+            batch(CommandBatch): the batch sent with SendBatch.
+        Returns:
+            bytearray: the data.
+        Raises:
+            errors.YandException: if the device did not return the data in time.
+        """
+        data = bytearray()
+        deadline = time.monotonic() + self.BUSY_TIMEOUT * (batch.waits + 1)
+        while len(data) < batch.read_size:
+            data += self.ftdi.read_data_bytes(batch.read_size - len(data))
+            if len(data) < batch.read_size and time.monotonic() > deadline:
+                raise errors.YandException(
+                    'FTDI device returned {0:d} bytes out of {1:d}. Try restarting it.'.format(
+                        len(data), batch.read_size))
+        return data
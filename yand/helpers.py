@@ -22,19 +22,21 @@ class RingBytesIO(BytesIO):
     """Implements a 'ring' BytesIO, that starts from the beggining of the buffer when
     the end is reached."""
 
-    def seek(self, offset, whence):
-        super().seek(offset % len(self.getvalue()), whence)
+    def seek(self, offset, whence=SEEK_SET):
+        with self.getbuffer() as view:
+            return super().seek(offset % max(view.nbytes, 1), whence)
 
     def read(self, l):
-        res = b''
+        res = bytearray()
         while len(res) < l:
-            bytes_left = l - len(res)
-            r = super().read(bytes_left)
+            r = super().read(l - len(res))
+            if not r:
+                if super().tell() == 0:
+                    # Empty buffer
+                    break
+                super().seek(0, SEEK_SET)
             res += r
-            if len(r) < bytes_left:
-                self.seek(0, SEEK_SET)
-                res += super().read(l - len(res))
-        return res
+        return bytes(res)
 
 class PGMReader:
     """Context manager to get information about a PGM file."""
@@ -102,26 +104,25 @@ class PGMReader:
         Returns:
             bytearray: the data read from the picture, padded with 0xFF
         """
-        # Skip header
-        self.file.seek(self.header_length, SEEK_SET)
-        if y > self.height:
+        if y >= self.height:
             logging.debug((
                 'warning, reading more ({0:d}) than input picture height ({1:d})'
                 'returning 0x55s'
                 ).format(y, self.height))
             return bytearray([0x55]*length)
-        if x > self.width:
+        if x >= self.width:
             logging.debug((
                 'warning, reading more ({0:d}) than input picture width ({1:d})'
                 'returning 0xFFs'
-                ).format(x, self.height))
+                ).format(x, self.width))
             return bytearray([0xff]*length)
 
-        self.file.seek(y * self.width + x, SEEK_CUR) # We want to skip header
+        # Reading consecutive rows needs no seek
+        offset = self.header_length + y * self.width + x
+        if self.file.tell() != offset:
+            self.file.seek(offset, SEEK_SET)
 
-        amount_to_read = length
-        if x + length > self.width:
-            amount_to_read = self.width
+        amount_to_read = min(length, self.width - x)
 
         data = self.file.read(amount_to_read)
         return bytearray(data.ljust(length, b'\xff'))
@@ -0,0 +1,253 @@
+"""Page layouts, and conversion of dumps between them.
+
+A raw dump, as written by NandInterface.DumpFlashToFile, is made of pages where user data and
+spare (OOB) bytes are laid out depending on the NAND controller. This module extracts user data
+or spare bytes from dumps, or re-lays them out.
+"""
+
+import concurrent.futures
+import mmap
+import os
+
+import numpy
+
+from yand import errors
+
+MODE_DATA = 'data'
+MODE_OOB = 'oob'
+MODE_RELAYOUT = 'relayout'
+MODES = [MODE_DATA, MODE_OOB, MODE_RELAYOUT]
+
+
+class PageLayout:
+    """Where user data and spare bytes are in a page."""
+
+    def __init__(self, page_size, data_indexes, oob_indexes):
+        """Initializes a PageLayout object.
+
+        Args:
+            page_size(int): length of a page (userdata + oob).
+            data_indexes(numpy.ndarray): offsets of the user data bytes in the page, in order.
+            oob_indexes(numpy.ndarray): offsets of the spare bytes in the page, in order.
+        Raises:
+            errors.YandException: if the layout does not cover the page exactly.
+        """
+        self.page_size = page_size
+        self.data_indexes = numpy.asarray(data_indexes, dtype=numpy.int64)
+        self.oob_indexes = numpy.asarray(oob_indexes, dtype=numpy.int64)
+        covered = numpy.sort(numpy.concatenate([self.data_indexes, self.oob_indexes]))
+        if not numpy.array_equal(covered, numpy.arange(page_size)):
+            raise errors.YandException('Page layout does not cover every byte of the page once')
+
+    @classmethod
+    def Raw(cls, page_size, oob_size):
+        """Returns the layout where all user data is followed by all spare bytes.
+
+        Args:
+            page_size(int): length of a page (userdata + oob).
+            oob_size(int): length of the spare area.
+        Returns:
+            PageLayout: the layout.
+        """
+        user_size = page_size - oob_size
+        return cls(page_size, numpy.arange(user_size), numpy.arange(user_size, page_size))
+
+    @classmethod
+    def Syndrome(cls, page_size, oob_size, step_size, ecc_size):
+        """Returns the layout where each ECC step is followed by its ECC bytes.
+
+        The page is made of (step_size data bytes, ecc_size ECC bytes) for every step, then the
+        remaining spare bytes. Spare bytes are the ECC bytes of every step, followed by the
+        remaining ones.
+
+        Args:
+            page_size(int): length of a page (userdata + oob).
+            oob_size(int): length of the spare area.
+            step_size(int): length of user data covered by one ECC step.
+            ecc_size(int): length of the ECC bytes of one step.
+        Returns:
+            PageLayout: the layout.
+        Raises:
+            errors.YandException: if the steps don't fit in the page.
+        """
+        user_size = page_size - oob_size
+        if step_size <= 0 or user_size % step_size:
+            raise errors.YandException(
+                'User data size ({0:d}) is not a multiple of step size ({1:d})'.format(
+                    user_size, step_size))
+        steps = user_size // step_size
+        if steps * ecc_size > oob_size:
+            raise errors.YandException(
+                '{0:d} steps of {1:d} ECC bytes do not fit in {2:d} OOB bytes'.format(
+                    steps, ecc_size, oob_size))
+        step_starts = numpy.arange(steps) * (step_size + ecc_size)
+        data_indexes = (step_starts[:, None] + numpy.arange(step_size)[None, :]).ravel()
+        ecc_indexes = (step_starts[:, None] + step_size + numpy.arange(ecc_size)[None, :]).ravel()
+        free_indexes = numpy.arange(steps * (step_size + ecc_size), page_size)
+        return cls(page_size, data_indexes, numpy.concatenate([ecc_indexes, free_indexes]))
+
+    @classmethod
+    def FromString(cls, layout_string, page_size, oob_size):
+        """Returns a layout from its description.
+
+        Args:
+            layout_string(str): either 'raw', or 'syndrome:STEP_SIZE:ECC_SIZE'.
+            page_size(int): length of a page (userdata + oob).
+            oob_size(int): length of the spare area.
+        Returns:
+            PageLayout: the layout.
+        Raises:
+            errors.YandException: if the description is invalid.
+        """
+        name, *parameters = layout_string.split(':')
+        try:
+            if name == 'raw' and not parameters:
+                return cls.Raw(page_size, oob_size)
+            if name == 'syndrome' and len(parameters) == 2:
+                step_size, ecc_size = [int(parameter) for parameter in parameters]
+                return cls.Syndrome(page_size, oob_size, step_size, ecc_size)
+        except ValueError as value_error:
+            raise errors.YandException(
+                'Invalid layout \'{0:s}\''.format(layout_string)) from value_error
+        raise errors.YandException(
+            'Invalid layout \'{0:s}\', expected \'raw\' or \'syndrome:STEP_SIZE:ECC_SIZE\''.format(
+                layout_string))
+
+
+def _AsSlice(indexes):
+    """Returns a slice equivalent to indexes if they are contiguous, else the indexes.
+
+    Slicing gives a strided view, which is much cheaper to copy than fancy indexing.
+    """
+    if len(indexes) and numpy.array_equal(
+            indexes, numpy.arange(indexes[0], indexes[0] + len(indexes))):
+        return slice(int(indexes[0]), int(indexes[0]) + len(indexes))
+    return indexes
+
+
+class LayoutConverter:
+    """Converts pages from one layout to another, or extracts parts of them."""
+
+    def __init__(self, source_layout, mode, destination_layout=None):
+        """Initializes a LayoutConverter object.
+
+        Args:
+            source_layout(PageLayout): the layout of source pages.
+            mode(str): one of MODES: extract user data, spare bytes, or re-layout pages.
+            destination_layout(PageLayout): the layout of converted pages, for MODE_RELAYOUT.
+        Raises:
+            errors.YandException: if the mode or the layouts are invalid.
+        """
+        if mode not in MODES:
+            raise errors.YandException('Unknown conversion mode \'{0:s}\''.format(mode))
+        if mode == MODE_RELAYOUT:
+            if not destination_layout:
+                raise errors.YandException('Need a destination layout')
+            if (len(destination_layout.data_indexes) != len(source_layout.data_indexes) or
+                    len(destination_layout.oob_indexes) != len(source_layout.oob_indexes)):
+                raise errors.YandException('Source and destination layouts sizes differ')
+        self.source_layout = source_layout
+        self.mode = mode
+        self.destination_layout = destination_layout
+
+        if mode == MODE_DATA:
+            self.output_page_size = len(source_layout.data_indexes)
+        elif mode == MODE_OOB:
+            self.output_page_size = len(source_layout.oob_indexes)
+        else:
+            self.output_page_size = destination_layout.page_size
+
+        self._source_data = _AsSlice(source_layout.data_indexes)
+        self._source_oob = _AsSlice(source_layout.oob_indexes)
+        if destination_layout:
+            self._destination_data = _AsSlice(destination_layout.data_indexes)
+            self._destination_oob = _AsSlice(destination_layout.oob_indexes)
+
+    def ConvertPages(self, pages):
+        """Converts pages.
+
+        Args:
+            pages(numpy.ndarray): uint8 array of shape (number of pages, source page size).
+        Returns:
+            numpy.ndarray: uint8 array of shape (number of pages, output_page_size).
+        """
+        if self.mode == MODE_DATA:
+            return numpy.ascontiguousarray(pages[:, self._source_data])
+        if self.mode == MODE_OOB:
+            return numpy.ascontiguousarray(pages[:, self._source_oob])
+        output = numpy.empty((pages.shape[0], self.output_page_size), dtype=numpy.uint8)
+        output[:, self._destination_data] = pages[:, self._source_data]
+        output[:, self._destination_oob] = pages[:, self._source_oob]
+        return output
+
+
+# Memory mapped source, and destination file descriptor of a conversion worker process
+_worker_source = None
+_worker_destination = None
+
+
+def _InitConversionWorker(source_path, destination_path):
+    global _worker_source, _worker_destination  # pylint: disable=global-statement
+    with open(source_path, 'rb') as source_file:
+        _worker_source = numpy.frombuffer(
+            mmap.mmap(source_file.fileno(), 0, access=mmap.ACCESS_READ), dtype=numpy.uint8)
+    _worker_destination = os.open(destination_path, os.O_WRONLY)
+
+
+def _ConvertChunk(converter, start_page, end_page):
+    page_size = converter.source_layout.page_size
+    pages = _worker_source[start_page * page_size:end_page * page_size].reshape(-1, page_size)
+    output = converter.ConvertPages(pages)
+    data = memoryview(output).cast('B')
+    offset = start_page * converter.output_page_size
+    while data:
+        written = os.pwrite(_worker_destination, data, offset)
+        data = data[written:]
+        offset += written
+    return end_page - start_page
+
+
+def ConvertDump(
+        source_path, destination_path, converter, workers=None, chunk_pages=2048,
+        progress_callback=None):
+    """Converts a dump file.
+
+    Chunks of pages are converted by a pool of processes, each reading the source through a
+    memory map and writing its converted chunk at its place in the destination file.
+
+    Args:
+        source_path(str): path to the raw dump.
+        destination_path(str): where to write the converted dump.
+        converter(LayoutConverter): the conversion to do.
+        workers(int): number of worker processes. Default is the number of CPUs.
+        chunk_pages(int): number of pages converted by a worker at once.
+        progress_callback(callable): called with the number of pages converted.
+    Returns:
+        int: the number of pages converted.
+    """
+    page_size = converter.source_layout.page_size
+    source_size = os.stat(source_path).st_size
+    total_pages = source_size // page_size
+    if source_size % page_size:
+        raise errors.YandException(
+            '{0:s} size ({1:d}) is not a multiple of page size ({2:d})'.format(
+                source_path, source_size, page_size))
+
+    with open(destination_path, 'wb') as destination_file:
+        destination_file.truncate(total_pages * converter.output_page_size)
+    if not total_pages:
+        return 0
+
+    with concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers, initializer=_InitConversionWorker,
+            initargs=(source_path, destination_path)) as executor:
+        futures = [
+            executor.submit(
+                _ConvertChunk, converter, start_page,
+                min(start_page + chunk_pages, total_pages))
+            for start_page in range(0, total_pages, chunk_pages)]
+        for future in concurrent.futures.as_completed(futures):
+            converted_pages = future.result()
+            if progress_callback:
+                progress_callback(converted_pages)
+    return total_pages
@@ -0,0 +1,64 @@
+"""Tests for the layout module."""
+
+import os
+import tempfile
+import unittest
+
+import numpy
+
+from yand import errors
+from yand import layout
+
+
+class LayoutTest(unittest.TestCase):
+    """Tests for the layout module"""
+
+    def testPageLayout(self):
+        """Tests PageLayout."""
+        raw = layout.PageLayout.FromString('raw', 16, 4)
+        self.assertEqual(list(raw.data_indexes), list(range(12)))
+        self.assertEqual(list(raw.oob_indexes), [12, 13, 14, 15])
+
+        syndrome = layout.PageLayout.FromString('syndrome:6:1', 16, 4)
+        self.assertEqual(list(syndrome.data_indexes), [0, 1, 2, 3, 4, 5, 7, 8, 9, 10, 11, 12])
+        self.assertEqual(list(syndrome.oob_indexes), [6, 13, 14, 15])
+
+        with self.assertRaises(errors.YandException):
+            layout.PageLayout.FromString('syndrome:5:1', 16, 4)
+        with self.assertRaises(errors.YandException):
+            layout.PageLayout.FromString('syndrome:6:3', 16, 4)
+        with self.assertRaises(errors.YandException):
+            layout.PageLayout.FromString('bch', 16, 4)
+        with self.assertRaises(errors.YandException):
+            layout.PageLayout(4, [0, 1], [1, 2])
+
+    def testConvertDump(self):
+        """Tests LayoutConverter and ConvertDump."""
+        pages = numpy.arange(50 * 16, dtype=numpy.uint8).reshape(50, 16)
+        raw = layout.PageLayout.Raw(16, 4)
+        syndrome = layout.PageLayout.Syndrome(16, 4, 6, 1)
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            source_path = os.path.join(temp_dir, 'dump.bin')
+            pages.tofile(source_path)
+
+            def _Convert(converter, name):
+                destination_path = os.path.join(temp_dir, name)
+                self.assertEqual(layout.ConvertDump(
+                    source_path, destination_path, converter, workers=2, chunk_pages=7), 50)
+                return numpy.fromfile(destination_path, dtype=numpy.uint8).reshape(50, -1)
+
+            numpy.testing.assert_array_equal(
+                _Convert(layout.LayoutConverter(raw, layout.MODE_DATA), 'data.bin'),
+                pages[:, :12])
+            numpy.testing.assert_array_equal(
+                _Convert(layout.LayoutConverter(syndrome, layout.MODE_OOB), 'oob.bin'),
+                pages[:, [6, 13, 14, 15]])
+
+            converted = _Convert(
+                layout.LayoutConverter(raw, layout.MODE_RELAYOUT, syndrome), 'syndrome.bin')
+            numpy.testing.assert_array_equal(converted[:, syndrome.data_indexes], pages[:, :12])
+            numpy.testing.assert_array_equal(converted[:, syndrome.oob_indexes], pages[:, 12:])
+            numpy.testing.assert_array_equal(
+                layout.LayoutConverter(syndrome, layout.MODE_RELAYOUT, raw).ConvertPages(
+                    converted), pages)
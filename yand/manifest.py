@@ -0,0 +1,286 @@
+"""Per block SHA-256 manifests of dumps, to check them against the chip or other dumps.
+
+A manifest is a text file, with a few '# key value' header lines, then one
+'BLOCK_NUMBER SHA256' line per block. Block numbers are absolute: a dump starting in the middle
+of a block has a first hash covering fewer pages.
+"""
+
+import concurrent.futures
+import hashlib
+import mmap
+import os
+import queue
+import threading
+
+from yand import errors
+
+MANIFEST_MAGIC = '# yand manifest'
+
+
+class Manifest:
+    """The hashes of the blocks of a dump.
+
+    Attributes:
+        hashes(dict): the SHA-256 hex digest of every block, by block number.
+    """
+
+    def __init__(self, page_size, pages_per_block, start_page=0, end_page=0, hashes=None):
+        """Initializes a Manifest object.
+
+        Args:
+            page_size(int): length of a page (userdata + oob).
+            pages_per_block(int): number of pages per block.
+            start_page(int): the first page of the dump.
+            end_page(int): the page the dump stops at (excluded).
+            hashes(dict): the hashes of the blocks, by block number.
+        """
+        self.page_size = page_size
+        self.pages_per_block = pages_per_block
+        self.start_page = start_page
+        self.end_page = end_page
+        self.hashes = hashes or {}
+
+    def GetBlockPages(self, block):
+        """Returns the range of pages of a block, within the dump.
+
+        Args:
+            block(int): the block number.
+        Returns:
+            tuple(int, int): the first page of the block, and the page it stops at (excluded).
+        """
+        return (
+            max(block * self.pages_per_block, self.start_page),
+            min((block + 1) * self.pages_per_block, self.end_page))
+
+    def Save(self, path):
+        """Writes the manifest to a file.
+
+        Args:
+            path(str): the file to write.
+        """
+        with open(path, 'w', encoding='utf-8') as manifest_file:
+            manifest_file.write('{0:s}\n'.format(MANIFEST_MAGIC))
+            manifest_file.write('# hash sha256\n')
+            for key in ['page_size', 'pages_per_block', 'start_page', 'end_page']:
+                manifest_file.write('# {0:s} {1:d}\n'.format(key, getattr(self, key)))
+            for block, digest in sorted(self.hashes.items()):
+                manifest_file.write('{0:d} {1:s}\n'.format(block, digest))
+
+    @classmethod
+    def Load(cls, path):
+        """Reads a manifest file.
+
+        Args:
+            path(str): the file to read.
+        Returns:
+            Manifest: the manifest.
+        Raises:
+            errors.YandException: if the file is not a valid manifest.
+        """
+        manifest = cls(0, 0)
+        with open(path, 'r', encoding='utf-8') as manifest_file:
+            if manifest_file.readline().rstrip('\n') != MANIFEST_MAGIC:
+                raise errors.YandException('{0:s} is not a manifest'.format(path))
+            try:
+                for line in manifest_file:
+                    fields = line.split()
+                    if not fields:
+                        continue
+                    if fields[0] == '#':
+                        if fields[1] in ('page_size', 'pages_per_block', 'start_page', 'end_page'):
+                            setattr(manifest, fields[1], int(fields[2]))
+                        continue
+                    manifest.hashes[int(fields[0])] = fields[1]
+            except (IndexError, ValueError) as parse_error:
+                raise errors.YandException(
+                    'Invalid line in manifest {0:s}: {1:s}'.format(path, line)) from parse_error
+        if not manifest.page_size or not manifest.pages_per_block:
+            raise errors.YandException('{0:s} has no geometry'.format(path))
+        return manifest
+
+    def Compare(self, other):
+        """Returns the blocks which differ from another manifest.
+
+        Args:
+            other(Manifest): the manifest to compare with.
+        Returns:
+            list(int): the block numbers whose hashes differ, or are only in one manifest.
+        """
+        blocks = set(self.hashes) | set(other.hashes)
+        return sorted(
+            block for block in blocks if self.hashes.get(block) != other.hashes.get(block))
+
+
+class ManifestBuilder:
+    """Hashes pages on a worker thread, as they are dumped."""
+
+    # Number of pending Update() calls, before they block.
+    QUEUE_SIZE = 64
+
+    def __init__(self, page_size, pages_per_block, start_page=0):
+        """Initializes a ManifestBuilder object, and starts its thread.
+
+        Args:
+            page_size(int): length of a page (userdata + oob).
+            pages_per_block(int): number of pages per block.
+            start_page(int): the number of the first page to be hashed.
+        """
+        self.manifest = Manifest(
+            page_size, pages_per_block, start_page=start_page, end_page=start_page)
+        self._queue = queue.Queue(maxsize=self.QUEUE_SIZE)
+        self._thread = threading.Thread(target=self._Run, name='yand-manifest', daemon=True)
+        self._thread.start()
+
+    def Update(self, data):
+        """Adds the content of the next pages.
+
+        Args:
+            data(bytes): the content of whole pages.
+        """
+        self._queue.put(bytes(data))
+
+    def Finish(self):
+        """Waits for all pages to be hashed.
+
+        Returns:
+            Manifest: the manifest.
+        """
+        self._queue.put(None)
+        self._thread.join()
+        return self.manifest
+
+    def _Run(self):
+        manifest = self.manifest
+        block_hash = None
+        while True:
+            data = self._queue.get()
+            if data is None:
+                break
+            with memoryview(data) as view:
+                offset = 0
+                while offset < len(view):
+                    page = manifest.end_page
+                    block = page // manifest.pages_per_block
+                    pages = min(
+                        (block + 1) * manifest.pages_per_block - page,
+                        (len(view) - offset) // manifest.page_size)
+                    if not pages:
+                        # Not a whole page, ignored
+                        break
+                    if block_hash is None:
+                        block_hash = hashlib.sha256()
+                    length = pages * manifest.page_size
+                    block_hash.update(view[offset:offset + length])
+                    offset += length
+                    manifest.end_page += pages
+                    if manifest.end_page % manifest.pages_per_block == 0:
+                        manifest.hashes[block] = block_hash.hexdigest()
+                        block_hash = None
+        if block_hash is not None:
+            manifest.hashes[(manifest.end_page - 1) // manifest.pages_per_block] = (
+                block_hash.hexdigest())
+
+
+def VerifyNand(nand, manifest, progress_callback=None):
+    """Reads the pages of a manifest from the chip, and compares their hashes.
+
+    Args:
+        nand(NandInterface): the NAND Flash to read.
+        manifest(Manifest): the manifest to check.
+        progress_callback(callable): called with the number of pages read.
+    Returns:
+        list(int): the numbers of the blocks which differ.
+    """
+    different_blocks = []
+    for block, digest in sorted(manifest.hashes.items()):
+        first_page, end_page = manifest.GetBlockPages(block)
+        block_hash = hashlib.sha256()
+        for page in nand.ReadPages(first_page, end_page - first_page):
+            block_hash.update(page)
+        if block_hash.hexdigest() != digest:
+            different_blocks.append(block)
+        if progress_callback:
+            progress_callback(end_page - first_page)
+    return different_blocks
+
+
+# Memory mapped dump of a hashing worker process
+_worker_data = None
+
+
+def _InitHashWorker(dump_path):
+    global _worker_data  # pylint: disable=global-statement
+    with open(dump_path, 'rb') as dump_file:
+        _worker_data = mmap.mmap(dump_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _HashBlocks(manifest, blocks):
+    hashes = {}
+    with memoryview(_worker_data) as view:
+        for block in blocks:
+            first_page, end_page = manifest.GetBlockPages(block)
+            start = (first_page - manifest.start_page) * manifest.page_size
+            end = (end_page - manifest.start_page) * manifest.page_size
+            hashes[block] = hashlib.sha256(view[start:end]).hexdigest()
+    return hashes
+
+
+def HashDump(
+        dump_path, page_size, pages_per_block, start_page=0, workers=None, chunk_blocks=64,
+        progress_callback=None):
+    """Computes the manifest of a dump file, with a pool of processes.
+
+    Args:
+        dump_path(str): path to the raw dump.
+        page_size(int): length of a page (userdata + oob).
+        pages_per_block(int): number of pages per block.
+        start_page(int): the number of the first page of the dump.
+        workers(int): number of worker processes. Default is the number of CPUs.
+        chunk_blocks(int): number of blocks hashed by a worker at once.
+        progress_callback(callable): called with the number of blocks hashed.
+    Returns:
+        Manifest: the manifest.
+    Raises:
+        errors.YandException: if the dump size is not a multiple of the page size.
+    """
+    dump_size = os.stat(dump_path).st_size
+    if dump_size % page_size:
+        raise errors.YandException(
+            '{0:s} size ({1:d}) is not a multiple of page size ({2:d})'.format(
+                dump_path, dump_size, page_size))
+    manifest = Manifest(
+        page_size, pages_per_block, start_page=start_page,
+        end_page=start_page + dump_size // page_size)
+    if manifest.end_page == start_page:
+        return manifest
+    blocks = list(range(
+        start_page // pages_per_block, (manifest.end_page - 1) // pages_per_block + 1))
+
+    with concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers, initializer=_InitHashWorker, initargs=(dump_path,)) as executor:
+        futures = [
+            executor.submit(_HashBlocks, manifest, blocks[index:index + chunk_blocks])
+            for index in range(0, len(blocks), chunk_blocks)]
+        for future in concurrent.futures.as_completed(futures):
+            hashes = future.result()
+            manifest.hashes.update(hashes)
+            if progress_callback:
+                progress_callback(len(hashes))
+    return manifest
+
+
+def VerifyDump(dump_path, manifest, workers=None, progress_callback=None):
+    """Hashes a dump file, and compares it with a manifest.
+
+    Args:
+        dump_path(str): path to the raw dump, starting at the first page of the manifest.
+        manifest(Manifest): the manifest to check.
+        workers(int): number of worker processes. Default is the number of CPUs.
+        progress_callback(callable): called with the number of blocks hashed.
+    Returns:
+        list(int): the numbers of the blocks which differ.
+    """
+    dump_manifest = HashDump(
+        dump_path, manifest.page_size, manifest.pages_per_block,
+        start_page=manifest.start_page, workers=workers, progress_callback=progress_callback)
+    return manifest.Compare(dump_manifest)
@@ -0,0 +1,90 @@
+"""Tests for the manifest module."""
+
+import hashlib
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from yand import container
+from yand import errors
+from yand import manifest
+from yand import test_lib
+
+
+class ManifestTest(unittest.TestCase):
+    """Tests for the manifest module"""
+
+    def setUp(self):
+        # 8 blocks of 4 pages of 16 bytes
+        self.data = os.urandom(8 * 4 * 16)
+        self.nand = test_lib.FakeNand(16, 4, 8, data=self.data)
+        self.temp_dir = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def testDumpManifest(self):
+        """Tests writing a manifest while dumping, and checking it."""
+        dump_path = os.path.join(self.temp_dir.name, 'dump.bin')
+        manifest_path = os.path.join(self.temp_dir.name, 'dump.manifest')
+        self.nand.DumpFlashToFile(
+            dump_path, start_page=6, end_page=27, manifest_path=manifest_path)
+
+        block_manifest = manifest.Manifest.Load(manifest_path)
+        self.assertEqual((block_manifest.start_page, block_manifest.end_page), (6, 27))
+        self.assertEqual(sorted(block_manifest.hashes), [1, 2, 3, 4, 5, 6])
+        self.assertEqual(
+            block_manifest.hashes[1], hashlib.sha256(self.data[6 * 16:8 * 16]).hexdigest())
+        self.assertEqual(
+            block_manifest.hashes[6], hashlib.sha256(self.data[24 * 16:27 * 16]).hexdigest())
+
+        self.assertEqual(manifest.VerifyDump(dump_path, block_manifest, workers=2), [])
+        self.assertEqual(self.nand.CompareManifestToFlash(block_manifest), [])
+
+        self.nand.pages[20, 0] ^= 0x01
+        self.assertEqual(self.nand.CompareManifestToFlash(block_manifest), [5])
+        with open(dump_path, 'r+b') as dump_file:
+            dump_file.seek(0)
+            dump_file.write(b'\x00')
+        self.assertEqual(manifest.VerifyDump(dump_path, block_manifest, workers=2), [1])
+
+    def testFailedDump(self):
+        """Tests a failed dump leaves no manifest, and an incomplete container."""
+        dump_path = os.path.join(self.temp_dir.name, 'dump.ynd')
+        manifest_path = os.path.join(self.temp_dir.name, 'dump.manifest')
+        with mock.patch.object(self.nand, 'ECC_BATCH_PAGES', 8), mock.patch.object(
+                self.nand, 'ReadPages', side_effect=[
+                    [self.data[:8 * 16]], errors.YandException('USB timeout')]):
+            with self.assertRaisesRegex(errors.YandException, 'USB timeout'):
+                self.nand.DumpFlashToFile(
+                    dump_path, container_compression='zlib', manifest_path=manifest_path)
+        self.assertFalse(os.path.exists(manifest_path))
+        with self.assertRaises(errors.YandException):
+            container.ContainerReader(dump_path)
+
+    def testHashDump(self):
+        """Tests HashDump, against a manifest built from pages."""
+        dump_path = os.path.join(self.temp_dir.name, 'dump.bin')
+        with open(dump_path, 'wb') as dump_file:
+            dump_file.write(self.data)
+        builder = manifest.ManifestBuilder(16, 4)
+        for offset in range(0, len(self.data), 48):
+            builder.Update(self.data[offset:offset + 48])
+        built_manifest = builder.Finish()
+        hashed_manifest = manifest.HashDump(dump_path, 16, 4, workers=2, chunk_blocks=3)
+        self.assertEqual(len(hashed_manifest.hashes), 8)
+        self.assertEqual(hashed_manifest.Compare(built_manifest), [])
+
+        del built_manifest.hashes[7]
+        self.assertEqual(hashed_manifest.Compare(built_manifest), [7])
+
+    def testLoadErrors(self):
+        """Tests loading invalid manifests."""
+        manifest_path = os.path.join(self.temp_dir.name, 'bad.manifest')
+        for content in ['not a manifest\n', '# yand manifest\n0 abc\n',
+                        '# yand manifest\n# page_size 16\n# pages_per_block 4\nzero abc\n']:
+            with open(manifest_path, 'w', encoding='utf-8') as manifest_file:
+                manifest_file.write(content)
+            with self.assertRaises(errors.YandException):
+                manifest.Manifest.Load(manifest_path)
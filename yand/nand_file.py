@@ -0,0 +1,126 @@
+"""File-like view of a NAND Flash."""
+
+import collections
+import io
+import logging
+
+
+class NandFile(io.RawIOBase):
+    """Read only, seekable file object reading pages from a NAND Flash on demand.
+
+    Pages are kept in a LRU cache, and sequential reads trigger reading the next pages in
+    advance.
+    """
+
+    def __init__(self, nand, include_oob=True, cache_size=256, read_ahead=8):
+        """Initializes a NandFile object.
+
+        Args:
+            nand(NandInterface): the NAND Flash to read from. Needs to be set up.
+            include_oob(bool): whether the OOB bytes of each page are part of the file. If False,
+                only the user data of each page is visible.
+            cache_size(int): the maximum number of pages to keep in cache.
+            read_ahead(int): the number of pages to read in advance when reading sequentially.
+        """
+        super().__init__()
+        self.nand = nand
+        self.include_oob = include_oob
+        self.cache_size = max(cache_size, read_ahead + 1)
+        self.read_ahead = read_ahead
+        self.logger = logging.getLogger()
+
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+        self._cache = collections.OrderedDict()
+        self._last_page = None
+        self._position = 0
+
+        if include_oob:
+            self._page_length = nand.page_size
+        else:
+            self._page_length = nand.page_size - nand.oob_size
+        self._total_pages = nand.GetTotalPages()
+        self._size = self._page_length * self._total_pages
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = self._size + offset
+        else:
+            raise ValueError('Invalid whence ({0!s})'.format(whence))
+        if position < 0:
+            raise ValueError('Negative seek position {0:d}'.format(position))
+        self._position = position
+        return self._position
+
+    def GetSize(self):
+        """Returns the size of the file, in bytes."""
+        return self._size
+
+    def _ReadPages(self, first_page, count):
+        """Reads pages from the Flash, and stores them in cache.
+
+        Args:
+            first_page(int): the first page to read.
+            count(int): the number of pages to read.
+        """
+        count = min(count, self._total_pages - first_page)
+        for page_number, data in zip(
+                range(first_page, first_page + count), self.nand.ReadPages(first_page, count)):
+            if not self.include_oob:
+                data = data[:self._page_length]
+            self._cache[page_number] = bytes(data)
+            self._cache.move_to_end(page_number)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def GetPage(self, page_number):
+        """Returns the content of a page, as visible in the file.
+
+        Args:
+            page_number(int): the page.
+        Returns:
+            bytes: the content of the page.
+        """
+        sequential = self._last_page is not None and page_number == self._last_page + 1
+        self._last_page = page_number
+
+        data = self._cache.get(page_number)
+        if data is not None:
+            self.cache_hits += 1
+            self._cache.move_to_end(page_number)
+            if sequential and self.read_ahead:
+                next_page = page_number + self.read_ahead
+                if next_page < self._total_pages and next_page not in self._cache:
+                    self._ReadPages(next_page, self.read_ahead)
+            return data
+
+        self.cache_misses += 1
+        self._ReadPages(page_number, 1 + (self.read_ahead if sequential else 0))
+        return self._cache[page_number]
+
+    def readinto(self, buffer):
+        with memoryview(buffer) as view, view.cast('B') as destination:
+            length = min(len(destination), max(self._size - self._position, 0))
+            copied = 0
+            while copied < length:
+                page_number, offset = divmod(self._position, self._page_length)
+                data = self.GetPage(page_number)
+                chunk = min(length - copied, self._page_length - offset)
+                destination[copied:copied + chunk] = data[offset:offset + chunk]
+                copied += chunk
+                self._position += chunk
+        return copied
@@ -0,0 +1,55 @@
+"""Tests for the nand_file module."""
+
+import io
+import unittest
+
+from yand import nand_file
+from yand import test_lib
+
+
+class NandFileTest(unittest.TestCase):
+    """Tests for the nand_file module"""
+
+    def setUp(self):
+        # 32 pages of 16 bytes, 4 of them OOB.
+        self.data = bytes(range(256)) * 2
+        self.nand = test_lib.FakeNand(16, 32, 1, data=self.data, oob_size=4)
+
+    def testReadWithOOB(self):
+        """Tests reading with OOB."""
+        nand = nand_file.NandFile(self.nand, read_ahead=0)
+        self.assertEqual(nand.GetSize(), 512)
+        nand.seek(30)
+        self.assertEqual(nand.read(20), self.data[30:50])
+        self.assertEqual(self.nand.pages_read, [1, 2, 3])
+        nand.seek(-2, io.SEEK_END)
+        self.assertEqual(nand.read(10), self.data[-2:])
+        self.assertEqual(nand.read(10), b'')
+
+    def testReadWithoutOOB(self):
+        """Tests reading user data only."""
+        nand = nand_file.NandFile(self.nand, include_oob=False, read_ahead=0)
+        user_data = b''.join(
+            self.data[offset:offset + 12] for offset in range(0, len(self.data), 16))
+        self.assertEqual(nand.GetSize(), len(user_data))
+        nand.seek(10)
+        self.assertEqual(nand.read(30), user_data[10:40])
+        self.assertEqual(io.BufferedReader(nand).read(), user_data[40:])
+
+    def testCache(self):
+        """Tests the page cache and read ahead."""
+        nand = nand_file.NandFile(self.nand, cache_size=8, read_ahead=4)
+        nand.seek(16 * 10)
+        nand.read(16)
+        nand.read(16)
+        self.assertEqual(self.nand.pages_read, [10, 11, 12, 13, 14, 15])
+        nand.read(16 * 3)
+        self.assertEqual(self.nand.pages_read, [10, 11, 12, 13, 14, 15, 16, 17, 18, 19])
+        self.assertEqual(nand.cache_misses, 2)
+
+        nand.seek(16 * 10)
+        nand.read(1)
+        self.assertEqual(nand.cache_misses, 3)
+        nand.seek(16 * 17)
+        nand.read(1)
+        self.assertEqual(nand.cache_misses, 3)
@@ -1,5 +1,6 @@
 """Module to talk to a NAND"""
 
+import contextlib
 import logging
 import os
 import sys
@@ -8,9 +9,14 @@ import sys
 from functools import partial
 from tqdm import tqdm as std_tqdm
 
+from yand import container
+from yand import erase
 from yand import errors
 from yand import ftdi_device
 from yand import helpers
+from yand import manifest
+from yand import page_source
+from yand import qualify
 
 tqdm = partial(std_tqdm, dynamic_ncols=True)
 
@@ -32,6 +38,9 @@ class NandInterface:
 
     NAND_SIZE_ONFI = 0x100
 
+    # Number of pages read before checking their ECC at once
+    ECC_BATCH_PAGES = 64
+
     def __init__(self):
         """Initializes a NandInterface object"""
         self.ftdi_device = None
@@ -40,6 +49,7 @@ class NandInterface:
 
         # Flash geometry / config
         self.address_cycles = 5
+        self.row_address_cycles = 3
         self.device_manufacturer = 'Unknown Manufacturer'
         self.device_model = 'Unknown Model'
         self.manufacturer_id = None
@@ -47,6 +57,21 @@ class NandInterface:
         self.oob_size = None
         self.page_size = None
         self.pages_per_block = None
+        # Number of planes a multi-plane erase can work on at once
+        self.planes = 1
+
+        # Called with the total amount of bytes to process, returns an object with an
+        # update(amount) method.
+        self.progress_bar_class = tqdm
+
+    def _NewProgressBar(self, total):
+        """Returns a new progress bar for an operation on total bytes."""
+        return self.progress_bar_class(
+            total=total,
+            unit_scale=True,
+            unit_divisor=1024,
+            unit='B'
+        )
 
     def GetTotalSize(self):
         """Returns the total size of the flash, in bytes"""
@@ -105,7 +130,7 @@ Device Size: {6:s}
         # Parses ONFI version support
         _ = onfi_data[4:6]
         # Parses features support
-        _ = onfi_data[6:8]
+        features = int.from_bytes(onfi_data[6:8], byteorder='little')
         # Parses optional commands support
         _ = onfi_data[8:10]
 
@@ -137,46 +162,168 @@ Device Size: {6:s}
 
         address_cycles = onfi_data[101]
         self.address_cycles = (address_cycles & 0x0f) + ((address_cycles & 0xf0) >> 4)
+        self.row_address_cycles = address_cycles & 0x0f
+
+        # Multi-plane (interleaved) operations: number of plane address bits, and address
+        # restrictions. Multi-plane erases use aligned blocks, which only differ by their plane
+        # bits, and can't meet the 'lower bit XNOR block address' restriction.
+        if features & 0x08 and not onfi_data[114] & 0x20:
+            self.planes = 1 << (onfi_data[113] & 0x0f)
 
     def Setup(self):
         """Sets the underlying IO and flash characteristics"""
         if not self.ftdi_device:
             self.ftdi_device = ftdi_device.FtdiDevice()
+        if not self.ftdi_device.ftdi:
             self.ftdi_device.Setup()
 
         if not (self.page_size and self.pages_per_block and self.number_of_blocks):
             self._SetupFlash()
 
-    def DumpFlashToFile(self, destination, start_page=0, end_page=None):
+    def DumpFlashToFile(
+            self, destination, start_page=0, end_page=None, ecc_engine=None, ecc_retries=3,
+            page_voter=None, container_compression=None, manifest_path=None):
         """Reads all pages from the flash, and writes it to a file.
 
+        When an ECC engine is provided, pages are checked and corrected in batches before being
+        written. Pages with uncorrectable steps are read again, up to ecc_retries times.
+
+        When a page voter is provided, unstable pages (which read differently twice, or have
+        uncorrectable steps) are read several times, and every bit is voted on instead.
+
+        When a container compression is provided, pages are written to a compressed container
+        (see the container module) instead of a raw file.
+
+        When a manifest path is provided, pages are hashed on a separate thread as they are
+        written, and the SHA-256 of every block is written to the manifest.
+
         Args:
             destination(str): the destination file.
             start_page(int): Page to start dumping from.
             end_page(int): Page to stop dumping at. Default is to the end.
+            ecc_engine(ecc.EccEngine): the engine to correct pages with.
+            ecc_retries(int): how many times to read again an uncorrectable page.
+            page_voter(voting.PageVoter): the voter for unstable pages.
+            container_compression(str): the compression of the container, one of
+                container.COMPRESSIONS.
+            manifest_path(str): where to write the manifest.
+        Returns:
+            int: the number of pages left with uncorrectable errors.
         Raises:
             errors.YandException: if no destination file is provided.
         """
         if not destination:
             raise errors.YandException('Please specify where to write')
+        if destination == "-" and container_compression:
+            raise errors.YandException('Containers can only be written to a file')
 
         if not end_page:
             end_page = self.GetTotalPages()
 
-        if destination == "-":
-            for page in range(start_page, end_page):
-                sys.stdout.buffer.write(self.ReadPage(page))
-        else:
-            progress_bar = tqdm(
-                total=(end_page - start_page) * self.page_size,
-                unit_scale=True,
-                unit_divisor=1024,
-                unit='B'
-            )
-            with open(destination, 'wb') as dest_file:
-                for page in range(start_page, end_page):
-                    dest_file.write(self.ReadPage(page))
-                    progress_bar.update(self.page_size)
+        manifest_builder = None
+        if manifest_path:
+            manifest_builder = manifest.ManifestBuilder(
+                self.page_size, self.pages_per_block, start_page=start_page)
+
+        uncorrectable_pages = 0
+        with contextlib.ExitStack() as exit_stack:
+            if destination == "-":
+                # stdout is not ours to close
+                dest_file = sys.stdout.buffer
+                progress_bar = None
+            else:
+                if container_compression:
+                    dest_file = exit_stack.enter_context(container.ContainerWriter(
+                        destination, self.page_size, self.oob_size,
+                        compression=container_compression))
+                else:
+                    dest_file = exit_stack.enter_context(open(destination, 'wb'))
+                progress_bar = self._NewProgressBar((end_page - start_page) * self.page_size)
+            if manifest_builder:
+                # Waits for the hashes, even if the dump fails.
+                exit_stack.callback(manifest_builder.Finish)
+
+            for batch_start in range(start_page, end_page, self.ECC_BATCH_PAGES):
+                count = min(self.ECC_BATCH_PAGES, end_page - batch_start)
+                data = bytearray().join(self.ReadPages(batch_start, count))
+                voted_pages = []
+                if page_voter:
+                    voted_pages = page_voter.VoteUnstablePages(batch_start, data)
+                if ecc_engine:
+                    uncorrectable_pages += self._CorrectPages(
+                        ecc_engine, data, batch_start, ecc_retries, page_voter=page_voter,
+                        voted_pages=voted_pages)
+                dest_file.write(data)
+                if manifest_builder:
+                    manifest_builder.Update(data)
+                if progress_bar:
+                    progress_bar.update(len(data))
+
+        # Only a complete dump gets a manifest.
+        if manifest_builder:
+            manifest_builder.manifest.Save(manifest_path)
+
+        if ecc_engine:
+            self.logger.info('Dump done, {0:d} pages with uncorrectable errors'.format(
+                uncorrectable_pages))
+        if page_voter:
+            self.logger.info('Dump done, {0:d} unstable pages voted on'.format(
+                len(page_voter.instability)))
+        return uncorrectable_pages
+
+    def _CorrectPages(
+            self, ecc_engine, data, start_page, retries, page_voter=None, voted_pages=None):
+        """Corrects consecutive pages in place, reading uncorrectable ones again.
+
+        Args:
+            ecc_engine(ecc.EccEngine): the engine to correct pages with.
+            data(bytearray): the content of the pages.
+            start_page(int): the number of the first page.
+            retries(int): how many times to read again an uncorrectable page.
+            page_voter(voting.PageVoter): if set, uncorrectable pages are voted on once,
+                instead of being read again.
+            voted_pages(list(int)): pages already voted on, which are not read again.
+        Returns:
+            int: the number of pages left with uncorrectable errors.
+        """
+        uncorrectable_pages = 0
+        statuses = ecc_engine.CorrectBuffer(data)
+        for index, status in enumerate(statuses):
+            page_number = start_page + index
+            if status['corrected']:
+                self.logger.debug('Page {0:d}: corrected {1:d} bitflips'.format(
+                    page_number, int(status['corrected'])))
+            if not status['uncorrectable']:
+                continue
+            offset = index * self.page_size
+            retry_status = status
+            if voted_pages and page_number in voted_pages:
+                # Voting again would read the page as many times, for the same result.
+                attempts = 0
+            elif page_voter:
+                attempts = 1
+            else:
+                attempts = retries
+            for retry in range(attempts):
+                if page_voter:
+                    page = page_voter.VotePage(page_number)
+                else:
+                    page = bytearray(self.ReadPage(page_number))
+                retry_status = ecc_engine.CorrectBuffer(page)[0]
+                if page_voter or not retry_status['uncorrectable']:
+                    # A voted page is always better than the first read.
+                    data[offset:offset + self.page_size] = page
+                if not retry_status['uncorrectable']:
+                    self.logger.debug(
+                        'Page {0:d}: correctable after {1:d} {2:s}, {3:d} bitflips'.format(
+                            page_number, retry + 1, 'vote' if page_voter else 'retries',
+                            int(retry_status['corrected'])))
+                    break
+            if retry_status['uncorrectable']:
+                self.logger.warning('Page {0:d}: {1:d} uncorrectable ECC steps'.format(
+                    page_number, int(retry_status['uncorrectable'])))
+                uncorrectable_pages += 1
+        return uncorrectable_pages
 
     def SendCommand(self, command):
         """Sends a command address to the Flash.
@@ -202,6 +349,17 @@ Device Size: {6:s}
         bytes_to_read = self.ftdi_device.Read(self.page_size)
         return bytes_to_read
 
+    def ReadPages(self, start_page, count):
+        """Returns the content of consecutive pages.
+
+        Args:
+            start_page(int): the first page to read.
+            count(int): the number of pages to read.
+        Returns:
+            list(bytearray): the content of each page.
+        """
+        return [self.ReadPage(page_number) for page_number in range(start_page, start_page + count)]
+
     def SendAddress(self, address, size=1):
         """Writes an address to the NAND Flash.
 
@@ -221,7 +379,7 @@ Device Size: {6:s}
         row = block * self.pages_per_block
         self.ftdi_device.write_protect = False
         self.SendCommand(self.NAND_CMD_ERASE)
-        self.SendAddress(row, self.address_cycles) # Is 3 always the case?
+        self.SendAddress(row, self.row_address_cycles)
         self.SendCommand(self.NAND_CMD_ERASE_START)
         self.ftdi_device.WaitReady()
         self.ftdi_device.write_protect = True
@@ -267,39 +425,71 @@ Device Size: {6:s}
 
         self.ftdi_device.write_protect = True
 
-    def CheckStatus(self):
-        """Check the status of the last operation."""
+    def ReadStatus(self):
+        """Returns the status register of the Flash."""
         self.SendCommand(self.NAND_CMD_STATUS)
         status_bytes = self.ftdi_device.Read(1)
         while not status_bytes:
             status_bytes = self.ftdi_device.Read(1)
-        status = status_bytes[0]
+        return status_bytes[0]
+
+    def CheckStatus(self):
+        """Check the status of the last operation."""
+        status = self.ReadStatus()
         if (status & 0x2) == 0x2 and (status & 0x20 == 0x20):
             # applies to PROGRAM-, and COPYBACK PROGRAM-series operations
-            raise errors.StatusProgramError('Status is {0:s}'.format(status.hex()))
+            raise errors.StatusProgramError('Status is 0x{0:02x}'.format(status))
         if (status & 0x1) == 0x1 and (status & 0x10 == 0x10):
             # applies to PROGRAM-, ERASE-, and COPYBACK PROGRAM-series operations
-            raise errors.StatusProgramError('Status is {0:s}'.format(status.hex()))
+            raise errors.StatusProgramError('Status is 0x{0:02x}'.format(status))
 
-    def Erase(self, start_block=0, end_block=None):
+    def Erase(self, start_block=0, end_block=None, skip_blocks=None):
         """Erase all blocks in the NAND Flash.
 
         Args:
             start_block(int): erase from this block number.
-            end_block(int): erase up to this block. Default is to the end."""
+            end_block(int): erase up to this block. Default is to the end.
+            skip_blocks(set(int)): blocks not to erase, such as known bad blocks.
+        Returns:
+            list(int): the blocks which failed to erase.
+        """
 
         if not end_block:
             end_block = self.number_of_blocks
 
-        progress_bar = tqdm(
-            total=(end_block - start_block) * (self.pages_per_block * self.page_size),
-            unit_scale=True,
-            unit_divisor=1024,
-            unit='B'
-        )
-        for block in range(start_block, end_block):
-            self.EraseBlock(block)
-            progress_bar.update(self.page_size * self.pages_per_block)
+        skip_blocks = set(skip_blocks or [])
+        block_size = self.page_size * self.pages_per_block
+        progress_bar = self._NewProgressBar(block_size * len(
+            [block for block in range(start_block, end_block) if block not in skip_blocks]))
+        return erase.EraseEngine(self).Erase(
+            start_block, end_block, skip_blocks=skip_blocks,
+            progress_callback=lambda blocks: progress_bar.update(blocks * block_size))
+
+    def Qualify(self, patterns, start_block=0, end_block=None, skip_blocks=None):
+        """Writes test patterns to blocks, and reads them back.
+
+        Args:
+            patterns(list(qualify.Pattern)): the patterns to test, in order.
+            start_block(int): test from this block number.
+            end_block(int): test up to this block. Default is to the end.
+            skip_blocks(set(int)): blocks not to test, such as known bad blocks.
+        Returns:
+            list(tuple(qualify.Pattern, numpy.ndarray)): for every pattern, one
+                qualify.RESULT_DTYPE record per block tested.
+        """
+        if not end_block:
+            end_block = self.number_of_blocks
+
+        skip_blocks = set(skip_blocks or [])
+        blocks = [block for block in range(start_block, end_block) if block not in skip_blocks]
+        block_size = self.page_size * self.pages_per_block
+        progress_bar = self._NewProgressBar(block_size * len(blocks) * len(patterns))
+        qualifier = qualify.Qualifier(self)
+        return [
+            (pattern, qualifier.Run(
+                pattern, blocks,
+                progress_callback=lambda count: progress_bar.update(count * block_size)))
+            for pattern in patterns]
 
     def FillWithValue(self, value, start_page=0, end_page=None, write_check=False):
         """Fill NAND flash pages with a specific value.
@@ -313,46 +503,105 @@ Device Size: {6:s}
         if not end_page:
             end_page = self.GetTotalPages()
 
-        progress_bar = tqdm(
-            total=(end_page - start_page) * self.page_size,
-            unit_scale=True,
-            unit_divisor=1024,
-            unit='B'
-        )
-        for page_number in range(start_page, end_page):
-            self.WritePage(page_number, bytearray([value]*self.page_size), write_check=write_check)
+        self.WritePagesFromSource(
+            page_source.ConstantSource(value, self.page_size), start_page, end_page,
+            write_check=write_check)
+
+    def WritePagesFromSource(self, source, start_page, end_page, write_check=False):
+        """Writes consecutive pages from a page source.
+
+        Args:
+            source(page_source.PageSource): the content of the pages.
+            start_page(int): Page to start writing at.
+            end_page(int): Page to stop writing at, unless the source ends before.
+            write_check(bool): Whether to check every page written.
+        Returns:
+            int: the number of pages written.
+        """
+        if source.page_count is not None:
+            end_page = min(end_page, start_page + source.page_count)
+        progress_bar = self._NewProgressBar((end_page - start_page) * self.page_size)
+        page_number = start_page
+        for page_data in source.Pages(end_page - start_page):
+            self.WritePage(page_number, page_data, write_check=write_check)
             progress_bar.update(self.page_size)
+            page_number += 1
+        return page_number - start_page
 
-    def WriteFileToFlash(self, filename, write_check=False):
+    def WriteFileToFlash(self, filename, start_page=0, end_page=None, write_check=False):
         """Overwrite file to NAND Flash.
 
         Args:
-            filename(str): path to the dump to write.
+            filename(str): path to the dump to write. "-" means stdin.
+            start_page(int): Page to start writing at.
+            end_page(int): Page to stop writing at. Default is to the end of the file.
             write_check(bool): Whether to check every page written.
         Raises:
             errors.YandException: if filename has more data than the NAND Flash.
         """
-        filesize = os.stat(filename).st_size
-        if filesize > self.GetTotalSize():
-            raise errors.YandException(
-                'Input file is {0:d} bytes, more than the current NAND Flash size ({1:d})'.format(
-                    filesize, self.GetTotalSize()))
-        if filesize < self.GetTotalSize():
-            self.logger.debug(
-                'input file is {0:d}, less than the current NAND Flash size ({1:d})'.format(
-                    filesize, self.GetTotalSize()))
-
-        progress_bar = tqdm(
-            total=self.GetTotalSize(),
-            unit_scale=True,
-            unit_divisor=1024,
-            unit='B'
-        )
+        if not end_page:
+            end_page = self.GetTotalPages()
+
+        available_pages = end_page - start_page
+        with page_source.OpenFile(filename, self.page_size) as source:
+            if source.page_count is not None:
+                if source.page_count > available_pages:
+                    raise errors.YandException(
+                        'Input file is {0:d} pages, more than the NAND Flash area to write '
+                        '({1:d})'.format(source.page_count, available_pages))
+                if source.page_count < available_pages:
+                    self.logger.debug(
+                        'input file is {0:d} pages, less than the NAND Flash area to write '
+                        '({1:d})'.format(source.page_count, available_pages))
+            pages_written = self.WritePagesFromSource(
+                source, start_page, end_page, write_check=write_check)
+            if (source.page_count is None and pages_written == available_pages and
+                    not source.IsExhausted()):
+                raise errors.YandException(
+                    'Input has more data than the NAND Flash area to write ({0:d} pages)'.format(
+                        available_pages))
+
+    def CompareFileToFlash(self, filename, start_page=0, end_page=None):
+        """Compares the content of a file with the NAND Flash pages.
+
+        Args:
+            filename(str): path to the dump to compare with.
+            start_page(int): Page of the NAND Flash matching the start of the file.
+            end_page(int): Page to stop comparing at. Default is to the end of the file.
+        Returns:
+            list(int): the pages that differ.
+        """
+        if not end_page:
+            end_page = self.GetTotalPages()
+        end_page = min(end_page, start_page + -(-os.stat(filename).st_size // self.page_size))
+
+        differing_pages = []
+        progress_bar = self._NewProgressBar((end_page - start_page) * self.page_size)
         with open(filename, 'rb') as input_file:
-            for page_number in range(self.GetTotalPages()):
-                page_data = input_file.read(self.page_size)
-                self.WritePage(page_number, page_data, write_check=write_check)
+            for page_number in range(start_page, end_page):
+                page_data = input_file.read(self.page_size).ljust(self.page_size, b'\xff')
+                if self.ReadPage(page_number) != page_data:
+                    self.logger.debug('page {0:d} differs from file'.format(page_number))
+                    differing_pages.append(page_number)
                 progress_bar.update(self.page_size)
+        return differing_pages
+
+    def CompareManifestToFlash(self, block_manifest):
+        """Compares the hashes of a manifest with the NAND Flash blocks.
+
+        Args:
+            block_manifest(manifest.Manifest): the manifest to compare with.
+        Returns:
+            list(int): the blocks that differ.
+        """
+        progress_bar = self._NewProgressBar(
+            (block_manifest.end_page - block_manifest.start_page) * self.page_size)
+        differing_blocks = manifest.VerifyNand(
+            self, block_manifest,
+            progress_callback=lambda pages: progress_bar.update(pages * self.page_size))
+        for block in differing_blocks:
+            self.logger.debug('block {0:d} differs from manifest'.format(block))
+        return differing_blocks
 
     def WritePGMToFlash(self, filename, wrap=True, start_page=0, end_page=None, write_check=False):
         """Writes a picture to the NAND.
@@ -369,19 +618,5 @@ Device Size: {6:s}
         if not end_page:
             end_page = self.GetTotalPages()
 
-        progress_bar = tqdm(
-            total=(end_page - start_page) * self.page_size,
-            unit_scale=True,
-            unit_divisor=1024,
-            unit='B'
-        )
-        x = 0
-        y = 0
-        with helpers.PGMReader(filename) as picture:
-            for page_number in range(start_page, end_page):
-                data = picture.Read(x, y, self.page_size)
-                self.WritePage(page_number, data, write_check=write_check)
-                progress_bar.update(self.page_size)
-                y += 1
-                if y == picture.height and wrap:
-                    y = 0
+        with page_source.PGMSource(filename, self.page_size, wrap=wrap) as source:
+            self.WritePagesFromSource(source, start_page, end_page, write_check=write_check)
@@ -33,6 +33,10 @@ class YandTest(unittest.TestCase):
             0x00, 0x10, 0x00, 0x00,
             0x01,
             0x23,
+            0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+            0x00, 0x00, 0x00,
+            0x01,
+            0x00,
         ])
         nand = nand_interface.NandInterface()
         nand._ParseONFIData(fake_onfi)
@@ -43,6 +47,13 @@ class YandTest(unittest.TestCase):
         self.assertEqual(nand.page_size, 0xE0 + 0x1000)
         self.assertEqual(nand.number_of_blocks, 4096)
         self.assertEqual(nand.address_cycles, 5)
+        self.assertEqual(nand.row_address_cycles, 3)
+        self.assertEqual(nand.planes, 2)
+
+        fake_onfi[114] = 0x20
+        nand = nand_interface.NandInterface()
+        nand._ParseONFIData(fake_onfi)
+        self.assertEqual(nand.planes, 1)
 
         self.assertEqual(nand.GetTotalPages(), 1048576)
         self.assertEqual(nand.GetTotalSize(), 4529848320)
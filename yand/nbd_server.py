@@ -0,0 +1,224 @@
+"""Read only Network Block Device (NBD) server exposing a NAND Flash.
+
+Only the 'fixed newstyle' handshake and the read path of the NBD protocol are implemented.
+See https://github.com/NetworkBlockDevice/nbd/blob/master/doc/proto.md
+"""
+
+import logging
+import socketserver
+import struct
+import threading
+
+NBD_DEFAULT_PORT = 10809
+
+NBD_MAGIC = b'NBDMAGIC'
+NBD_OPTS_MAGIC = 0x49484156454F5054  # 'IHAVEOPT'
+NBD_REP_MAGIC = 0x3e889045565a9
+NBD_REQUEST_MAGIC = 0x25609513
+NBD_SIMPLE_REPLY_MAGIC = 0x67446698
+
+NBD_FLAG_FIXED_NEWSTYLE = 1 << 0
+NBD_FLAG_NO_ZEROES = 1 << 1
+
+NBD_FLAG_HAS_FLAGS = 1 << 0
+NBD_FLAG_READ_ONLY = 1 << 1
+NBD_FLAG_SEND_FLUSH = 1 << 2
+
+NBD_OPT_EXPORT_NAME = 1
+NBD_OPT_ABORT = 2
+NBD_OPT_LIST = 3
+NBD_OPT_INFO = 6
+NBD_OPT_GO = 7
+
+NBD_REP_ACK = 1
+NBD_REP_SERVER = 2
+NBD_REP_INFO = 3
+NBD_REP_ERR_UNSUP = (1 << 31) + 1
+NBD_REP_ERR_INVALID = (1 << 31) + 3
+NBD_REP_ERR_UNKNOWN = (1 << 31) + 6
+
+NBD_INFO_EXPORT = 0
+
+NBD_CMD_READ = 0
+NBD_CMD_WRITE = 1
+NBD_CMD_DISC = 2
+NBD_CMD_FLUSH = 3
+
+NBD_EPERM = 1
+NBD_EIO = 5
+NBD_EINVAL = 22
+
+TRANSMISSION_FLAGS = NBD_FLAG_HAS_FLAGS | NBD_FLAG_READ_ONLY | NBD_FLAG_SEND_FLUSH
+
+
+class NbdRequestHandler(socketserver.StreamRequestHandler):
+    """Handles one NBD client connection."""
+
+    def _ReadExactly(self, length):
+        """Reads exactly length bytes from the client.
+
+        Args:
+            length(int): the amount of bytes to read.
+        Returns:
+            bytes: the data, or None if the client disconnected.
+        """
+        data = self.rfile.read(length)
+        if len(data) != length:
+            return None
+        return data
+
+    def _SendOptionReply(self, option, reply_type, data=b''):
+        self.wfile.write(
+            struct.pack('>QIII', NBD_REP_MAGIC, option, reply_type, len(data)) + data)
+
+    def _SendExportInfo(self, option):
+        self._SendOptionReply(
+            option, NBD_REP_INFO,
+            struct.pack('>HQH', NBD_INFO_EXPORT, self.server.GetSize(), TRANSMISSION_FLAGS))
+        self._SendOptionReply(option, NBD_REP_ACK)
+
+    def _Negotiate(self):
+        """Does the handshake and option haggling phase.
+
+        Returns:
+            bool: True if the client moves on to the transmission phase.
+        """
+        self.wfile.write(
+            NBD_MAGIC + struct.pack(
+                '>QH', NBD_OPTS_MAGIC, NBD_FLAG_FIXED_NEWSTYLE | NBD_FLAG_NO_ZEROES))
+        data = self._ReadExactly(4)
+        if data is None:
+            return False
+        client_flags, = struct.unpack('>I', data)
+
+        while True:
+            data = self._ReadExactly(16)
+            if data is None:
+                return False
+            magic, option, length = struct.unpack('>QII', data)
+            if magic != NBD_OPTS_MAGIC:
+                return False
+            option_data = self._ReadExactly(length)
+            if option_data is None:
+                return False
+
+            if option == NBD_OPT_EXPORT_NAME:
+                if option_data.decode(errors='replace') not in ('', self.server.export_name):
+                    return False
+                reply = struct.pack('>QH', self.server.GetSize(), TRANSMISSION_FLAGS)
+                if not client_flags & NBD_FLAG_NO_ZEROES:
+                    reply += b'\x00' * 124
+                self.wfile.write(reply)
+                return True
+            if option == NBD_OPT_ABORT:
+                self._SendOptionReply(option, NBD_REP_ACK)
+                return False
+            if option == NBD_OPT_LIST:
+                name = self.server.export_name.encode()
+                self._SendOptionReply(
+                    option, NBD_REP_SERVER, struct.pack('>I', len(name)) + name)
+                self._SendOptionReply(option, NBD_REP_ACK)
+            elif option in (NBD_OPT_INFO, NBD_OPT_GO):
+                if len(option_data) < 4:
+                    self._SendOptionReply(option, NBD_REP_ERR_INVALID)
+                    continue
+                name_length, = struct.unpack('>I', option_data[:4])
+                name = option_data[4:4 + name_length].decode(errors='replace')
+                if name not in ('', self.server.export_name):
+                    self._SendOptionReply(option, NBD_REP_ERR_UNKNOWN)
+                    continue
+                self._SendExportInfo(option)
+                if option == NBD_OPT_GO:
+                    return True
+            else:
+                self._SendOptionReply(option, NBD_REP_ERR_UNSUP)
+
+    def _SendReply(self, handle, error=0, data=b''):
+        self.wfile.write(struct.pack('>IIQ', NBD_SIMPLE_REPLY_MAGIC, error, handle))
+        if data:
+            self.wfile.write(data)
+
+    def _Transmit(self):
+        """Serves requests until the client disconnects."""
+        while True:
+            data = self._ReadExactly(28)
+            if data is None:
+                return
+            magic, _, command, handle, offset, length = struct.unpack('>IHHQQI', data)
+            if magic != NBD_REQUEST_MAGIC:
+                return
+
+            if command == NBD_CMD_READ:
+                if offset + length > self.server.GetSize():
+                    self._SendReply(handle, NBD_EINVAL)
+                    continue
+                try:
+                    data = self.server.Read(offset, length)
+                except Exception:  # pylint: disable=broad-except
+                    logging.getLogger().exception(
+                        'Error reading {0:d} bytes at {1:d}'.format(length, offset))
+                    self._SendReply(handle, NBD_EIO)
+                    continue
+                self._SendReply(handle, data=data)
+            elif command == NBD_CMD_WRITE:
+                if self._ReadExactly(length) is None:
+                    return
+                self._SendReply(handle, NBD_EPERM)
+            elif command == NBD_CMD_FLUSH:
+                self._SendReply(handle)
+            elif command == NBD_CMD_DISC:
+                return
+            else:
+                self._SendReply(handle, NBD_EINVAL)
+            self.wfile.flush()
+
+    def handle(self):
+        if self._Negotiate():
+            self.wfile.flush()
+            self._Transmit()
+
+
+class NbdServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    """Serves a file object, such as a NandFile, over NBD."""
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, file_object, address=('127.0.0.1', NBD_DEFAULT_PORT), export_name='yand'):
+        """Initializes a NbdServer object.
+
+        Args:
+            file_object(file): the seekable file to serve, usually a NandFile.
+            address(tuple): host & port to listen on.
+            export_name(str): the name of the export.
+        """
+        self.file_object = file_object
+        self.export_name = export_name
+        # Clients can send requests concurrently, but there is only one file object.
+        self._lock = threading.Lock()
+        self._size = file_object.seek(0, 2)
+        super().__init__(address, NbdRequestHandler)
+
+    def GetSize(self):
+        """Returns the size of the exported device, in bytes."""
+        return self._size
+
+    def Read(self, offset, length):
+        """Reads from the exported file.
+
+        Args:
+            offset(int): where to read from.
+            length(int): how many bytes to read.
+        Returns:
+            bytes: the data.
+        """
+        data = bytearray(length)
+        with self._lock, memoryview(data) as view:
+            self.file_object.seek(offset)
+            position = 0
+            while position < length:
+                read = self.file_object.readinto(view[position:])
+                if not read:
+                    break
+                position += read
+        return data
@@ -0,0 +1,122 @@
+"""Tests for the nbd_server module."""
+
+import io
+import socket
+import struct
+import threading
+import unittest
+
+from yand import nbd_server
+
+
+class NbdClient:
+    """Minimal NBD client."""
+
+    def __init__(self, address):
+        self.socket = socket.create_connection(address)
+        self.file = self.socket.makefile('rwb')
+        self.handle = 0
+
+    def Close(self):
+        """Disconnects from the server."""
+        self.file.write(struct.pack(
+            '>IHHQQI', nbd_server.NBD_REQUEST_MAGIC, 0, nbd_server.NBD_CMD_DISC, 0, 0, 0))
+        self.file.flush()
+        self.file.close()
+        self.socket.close()
+
+    def SendOption(self, option, data=b''):
+        """Sends an option, returns the option replies."""
+        self.file.write(struct.pack('>QII', nbd_server.NBD_OPTS_MAGIC, option, len(data)) + data)
+        self.file.flush()
+        replies = []
+        while True:
+            magic, reply_option, reply_type, length = struct.unpack('>QIII', self.file.read(20))
+            assert magic == nbd_server.NBD_REP_MAGIC
+            assert reply_option == option
+            replies.append((reply_type, self.file.read(length)))
+            if reply_type not in (nbd_server.NBD_REP_SERVER, nbd_server.NBD_REP_INFO):
+                return replies
+
+    def Handshake(self):
+        """Returns the handshake flags."""
+        magic, opts_magic, flags = struct.unpack('>8sQH', self.file.read(18))
+        assert magic == nbd_server.NBD_MAGIC
+        assert opts_magic == nbd_server.NBD_OPTS_MAGIC
+        self.file.write(struct.pack('>I', nbd_server.NBD_FLAG_FIXED_NEWSTYLE))
+        self.file.flush()
+        return flags
+
+    def Request(self, command, offset, length, data=b''):
+        """Sends a request, returns the error code & data."""
+        self.handle += 1
+        self.file.write(struct.pack(
+            '>IHHQQI', nbd_server.NBD_REQUEST_MAGIC, 0, command, self.handle, offset, length) +
+                        data)
+        self.file.flush()
+        magic, error, handle = struct.unpack('>IIQ', self.file.read(16))
+        assert magic == nbd_server.NBD_SIMPLE_REPLY_MAGIC
+        assert handle == self.handle
+        if error or command != nbd_server.NBD_CMD_READ:
+            return error, b''
+        return error, self.file.read(length)
+
+
+class NbdServerTest(unittest.TestCase):
+    """Tests for the nbd_server module"""
+
+    def setUp(self):
+        self.data = bytes(range(256)) * 64
+        self.server = nbd_server.NbdServer(io.BytesIO(self.data), address=('127.0.0.1', 0))
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def testGo(self):
+        """Tests the NBD_OPT_GO negotiation and reads."""
+        client = NbdClient(self.server.server_address)
+        self.assertTrue(client.Handshake() & nbd_server.NBD_FLAG_FIXED_NEWSTYLE)
+
+        replies = client.SendOption(nbd_server.NBD_OPT_LIST)
+        self.assertEqual(replies, [
+            (nbd_server.NBD_REP_SERVER, b'\x00\x00\x00\x04yand'), (nbd_server.NBD_REP_ACK, b'')])
+        replies = client.SendOption(12345)
+        self.assertEqual(replies, [(nbd_server.NBD_REP_ERR_UNSUP, b'')])
+        replies = client.SendOption(nbd_server.NBD_OPT_GO, struct.pack('>I', 4) + b'nope')
+        self.assertEqual(replies, [(nbd_server.NBD_REP_ERR_UNKNOWN, b'')])
+
+        replies = client.SendOption(nbd_server.NBD_OPT_GO, b'\x00\x00\x00\x04yand\x00\x00')
+        self.assertEqual(replies[0][0], nbd_server.NBD_REP_INFO)
+        _, size, flags = struct.unpack('>HQH', replies[0][1])
+        self.assertEqual(size, len(self.data))
+        self.assertTrue(flags & nbd_server.NBD_FLAG_READ_ONLY)
+        self.assertEqual(replies[1], (nbd_server.NBD_REP_ACK, b''))
+
+        self.assertEqual(
+            client.Request(nbd_server.NBD_CMD_READ, 1000, 4096),
+            (0, self.data[1000:5096]))
+        self.assertEqual(
+            client.Request(nbd_server.NBD_CMD_READ, len(self.data) - 1, 2),
+            (nbd_server.NBD_EINVAL, b''))
+        self.assertEqual(
+            client.Request(nbd_server.NBD_CMD_WRITE, 0, 4, b'abcd'), (nbd_server.NBD_EPERM, b''))
+        self.assertEqual(client.Request(nbd_server.NBD_CMD_FLUSH, 0, 0), (0, b''))
+        client.Close()
+
+    def testExportName(self):
+        """Tests the NBD_OPT_EXPORT_NAME negotiation."""
+        client = NbdClient(self.server.server_address)
+        client.Handshake()
+        client.file.write(
+            struct.pack('>QII', nbd_server.NBD_OPTS_MAGIC, nbd_server.NBD_OPT_EXPORT_NAME, 4) +
+            b'yand')
+        client.file.flush()
+        size, _ = struct.unpack('>QH', client.file.read(10))
+        self.assertEqual(size, len(self.data))
+        self.assertEqual(client.file.read(124), b'\x00' * 124)
+        self.assertEqual(client.Request(nbd_server.NBD_CMD_READ, 0, 16), (0, self.data[:16]))
+        client.Close()
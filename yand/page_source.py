@@ -0,0 +1,276 @@
+"""Sources of page content to write, prefetched on a background thread.
+
+A PageSource fills buffers of several pages on its own thread, while the previous ones are
+written, so writing to the Flash never waits for the content to be read or generated. The
+buffers are reused: a page yielded by PageSource.Pages() is only valid until the next ones.
+"""
+
+import mmap
+import os
+import queue
+import stat
+import sys
+import threading
+
+from yand import errors
+from yand import helpers
+
+
+class PageSource:
+    """Base class for the content of consecutive pages.
+
+    Subclasses implement _FillPages().
+
+    Attributes:
+        page_count(int): the number of pages available, None if unknown or unlimited.
+    """
+
+    # Number of pages in every buffer
+    BUFFER_PAGES = 64
+    # Number of buffers being filled, or written
+    PREFETCH_BUFFERS = 4
+
+    def __init__(self, page_size, page_count=None):
+        """Initializes a PageSource object.
+
+        Args:
+            page_size(int): length of a page (userdata + oob).
+            page_count(int): the number of pages available, None if unknown or unlimited.
+        """
+        self.page_size = page_size
+        self.page_count = page_count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.Close()
+
+    def Close(self):
+        """Releases the resources used by the source."""
+
+    def _FillPages(self, buffer, page_index, count):
+        """Writes the content of consecutive pages in a buffer.
+
+        Args:
+            buffer(bytearray): the buffer to fill, at least count pages long.
+            page_index(int): the index of the first page, from the start of the source.
+            count(int): the number of pages to fill.
+        Returns:
+            int: the number of pages filled, less than count at the end of the source.
+        """
+        raise NotImplementedError
+
+    def _Prefetch(self, count, free_buffers, full_buffers, stop):
+        """Fills free buffers, until count pages or the end of the source."""
+        page_index = 0
+        try:
+            while (count is None or page_index < count) and not stop.is_set():
+                buffer = free_buffers.get()
+                if buffer is None:
+                    return
+                pages = self.BUFFER_PAGES
+                if count is not None:
+                    pages = min(pages, count - page_index)
+                filled = self._FillPages(buffer, page_index, pages)
+                if filled:
+                    full_buffers.put((buffer, filled))
+                if filled < pages:
+                    break
+                page_index += filled
+        except (OSError, ValueError, errors.YandException) as error:
+            full_buffers.put(error)
+        full_buffers.put(None)
+
+    def Pages(self, count=None):
+        """Yields the content of pages, from the start of the source.
+
+        Args:
+            count(int): the maximum number of pages. Default is up to the end of the source.
+        Yields:
+            memoryview: the content of a page, only valid until the next pages are yielded.
+        """
+        if self.page_count is not None:
+            count = self.page_count if count is None else min(count, self.page_count)
+
+        free_buffers = queue.Queue()
+        for _ in range(self.PREFETCH_BUFFERS):
+            free_buffers.put(bytearray(self.BUFFER_PAGES * self.page_size))
+        full_buffers = queue.Queue()
+        stop = threading.Event()
+        thread = threading.Thread(
+            target=self._Prefetch, args=(count, free_buffers, full_buffers, stop),
+            name='yand-prefetch', daemon=True)
+        thread.start()
+        try:
+            while True:
+                item = full_buffers.get()
+                if item is None:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                buffer, filled = item
+                view = memoryview(buffer)
+                for index in range(filled):
+                    yield view[index * self.page_size:(index + 1) * self.page_size]
+                free_buffers.put(buffer)
+        finally:
+            # The thread may be blocked reading a pipe, it is not waited for.
+            stop.set()
+            free_buffers.put(None)
+
+
+class FileSource(PageSource):
+    """Pages read from a file, or a pipe. The last page is padded with 0xFF."""
+
+    def __init__(self, input_file, page_size, close=True):
+        """Initializes a FileSource object.
+
+        Args:
+            input_file(file): the file to read from, opened in binary mode.
+            page_size(int): length of a page (userdata + oob).
+            close(bool): whether to close the file with the source.
+        """
+        page_count = None
+        file_stat = os.fstat(input_file.fileno())
+        if stat.S_ISREG(file_stat.st_mode):
+            page_count = -(-(file_stat.st_size - input_file.tell()) // page_size)
+        super().__init__(page_size, page_count=page_count)
+        self.file = input_file
+        self.close_file = close
+
+    def Close(self):
+        if self.close_file:
+            self.file.close()
+
+    def _FillPages(self, buffer, page_index, count):
+        length = count * self.page_size
+        with memoryview(buffer) as view:
+            offset = 0
+            while offset < length:
+                read = self.file.readinto(view[offset:length])
+                if not read:
+                    break
+                offset += read
+        filled = -(-offset // self.page_size)
+        buffer[offset:filled * self.page_size] = b'\xff' * (filled * self.page_size - offset)
+        return filled
+
+    def IsExhausted(self):
+        """Returns whether all the content of the file was read."""
+        return not self.file.read(1)
+
+
+class MmapSource(PageSource):
+    """Pages of a memory mapped file. The last page is padded with 0xFF."""
+
+    def __init__(self, path, page_size):
+        """Initializes a MmapSource object.
+
+        Args:
+            path(str): the file to read from. It must not be empty.
+            page_size(int): length of a page (userdata + oob).
+        """
+        with open(path, 'rb') as input_file:
+            self._mmap = mmap.mmap(input_file.fileno(), 0, access=mmap.ACCESS_READ)
+        super().__init__(page_size, page_count=-(-len(self._mmap) // page_size))
+
+    def Close(self):
+        self._mmap.close()
+
+    def _FillPages(self, buffer, page_index, count):
+        start = page_index * self.page_size
+        with memoryview(self._mmap) as view:
+            length = len(view[start:start + count * self.page_size])
+            buffer[:length] = view[start:start + length]
+        filled = -(-length // self.page_size)
+        buffer[length:filled * self.page_size] = b'\xff' * (filled * self.page_size - length)
+        return filled
+
+
+class PatternSource(PageSource):
+    """Pages repeating a pattern, continuing from one page to the next."""
+
+    def __init__(self, pattern, page_size, page_count=None):
+        """Initializes a PatternSource object.
+
+        Args:
+            pattern(bytes): the pattern to repeat.
+            page_size(int): length of a page (userdata + oob).
+            page_count(int): the number of pages, None for unlimited.
+        Raises:
+            errors.YandException: if the pattern is empty.
+        """
+        if not pattern:
+            raise errors.YandException('Pattern is empty')
+        super().__init__(page_size, page_count=page_count)
+        self.pattern = bytes(pattern)
+        # Enough repetitions of the pattern for a buffer, from any offset in the pattern.
+        length = self.BUFFER_PAGES * page_size + len(self.pattern)
+        self._repeated = (self.pattern * -(-length // len(self.pattern)))[:length]
+
+    def _FillPages(self, buffer, page_index, count):
+        offset = page_index * self.page_size % len(self.pattern)
+        length = count * self.page_size
+        buffer[:length] = self._repeated[offset:offset + length]
+        return count
+
+
+class ConstantSource(PatternSource):
+    """Pages filled with a single value."""
+
+    def __init__(self, value, page_size, page_count=None):
+        """Initializes a ConstantSource object.
+
+        Args:
+            value(int): the value of every byte.
+            page_size(int): length of a page (userdata + oob).
+            page_count(int): the number of pages, None for unlimited.
+        """
+        super().__init__(bytes([value]), page_size, page_count=page_count)
+
+
+class PGMSource(PageSource):
+    """Pages showing a PGM picture, one row of pixels per page, padded with 0xFF."""
+
+    def __init__(self, path, page_size, wrap=True):
+        """Initializes a PGMSource object.
+
+        Args:
+            path(str): the PGM picture to read.
+            page_size(int): length of a page (userdata + oob).
+            wrap(bool): whether to repeat the picture. Otherwise pages after the picture are
+                filled with 0x55.
+        """
+        super().__init__(page_size)
+        self.picture = helpers.PGMReader(path)
+        self.wrap = wrap
+
+    def Close(self):
+        self.picture.file.close()
+
+    def _FillPages(self, buffer, page_index, count):
+        for index in range(count):
+            row = page_index + index
+            if self.wrap:
+                row %= self.picture.height
+            buffer[index * self.page_size:(index + 1) * self.page_size] = self.picture.Read(
+                0, row, self.page_size)
+        return count
+
+
+def OpenFile(filename, page_size):
+    """Returns the source for a dump file.
+
+    Args:
+        filename(str): path to the dump. "-" means stdin.
+        page_size(int): length of a page (userdata + oob).
+    Returns:
+        PageSource: the source.
+    """
+    if filename == '-':
+        return FileSource(sys.stdin.buffer, page_size, close=False)
+    if os.path.isfile(filename) and os.stat(filename).st_size:
+        return MmapSource(filename, page_size)
+    # pylint: disable=consider-using-with
+    return FileSource(open(filename, 'rb'), page_size)
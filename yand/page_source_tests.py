@@ -0,0 +1,134 @@
+"""Tests for the page_source module."""
+
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from yand import errors
+from yand import helpers
+from yand import page_source
+from yand import test_lib
+
+
+class PageSourceTest(unittest.TestCase):
+    """Tests for the page_source module"""
+
+    def setUp(self):
+        patcher = mock.patch.object(page_source.PageSource, 'BUFFER_PAGES', 3)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def testSources(self):
+        """Tests the content of pages, over several buffers."""
+        data = bytes(range(100))
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, 'dump.bin')
+            with open(path, 'wb') as dump_file:
+                dump_file.write(data)
+            expected_pages = [
+                data[offset:offset + 16].ljust(16, b'\xff') for offset in range(0, 100, 16)]
+
+            with page_source.OpenFile(path, 16) as source:
+                self.assertIsInstance(source, page_source.MmapSource)
+                self.assertEqual(source.page_count, 7)
+                self.assertEqual([bytes(page) for page in source.Pages()], expected_pages)
+                self.assertEqual([bytes(page) for page in source.Pages(2)], expected_pages[:2])
+
+            with open(path, 'rb') as dump_file:
+                source = page_source.FileSource(dump_file, 16)
+                self.assertEqual(source.page_count, 7)
+                self.assertEqual([bytes(page) for page in source.Pages()], expected_pages)
+                self.assertTrue(source.IsExhausted())
+
+        source = page_source.PatternSource(b'\x01\x02\x03', 16)
+        pages = [bytes(page) for page in source.Pages(5)]
+        self.assertEqual(b''.join(pages), (b'\x01\x02\x03' * 27)[:80])
+        source = page_source.ConstantSource(0x5A, 16, page_count=4)
+        self.assertEqual([bytes(page) for page in source.Pages(10)], [b'\x5a' * 16] * 4)
+        with self.assertRaises(errors.YandException):
+            page_source.PatternSource(b'', 16)
+
+    def testPipe(self):
+        """Tests reading pages from a pipe, written a few bytes at a time."""
+        read_fd, write_fd = os.pipe()
+        data = os.urandom(16 * 10)
+
+        def _Write():
+            with os.fdopen(write_fd, 'wb', buffering=0) as pipe:
+                for offset in range(0, len(data), 7):
+                    pipe.write(data[offset:offset + 7])
+
+        writer = threading.Thread(target=_Write)
+        writer.start()
+        with os.fdopen(read_fd, 'rb') as pipe:
+            source = page_source.FileSource(pipe, 16, close=False)
+            self.assertIsNone(source.page_count)
+            self.assertEqual(b''.join(source.Pages(8)), data[:16 * 8])
+            writer.join()
+            self.assertFalse(source.IsExhausted())
+
+    def testPGM(self):
+        """Tests PGMSource and helpers.PGMReader."""
+        pixels = bytes(range(12))
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, 'picture.pgm')
+            with open(path, 'wb') as pgm_file:
+                pgm_file.write(b'P5\n# a comment\n4 3\n255\n' + pixels)
+
+            with page_source.PGMSource(path, 6) as source:
+                pages = [bytes(page) for page in source.Pages(7)]
+            rows = [pixels[row * 4:(row + 1) * 4] + b'\xff\xff' for row in range(3)]
+            self.assertEqual(pages, rows * 2 + rows[:1])
+
+            with page_source.PGMSource(path, 6, wrap=False) as source:
+                pages = [bytes(page) for page in source.Pages(4)]
+            self.assertEqual(pages, rows + [b'\x55' * 6])
+
+            with helpers.PGMReader(path) as picture:
+                self.assertEqual(picture.Read(2, 1, 3), pixels[6:8] + b'\xff')
+                self.assertEqual(picture.Read(1, 0, 2), pixels[1:3])
+
+    def testRingBytesIO(self):
+        """Tests helpers.RingBytesIO."""
+        ring = helpers.RingBytesIO(b'abc')
+        self.assertEqual(ring.read(7), b'abcabca')
+        ring.seek(5)
+        self.assertEqual(ring.read(2), b'ca')
+        self.assertEqual(helpers.RingBytesIO().read(3), b'')
+
+    def testWrite(self):
+        """Tests the NandInterface write operations."""
+        nand = test_lib.FakeNand(16, 4, 8)
+        nand.FillWithValue(0xAA, start_page=2, end_page=9)
+        self.assertEqual(nand.pages_written, list(range(2, 9)))
+        self.assertTrue((nand.pages[2:9] == 0xAA).all())
+
+        data = os.urandom(16 * 5 + 3)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, 'dump.bin')
+            with open(path, 'wb') as dump_file:
+                dump_file.write(data)
+
+            nand = test_lib.FakeNand(16, 4, 8)
+            nand.WriteFileToFlash(path, start_page=10)
+            self.assertEqual(nand.pages_written, list(range(10, 16)))
+            self.assertEqual(nand.pages[10:16].tobytes(), data.ljust(96, b'\xff'))
+            with self.assertRaises(errors.YandException):
+                nand.WriteFileToFlash(path, start_page=10, end_page=15)
+
+            # From stdin
+            for end_page, expected_pages in [(None, 6), (4, None)]:
+                nand = test_lib.FakeNand(16, 4, 8)
+                read_fd, write_fd = os.pipe()
+                with os.fdopen(write_fd, 'wb') as pipe:
+                    pipe.write(data)
+                with os.fdopen(read_fd, 'rb') as pipe:
+                    with mock.patch('sys.stdin', mock.Mock(buffer=pipe)):
+                        if expected_pages:
+                            nand.WriteFileToFlash('-', end_page=end_page)
+                            self.assertEqual(len(nand.pages_written), expected_pages)
+                        else:
+                            with self.assertRaises(errors.YandException):
+                                nand.WriteFileToFlash('-', end_page=end_page)
@@ -0,0 +1,286 @@
+"""Qualifies a NAND Flash, by writing test patterns to blocks and reading them back.
+
+For every pattern, each block is erased, programmed and read back once, with batches of commands
+covering a whole block, or as many pages as the device can read without stalling. Read back pages
+are compared with the expected pattern at once, and
+bit errors, failures and operation times are recorded for every block.
+"""
+
+import csv
+import logging
+import time
+
+import numpy
+
+from yand import erase
+from yand import errors
+
+PATTERNS = [
+    'checkerboard', 'inverse_checkerboard', 'walking_ones', 'walking_zeros', 'address', 'random']
+
+# Patterns run when none are given
+DEFAULT_PATTERNS = 'checkerboard,inverse_checkerboard,walking_ones,walking_zeros,address,random'
+
+RESULT_DTYPE = numpy.dtype([
+    ('block', numpy.uint32),
+    # Whether the erase status reported a failure
+    ('erase_failed', numpy.bool_),
+    # Number of pages whose program status reported a failure
+    ('program_failed', numpy.uint16),
+    # Total number of bits read back different from the pattern
+    ('bit_errors', numpy.uint32),
+    # Highest number of bit errors in one page
+    ('max_page_bit_errors', numpy.uint32),
+    # Number of pages with bit errors
+    ('error_pages', numpy.uint16),
+    # Times measured on the host, in seconds. They include USB transfers, which take most of
+    # the program and read times.
+    ('erase_host_time', numpy.float32),
+    ('program_host_time', numpy.float32),
+    ('read_host_time', numpy.float32),
+])
+
+
+class Pattern:
+    """A test pattern, with the expected content of every page."""
+
+    def __init__(self, name, seed=0):
+        """Initializes a Pattern object.
+
+        Args:
+            name(str): one of PATTERNS.
+            seed(int): the seed of the random pattern.
+        Raises:
+            errors.YandException: if the pattern is unknown.
+        """
+        if name not in PATTERNS:
+            raise errors.YandException('Unknown pattern \'{0:s}\', expected one of {1:s}'.format(
+                name, ', '.join(PATTERNS)))
+        self.name = name
+        self.seed = seed
+
+    def __str__(self):
+        if self.name == 'random':
+            return 'random:{0:d}'.format(self.seed)
+        return self.name
+
+    def GetPages(self, first_page, count, page_size):
+        """Returns the content of consecutive pages.
+
+        The content of a page only depends on its number, not on the other pages asked for.
+
+        Args:
+            first_page(int): the number of the first page.
+            count(int): the number of pages.
+            page_size(int): length of a page (userdata + oob).
+        Returns:
+            numpy.ndarray: the content of the pages, a (count, page_size) uint8 array.
+        """
+        page_numbers = numpy.arange(first_page, first_page + count, dtype=numpy.uint64)
+        pages = numpy.empty((count, page_size), dtype=numpy.uint8)
+        if self.name in ('checkerboard', 'inverse_checkerboard'):
+            values = numpy.where(page_numbers % 2 == 0, 0x55, 0xAA).astype(numpy.uint8)
+            if self.name == 'inverse_checkerboard':
+                values ^= 0xFF
+            pages[:] = values[:, None]
+        elif self.name in ('walking_ones', 'walking_zeros'):
+            values = (1 << (page_numbers % 8)).astype(numpy.uint8)
+            if self.name == 'walking_zeros':
+                values ^= 0xFF
+            pages[:] = values[:, None]
+        elif self.name == 'address':
+            # Every 32 bits word holds its own address in the Flash, divided by 4.
+            words = -(-page_size // 4)
+            addresses = (
+                page_numbers[:, None] * numpy.uint64(words) +
+                numpy.arange(words, dtype=numpy.uint64)[None, :])
+            pages[:] = addresses.astype('<u4').view(numpy.uint8)[:, :page_size]
+        else:
+            for index, page_number in enumerate(page_numbers):
+                pages[index] = numpy.random.default_rng((self.seed, int(page_number))).integers(
+                    0, 256, page_size, dtype=numpy.uint8)
+        return pages
+
+
+def ParsePatterns(patterns_string, seed=0):
+    """Returns the patterns from their description.
+
+    Args:
+        patterns_string(str): comma separated pattern names. The random pattern can be given a
+            seed with 'random:SEED'.
+        seed(int): the seed of the random patterns without one.
+    Returns:
+        list(Pattern): the patterns.
+    Raises:
+        errors.YandException: if the description is invalid.
+    """
+    patterns = []
+    for pattern_string in patterns_string.split(','):
+        name, *parameters = pattern_string.strip().split(':')
+        pattern_seed = seed
+        if parameters:
+            if name != 'random' or len(parameters) != 1:
+                raise errors.YandException('Invalid pattern \'{0:s}\''.format(pattern_string))
+            try:
+                pattern_seed = int(parameters[0], 0)
+            except ValueError as value_error:
+                raise errors.YandException(
+                    'Invalid seed in pattern \'{0:s}\''.format(pattern_string)) from value_error
+        patterns.append(Pattern(name, seed=pattern_seed))
+    return patterns
+
+
+class Qualifier:
+    """Runs test patterns on blocks of a NAND Flash."""
+
+    # Size of the FT2232H receive buffer. Commands reading more stall until the host reads.
+    RX_BUFFER_SIZE = 4096
+
+    def __init__(self, nand):
+        """Initializes a Qualifier object.
+
+        Args:
+            nand(NandInterface): the NAND Flash to test, already set up.
+        """
+        self.nand = nand
+        self.logger = logging.getLogger()
+
+    def _RunBatch(self, batch):
+        """Sends a batch, and returns its result and how long it took."""
+        start_time = time.monotonic()
+        self.nand.ftdi_device.SendBatch(batch)
+        result = self.nand.ftdi_device.ReadBatchResult(batch)
+        return result, time.monotonic() - start_time
+
+    def _EraseBlock(self, block):
+        """Erases a block, and returns its status and how long it took."""
+        batch = self.nand.ftdi_device.NewBatch()
+        batch.write_protect = False
+        erase.EraseEngine(self.nand, multi_plane=False).QueueErase(batch, [block])
+        statuses, duration = self._RunBatch(batch)
+        return statuses[0], duration
+
+    def _ProgramPages(self, first_page, pages):
+        """Programs pages, and returns their statuses and how long it took."""
+        batch = self.nand.ftdi_device.NewBatch()
+        batch.write_protect = False
+        for index, page in enumerate(pages):
+            batch.Write(bytearray([self.nand.NAND_CMD_PROG_PAGE]), command=True)
+            batch.Write(
+                ((first_page + index) << 16).to_bytes(8, byteorder='little')[
+                    :self.nand.address_cycles], address=True)
+            batch.Write(page.tobytes())
+            batch.Write(bytearray([self.nand.NAND_CMD_PROG_PAGE_START]), command=True)
+            batch.WaitReady()
+            batch.Write(bytearray([self.nand.NAND_CMD_STATUS]), command=True)
+            batch.Read(1)
+        return self._RunBatch(batch)
+
+    def _ReadPages(self, first_page, count):
+        """Reads pages, and returns their content and how long it took.
+
+        A batch doesn't read more pages than the device receive buffer holds, and its result
+        is read before the next one is sent.
+        """
+        batch_pages = max(1, self.RX_BUFFER_SIZE // self.nand.page_size)
+        end_page = first_page + count
+        data = bytearray()
+        duration = 0
+        for batch_first_page in range(first_page, end_page, batch_pages):
+            batch = self.nand.ftdi_device.NewBatch()
+            batch_end_page = min(batch_first_page + batch_pages, end_page)
+            for page_number in range(batch_first_page, batch_end_page):
+                batch.Write(bytearray([self.nand.NAND_CMD_READ0]), command=True)
+                batch.Write(
+                    (page_number << 16).to_bytes(8, byteorder='little')[
+                        :self.nand.address_cycles], address=True)
+                batch.Write(bytearray([self.nand.NAND_CMD_READSTART]), command=True)
+                batch.WaitReady()
+                batch.Read(self.nand.page_size)
+            batch_data, batch_duration = self._RunBatch(batch)
+            data += batch_data
+            duration += batch_duration
+        return numpy.frombuffer(bytes(data), dtype=numpy.uint8).reshape(
+            (count, self.nand.page_size)), duration
+
+    def TestBlock(self, pattern, block, result):
+        """Erases a block, writes a pattern to it, and reads it back.
+
+        Args:
+            pattern(Pattern): the pattern to write.
+            block(int): the block to test.
+            result(numpy.void): the RESULT_DTYPE record to fill.
+        """
+        pages_per_block = self.nand.pages_per_block
+        first_page = block * pages_per_block
+        result['block'] = block
+
+        status, result['erase_host_time'] = self._EraseBlock(block)
+        result['erase_failed'] = status & erase.STATUS_FAIL or not status & erase.STATUS_READY
+
+        expected_pages = pattern.GetPages(first_page, pages_per_block, self.nand.page_size)
+        statuses, result['program_host_time'] = self._ProgramPages(first_page, expected_pages)
+        statuses = numpy.frombuffer(bytes(statuses), dtype=numpy.uint8)
+        result['program_failed'] = numpy.count_nonzero(
+            (statuses & erase.STATUS_FAIL != 0) | (statuses & erase.STATUS_READY == 0))
+
+        pages, result['read_host_time'] = self._ReadPages(first_page, pages_per_block)
+        page_bit_errors = numpy.unpackbits(pages ^ expected_pages, axis=1).sum(
+            axis=1, dtype=numpy.uint32)
+        result['bit_errors'] = page_bit_errors.sum()
+        result['max_page_bit_errors'] = page_bit_errors.max()
+        result['error_pages'] = numpy.count_nonzero(page_bit_errors)
+
+    def Run(self, pattern, blocks, progress_callback=None):
+        """Tests blocks with a pattern.
+
+        Args:
+            pattern(Pattern): the pattern to write.
+            blocks(list(int)): the blocks to test.
+            progress_callback(callable): called with the number of blocks tested.
+        Returns:
+            numpy.ndarray: one RESULT_DTYPE record per block.
+        """
+        results = numpy.zeros(len(blocks), dtype=RESULT_DTYPE)
+        for index, block in enumerate(blocks):
+            self.TestBlock(pattern, block, results[index])
+            if results[index]['erase_failed'] or results[index]['program_failed']:
+                self.logger.warning('Block {0:d} failed with pattern {1!s}'.format(block, pattern))
+            elif results[index]['bit_errors']:
+                self.logger.debug('Block {0:d}: {1:d} bit errors with pattern {2!s}'.format(
+                    block, int(results[index]['bit_errors']), pattern))
+            if progress_callback:
+                progress_callback(1)
+        return results
+
+
+def IsBadBlock(result):
+    """Returns whether a block failed an operation.
+
+    Args:
+        result(numpy.void): the RESULT_DTYPE record of the block.
+    Returns:
+        bool: whether the erase, or programming a page, failed.
+    """
+    return bool(result['erase_failed'] or result['program_failed'])
+
+
+def WriteReport(path, results):
+    """Writes the results of a qualification as CSV.
+
+    Args:
+        path(str): the file to write.
+        results(list(tuple(Pattern, numpy.ndarray))): the results of every pattern.
+    """
+    with open(path, 'w', encoding='utf-8', newline='') as report_file:
+        writer = csv.writer(report_file)
+        writer.writerow(['pattern'] + list(RESULT_DTYPE.names))
+        for pattern, pattern_results in results:
+            for result in pattern_results:
+                row = [str(pattern)]
+                for name in RESULT_DTYPE.names:
+                    if name.endswith('_time'):
+                        row.append('{0:.6f}'.format(result[name]))
+                    else:
+                        row.append(int(result[name]))
+                writer.writerow(row)
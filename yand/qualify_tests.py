@@ -0,0 +1,85 @@
+"""Tests for the qualify module."""
+
+import csv
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy
+
+from yand import errors
+from yand import ftdi_device
+from yand import nand_interface
+from yand import qualify
+from yand import test_lib
+
+
+class QualifyTest(unittest.TestCase):
+    """Tests for the qualify module"""
+
+    def testPatterns(self):
+        """Tests the content of patterns, and ParsePatterns."""
+        patterns = {
+            str(pattern): pattern for pattern in qualify.ParsePatterns(qualify.DEFAULT_PATTERNS)}
+        self.assertEqual(sorted(patterns), sorted(qualify.PATTERNS[:-1] + ['random:0']))
+
+        pages = patterns['checkerboard'].GetPages(3, 2, 8)
+        numpy.testing.assert_array_equal(pages, [[0xAA] * 8, [0x55] * 8])
+        pages = patterns['walking_zeros'].GetPages(7, 2, 8)
+        numpy.testing.assert_array_equal(pages, [[0x7F] * 8, [0xFE] * 8])
+        pages = patterns['address'].GetPages(2, 1, 10)
+        self.assertEqual(pages.tobytes(), b'\x06\x00\x00\x00\x07\x00\x00\x00\x08\x00')
+
+        random_pattern = patterns['random:0']
+        numpy.testing.assert_array_equal(
+            random_pattern.GetPages(10, 3, 32), random_pattern.GetPages(0, 13, 32)[10:])
+        self.assertFalse(numpy.array_equal(
+            random_pattern.GetPages(0, 1, 32),
+            qualify.ParsePatterns('random:0x10')[0].GetPages(0, 1, 32)))
+
+        for patterns_string in ['checkerboard,diagonal', 'address:3', 'random:seed']:
+            with self.assertRaises(errors.YandException):
+                qualify.ParsePatterns(patterns_string)
+
+    def testQualify(self):
+        """Tests NandInterface.Qualify, and the CSV report."""
+        nand = nand_interface.NandInterface()
+        nand.ftdi_device = ftdi_device.FtdiDevice()
+        fake_ftdi = test_lib.FakeFtdi(32, 4, 4, stuck_pages=[5, 6], failing_pages=[9])
+        nand.ftdi_device.ftdi = fake_ftdi
+        nand.page_size = 32
+        nand.pages_per_block = 4
+        nand.number_of_blocks = 4
+        nand.progress_bar_class = mock.MagicMock()
+
+        patterns = qualify.ParsePatterns('checkerboard,walking_ones,random:1')
+        # Blocks are read back 2 pages at a time.
+        with mock.patch.object(qualify.Qualifier, 'RX_BUFFER_SIZE', 64):
+            with self.assertLogs(level='WARNING'):
+                results = nand.Qualify(patterns, skip_blocks={3})
+        self.assertEqual(fake_ftdi.max_pending_bytes, 64)
+        self.assertEqual([pattern for pattern, _ in results], patterns)
+
+        checkerboard_results = results[0][1]
+        self.assertEqual(list(checkerboard_results['block']), [0, 1, 2])
+        # Page 5 should have 0xAA, page 6 0x55 with bit 0 set.
+        self.assertEqual(list(checkerboard_results['bit_errors']), [0, 1, 0])
+        self.assertEqual(list(checkerboard_results['error_pages']), [0, 1, 0])
+        self.assertEqual(list(checkerboard_results['program_failed']), [0, 0, 1])
+        self.assertFalse(checkerboard_results['erase_failed'].any())
+        # Walking ones never sets bit 0 of pages 5 and 6
+        self.assertEqual(list(results[1][1]['bit_errors']), [0, 0, 0])
+        self.assertEqual(
+            [qualify.IsBadBlock(result) for result in results[2][1]], [False, False, True])
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            report_path = os.path.join(temp_dir, 'report.csv')
+            qualify.WriteReport(report_path, results)
+            with open(report_path, 'r', encoding='utf-8', newline='') as report_file:
+                rows = list(csv.DictReader(report_file))
+        self.assertEqual(len(rows), 9)
+        self.assertEqual(rows[1]['pattern'], 'checkerboard')
+        self.assertEqual((rows[1]['block'], rows[1]['bit_errors']), ('1', '1'))
+        self.assertEqual(rows[8]['pattern'], 'random:1')
+        self.assertEqual(rows[8]['program_failed'], '1')
@@ -0,0 +1,183 @@
+"""Fakes shared by the tests."""
+
+from unittest import mock
+
+import numpy
+from pyftdi import ftdi
+
+from yand import nand_interface
+
+
+class FakeNand(nand_interface.NandInterface):
+    """NandInterface keeping the content of the NAND Flash in memory.
+
+    Attributes:
+        pages(numpy.ndarray): the content of every page, a (number of pages, page_size) uint8
+            array. Pages not given are erased.
+        pages_read(list(int)): the numbers of the pages read, in order.
+        pages_written(list(int)): the numbers of the pages written, in order.
+    """
+
+    def __init__(self, page_size, pages_per_block, number_of_blocks, data=None, oob_size=0):
+        """Initializes a FakeNand object.
+
+        Args:
+            page_size(int): length of a page (userdata + oob).
+            pages_per_block(int): number of pages per block.
+            number_of_blocks(int): total number of blocks.
+            data(bytes): the content of the first pages.
+            oob_size(int): length of the spare area.
+        """
+        super().__init__()
+        self.page_size = page_size
+        self.oob_size = oob_size
+        self.pages_per_block = pages_per_block
+        self.number_of_blocks = number_of_blocks
+        self.pages = numpy.full(
+            (pages_per_block * number_of_blocks, page_size), 0xFF, dtype=numpy.uint8)
+        if data is not None:
+            data = numpy.frombuffer(data, dtype=numpy.uint8).ravel()
+            self.pages.reshape(-1)[:len(data)] = data
+        self.pages_read = []
+        self.pages_written = []
+        self.progress_bar_class = mock.MagicMock()
+
+    def ReadPage(self, page_number):
+        """Returns the content of a page."""
+        self.pages_read.append(page_number)
+        return bytearray(self.pages[page_number].tobytes())
+
+    def WritePage(self, page_number, data, write_check=False):
+        """Replaces the content of a page."""
+        self.pages_written.append(page_number)
+        self.pages[page_number] = numpy.frombuffer(bytes(data), dtype=numpy.uint8)
+
+
+class FakeFtdi:
+    """Fake pyftdi Ftdi object, running MCU host bus commands on a simulated NAND Flash.
+
+    Erasing a bad block fails, as does erasing a multi-plane bad block along with other planes.
+    Bit 0 of the first byte of stuck pages is always 0, and programming failing pages fails.
+
+    Attributes:
+        pages(numpy.ndarray): the content of every page, a (number of pages, page_size) uint8
+            array.
+        erased(list(tuple(int))): the blocks of every erase operation.
+        writes(int): the number of write_data calls.
+        max_pending_bytes(int): the highest number of bytes read by commands, and not yet
+            returned to the host.
+    """
+
+    NAND_CMD_MULTI_PLANE_ERASE_START = 0xD1
+
+    def __init__(
+            self, page_size, pages_per_block, number_of_blocks, bad_blocks=(),
+            multi_plane_bad_blocks=(), stuck_pages=(), failing_pages=()):
+        self.page_size = page_size
+        self.pages_per_block = pages_per_block
+        self.pages = numpy.full(
+            (pages_per_block * number_of_blocks, page_size), 0xFF, dtype=numpy.uint8)
+        self.bad_blocks = bad_blocks
+        self.multi_plane_bad_blocks = multi_plane_bad_blocks
+        self.stuck_pages = stuck_pages
+        self.failing_pages = failing_pages
+        self.erased = []
+        self.writes = 0
+        self.max_pending_bytes = 0
+        self._command = None
+        self._address = bytearray()
+        self._data = bytearray()
+        self._latched_blocks = []
+        self._output = bytearray()
+        self._read_offset = 0
+        self._status = 0xE0
+
+    def _CheckWritable(self, cmd_type, address_cycles):
+        if cmd_type & 0x20 == 0:
+            raise AssertionError('Writing with write protect on')
+        if len(self._address) != address_cycles:
+            raise AssertionError('Writing with {0:d} address cycles'.format(len(self._address)))
+
+    def _Erase(self, cmd_type, value):
+        self._CheckWritable(cmd_type, 3)
+        block = int.from_bytes(self._address, byteorder='little') // self.pages_per_block
+        self._latched_blocks.append(block)
+        self._address = bytearray()
+        if value == self.NAND_CMD_MULTI_PLANE_ERASE_START:
+            return
+        blocks = self._latched_blocks
+        failed = any(block in self.bad_blocks for block in blocks) or (
+            len(blocks) > 1 and any(block in self.multi_plane_bad_blocks for block in blocks))
+        if not failed:
+            for block in blocks:
+                self.pages[block * self.pages_per_block:(block + 1) * self.pages_per_block] = 0xFF
+        self._status = 0xE1 if failed else 0xE0
+        self.erased.append(tuple(blocks))
+        self._latched_blocks = []
+
+    def _Program(self, cmd_type):
+        self._CheckWritable(cmd_type, 5)
+        page_number = int.from_bytes(self._address, byteorder='little') >> 16
+        self.pages[page_number] &= numpy.frombuffer(bytes(self._data), dtype=numpy.uint8)
+        if page_number in self.stuck_pages:
+            self.pages[page_number, 0] &= 0xFE
+        self._status = 0xE1 if page_number in self.failing_pages else 0xE0
+
+    def _Latch(self, cmd_type, value):
+        if cmd_type & 0x80:
+            self._address.append(value)
+            return
+        if not cmd_type & 0x40:
+            self._data.append(value)
+            return
+        self._command = value
+        if value in (0x00, 0x60, 0x80):
+            self._address = bytearray()
+            self._data = bytearray()
+        elif value == 0x30:
+            self._read_offset = 0
+        elif value in (0xD0, self.NAND_CMD_MULTI_PLANE_ERASE_START):
+            self._Erase(cmd_type, value)
+        elif value == 0x10:
+            self._Program(cmd_type)
+
+    def _ReadByte(self):
+        if self._command == 0x70:
+            return self._status
+        page_number = int.from_bytes(self._address, byteorder='little') >> 16
+        value = self.pages[page_number, self._read_offset]
+        self._read_offset += 1
+        return value
+
+    def write_data(self, data):  # pylint: disable=invalid-name
+        """Runs MCU host bus commands."""
+        self.writes += 1
+        data = bytes(data)
+        index = 0
+        while index < len(data):
+            opcode = data[index]
+            if opcode == ftdi.Ftdi.WRITE_EXTENDED:
+                cmd_type = data[index + 1]
+                self._Latch(cmd_type, data[index + 3])
+                index += 4
+            elif opcode == ftdi.Ftdi.WRITE_SHORT:
+                self._Latch(cmd_type, data[index + 2])
+                index += 3
+            elif opcode == ftdi.Ftdi.READ_EXTENDED:
+                self._output.append(self._ReadByte())
+                index += 3
+            elif opcode == ftdi.Ftdi.READ_SHORT:
+                self._output.append(self._ReadByte())
+                index += 2
+            elif opcode in (ftdi.Ftdi.WAIT_ON_HIGH, ftdi.Ftdi.SEND_IMMEDIATE):
+                index += 1
+            else:
+                raise AssertionError('Unexpected opcode 0x{0:02x}'.format(opcode))
+            self.max_pending_bytes = max(self.max_pending_bytes, len(self._output))
+        return len(data)
+
+    def read_data_bytes(self, size, attempt=1):  # pylint: disable=invalid-name,unused-argument
+        """Returns the bytes read by the commands run."""
+        data = self._output[:size]
+        del self._output[:size]
+        return data
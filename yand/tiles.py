@@ -0,0 +1,457 @@
+"""Renders map tiles of a dump, as shown by tools/viz_http.py.
+
+The dump is split in columns of consecutive pages, one page per pixel row and one byte per
+pixel, that are put side by side. This picture is then cut into 256x256 tiles, in the 'google'
+layout Leaflet uses: at zoom level 0 the whole picture fits in one tile, and every zoom level
+doubles its size.
+"""
+
+import collections
+import concurrent.futures
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+
+import numpy
+
+from yand import errors
+
+TILE_SIZE = 256
+
+
+def EncodePNG(pixels):
+    """Encodes pixels as a PNG picture.
+
+    Args:
+        pixels(numpy.ndarray): uint8 array of shape (height, width) for greyscale, or
+            (height, width, 4) for RGBA.
+    Returns:
+        bytes: the PNG data.
+    """
+    height, width = pixels.shape[:2]
+    color_type = 0 if pixels.ndim == 2 else 6
+    rows = numpy.zeros((height, pixels[0].size + 1), dtype=numpy.uint8)
+    rows[:, 1:] = pixels.reshape(height, -1)
+
+    def _Chunk(chunk_type, data):
+        return (struct.pack('>I', len(data)) + chunk_type + data +
+                struct.pack('>I', zlib.crc32(chunk_type + data)))
+
+    return b''.join([
+        b'\x89PNG\r\n\x1a\n',
+        _Chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, color_type, 0, 0, 0)),
+        _Chunk(b'IDAT', zlib.compress(rows.tobytes(), 6)),
+        _Chunk(b'IEND', b''),
+    ])
+
+
+def DecodePNG(data):
+    """Decodes a PNG picture, as written by EncodePNG.
+
+    Args:
+        data(bytes): the PNG data.
+    Returns:
+        numpy.ndarray: the pixels.
+    Raises:
+        errors.YandException: if the picture is not supported.
+    """
+    if data[:8] != b'\x89PNG\r\n\x1a\n':
+        raise errors.YandException('Not a PNG picture')
+    offset = 8
+    idat = []
+    width = height = color_type = None
+    while offset < len(data):
+        length, chunk_type = struct.unpack('>I4s', data[offset:offset + 8])
+        chunk_data = data[offset + 8:offset + 8 + length]
+        if chunk_type == b'IHDR':
+            width, height, depth, color_type, _, _, interlace = struct.unpack(
+                '>IIBBBBB', chunk_data)
+            if depth != 8 or color_type not in (0, 6) or interlace:
+                raise errors.YandException('Unsupported PNG picture')
+        elif chunk_type == b'IDAT':
+            idat.append(chunk_data)
+        offset += length + 12
+    if color_type is None:
+        raise errors.YandException('PNG picture has no header')
+    channels = 1 if color_type == 0 else 4
+    rows = numpy.frombuffer(zlib.decompress(b''.join(idat)), dtype=numpy.uint8).reshape(
+        height, width * channels + 1)
+    if rows[:, 0].any():
+        raise errors.YandException('Unsupported PNG filter')
+    if channels == 1:
+        return rows[:, 1:].copy()
+    return rows[:, 1:].reshape(height, width, channels)
+
+
+class DumpImage:
+    """Picture of a dump file, read through a memory map."""
+
+    def __init__(self, dump_path, page_size, splits=8):
+        """Initializes a DumpImage object.
+
+        Args:
+            dump_path(str): path to the raw dump.
+            page_size(int): length of a page (userdata + oob).
+            splits(int): number of columns.
+        """
+        self.page_size = page_size
+        self.splits = splits
+
+        # The memory map stays valid once the file is closed.
+        with open(dump_path, 'rb') as dump_file:
+            self.total_size = os.fstat(dump_file.fileno()).st_size
+            if self.total_size:
+                self._mmap = mmap.mmap(dump_file.fileno(), 0, access=mmap.ACCESS_READ)
+                self.data = numpy.frombuffer(self._mmap, dtype=numpy.uint8)
+            else:
+                self._mmap = None
+                self.data = numpy.zeros(0, dtype=numpy.uint8)
+
+        # Same layout as bin_to_ppm.c
+        self.column_size = self.total_size // splits
+        self.height = self.column_size // page_size
+        self.width = page_size * splits
+        self.max_zoom = max(
+            0, math.ceil(math.log2(max(self.width, self.height, 1) / TILE_SIZE)))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.Close()
+
+    def Close(self):
+        """Releases the memory map."""
+        self.data = None
+        if self._mmap:
+            self._mmap.close()
+
+    def GetPixels(self, rows, columns):
+        """Returns the value of some pixels of the picture.
+
+        Args:
+            rows(numpy.ndarray): the rows to read.
+            columns(numpy.ndarray): the columns to read.
+        Returns:
+            numpy.ndarray: uint8 array of shape (len(rows), len(columns)). Pixels outside of
+                the picture are 0.
+        """
+        if not self.height:
+            return numpy.zeros((len(rows), len(columns)), dtype=numpy.uint8)
+        valid_rows = (rows >= 0) & (rows < self.height)
+        valid_columns = (columns >= 0) & (columns < self.width)
+        rows = numpy.where(valid_rows, rows, 0)
+        columns = numpy.where(valid_columns, columns, 0)
+
+        split, offset_in_page = numpy.divmod(columns, self.page_size)
+        column_offsets = split * self.column_size + offset_in_page
+        row_offsets = rows * self.page_size
+        pixels = self.data[row_offsets[:, None] + column_offsets[None, :]]
+        pixels[~valid_rows, :] = 0
+        pixels[:, ~valid_columns] = 0
+        return pixels
+
+    def _GetSampleIndexes(self, tile_index, zoom, samples):
+        """Returns the picture indexes to read for one axis of a tile.
+
+        Args:
+            tile_index(int): the tile x or y coordinate.
+            zoom(int): the zoom level.
+            samples(int): maximum number of samples per tile pixel.
+        Returns:
+            tuple(numpy.ndarray, int): the indexes, and the number of samples per tile pixel.
+        """
+        tile_pixels = numpy.arange(TILE_SIZE, dtype=numpy.int64) + tile_index * TILE_SIZE
+        if zoom >= self.max_zoom:
+            # Zoomed in: one picture pixel spans over several tile pixels
+            return tile_pixels >> (zoom - self.max_zoom), 1
+        factor = 1 << (self.max_zoom - zoom)
+        samples = min(factor, samples)
+        offsets = (numpy.arange(samples, dtype=numpy.int64) * factor) // samples
+        return ((tile_pixels * factor)[:, None] + offsets[None, :]).ravel(), samples
+
+    def RenderTile(self, zoom, y, x, samples=4):
+        """Returns the pixels of a tile.
+
+        When zoomed out, a tile pixel is the average of up to samples x samples picture pixels.
+
+        Args:
+            zoom(int): the zoom level.
+            y(int): the tile row.
+            x(int): the tile column.
+            samples(int): maximum number of samples per tile pixel, on each axis.
+        Returns:
+            numpy.ndarray: uint8 array of shape (TILE_SIZE, TILE_SIZE).
+        """
+        rows, row_samples = self._GetSampleIndexes(y, zoom, samples)
+        columns, column_samples = self._GetSampleIndexes(x, zoom, samples)
+        pixels = self.GetPixels(rows, columns)
+        if row_samples == 1 and column_samples == 1:
+            return pixels
+        pixels = pixels.reshape(TILE_SIZE, row_samples, TILE_SIZE, column_samples)
+        return pixels.mean(axis=(1, 3), dtype=numpy.float32).astype(numpy.uint8)
+
+
+class OverlayImage:
+    """Colored overlay of a dump picture, showing one value per page (ie. per pixel row)."""
+
+    def __init__(self, page_colors, page_size, splits=8):
+        """Initializes a OverlayImage object.
+
+        Args:
+            page_colors(numpy.ndarray): uint8 array of shape (number of pages, 4), with the RGBA
+                color of each page.
+            page_size(int): length of a page (userdata + oob).
+            splits(int): number of columns.
+        """
+        self.page_colors = page_colors
+        self.page_size = page_size
+        self.splits = splits
+        # Same layout as DumpImage: when the number of pages is not a multiple of splits, a
+        # column does not start at the beginning of a page.
+        self.column_size = len(page_colors) * page_size // splits
+        self.height = self.column_size // page_size
+        self.width = page_size * splits
+        self.max_zoom = max(
+            0, math.ceil(math.log2(max(self.width, self.height, 1) / TILE_SIZE)))
+
+    def RenderTile(self, zoom, y, x):
+        """Returns the pixels of a tile.
+
+        Args:
+            zoom(int): the zoom level.
+            y(int): the tile row.
+            x(int): the tile column.
+        Returns:
+            numpy.ndarray: uint8 array of shape (TILE_SIZE, TILE_SIZE, 4).
+        """
+        tile_pixels = numpy.arange(TILE_SIZE, dtype=numpy.int64)
+        if zoom >= self.max_zoom:
+            rows = (tile_pixels + y * TILE_SIZE) >> (zoom - self.max_zoom)
+            columns = (tile_pixels + x * TILE_SIZE) >> (zoom - self.max_zoom)
+        else:
+            rows = (tile_pixels + y * TILE_SIZE) << (self.max_zoom - zoom)
+            columns = (tile_pixels + x * TILE_SIZE) << (self.max_zoom - zoom)
+        valid_rows = (rows >= 0) & (rows < self.height)
+        valid_columns = (columns >= 0) & (columns < self.width)
+        valid = valid_rows[:, None] & valid_columns[None, :]
+        split, offset_in_page = numpy.divmod(numpy.where(valid_columns, columns, 0), self.page_size)
+        column_offsets = split * self.column_size + offset_in_page
+        row_offsets = numpy.where(valid_rows, rows, 0) * self.page_size
+        pages = (row_offsets[:, None] + column_offsets[None, :]) // self.page_size
+        pixels = numpy.zeros((TILE_SIZE, TILE_SIZE, 4), dtype=numpy.uint8)
+        pixels[valid] = self.page_colors[pages[valid]]
+        return pixels
+
+
+class TileCache:
+    """LRU cache of encoded tiles, optionally backed by a directory.
+
+    Can be used by several threads. Tiles are rendered out of the lock.
+    """
+
+    def __init__(self, render_function, max_tiles=1024, cache_dir=None):
+        """Initializes a TileCache object.
+
+        Args:
+            render_function(callable): called with (zoom, y, x), returns the encoded tile.
+            max_tiles(int): the number of tiles to keep in memory.
+            cache_dir(str): where to store rendered tiles, as {cache_dir}/{z}/{y}/{x}.png.
+        """
+        self.render_function = render_function
+        self.max_tiles = max_tiles
+        self.cache_dir = cache_dir
+        self._tiles = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def GetTilePath(self, zoom, y, x):
+        """Returns the path of a tile in the cache directory, or None."""
+        if not self.cache_dir:
+            return None
+        return os.path.join(self.cache_dir, str(zoom), str(y), '{0:d}.png'.format(x))
+
+    def GetTileSize(self, zoom, y, x):
+        """Returns the size of an encoded tile, without rendering it.
+
+        Args:
+            zoom(int): the zoom level.
+            y(int): the tile row.
+            x(int): the tile column.
+        Returns:
+            int: the size of the tile, or None if it isn't rendered yet.
+        """
+        with self._lock:
+            tile = self._tiles.get((zoom, y, x))
+        if tile is not None:
+            return len(tile)
+        tile_path = self.GetTilePath(zoom, y, x)
+        if tile_path and os.path.isfile(tile_path):
+            return os.stat(tile_path).st_size
+        return None
+
+    def GetTile(self, zoom, y, x):
+        """Returns an encoded tile, rendering it if needed.
+
+        Args:
+            zoom(int): the zoom level.
+            y(int): the tile row.
+            x(int): the tile column.
+        Returns:
+            bytes: the encoded tile.
+        """
+        key = (zoom, y, x)
+        with self._lock:
+            tile = self._tiles.get(key)
+            if tile is not None:
+                self._tiles.move_to_end(key)
+                return tile
+
+        tile_path = self.GetTilePath(zoom, y, x)
+        if tile_path and os.path.isfile(tile_path):
+            with open(tile_path, 'rb') as tile_file:
+                tile = tile_file.read()
+        else:
+            tile = self.render_function(zoom, y, x)
+            if tile_path:
+                os.makedirs(os.path.dirname(tile_path), exist_ok=True)
+                temp_path = '{0:s}.{1:d}-{2:d}.tmp'.format(
+                    tile_path, os.getpid(), threading.get_ident())
+                with open(temp_path, 'wb') as tile_file:
+                    tile_file.write(tile)
+                os.replace(temp_path, tile_path)
+
+        with self._lock:
+            self._tiles[key] = tile
+            while len(self._tiles) > self.max_tiles:
+                self._tiles.popitem(last=False)
+        return tile
+
+
+# DumpImage of a PyramidBuilder worker process
+_worker_image = None
+
+
+def _InitPyramidWorker(dump_path, page_size, splits):
+    global _worker_image  # pylint: disable=global-statement
+    _worker_image = DumpImage(dump_path, page_size, splits=splits)
+
+
+def _WriteTile(output_dir, zoom, y, x, pixels):
+    tile_dir = os.path.join(output_dir, str(zoom), str(y))
+    os.makedirs(tile_dir, exist_ok=True)
+    with open(os.path.join(tile_dir, '{0:d}.png'.format(x)), 'wb') as tile_file:
+        tile_file.write(EncodePNG(pixels))
+
+
+def _RenderBaseRow(output_dir, zoom, y, columns):
+    """Renders a row of tiles of the most detailed zoom level, from the dump."""
+    for x in range(columns):
+        _WriteTile(output_dir, zoom, y, x, _worker_image.RenderTile(zoom, y, x))
+    return columns
+
+
+def _RenderParentRow(output_dir, zoom, y, columns):
+    """Renders a row of tiles by downsampling tiles of the next zoom level."""
+    children = numpy.zeros((TILE_SIZE * 2, TILE_SIZE * 2), dtype=numpy.uint8)
+    for x in range(columns):
+        children.fill(0)
+        for child_y in range(2):
+            for child_x in range(2):
+                child_path = os.path.join(
+                    output_dir, str(zoom + 1), str(y * 2 + child_y),
+                    '{0:d}.png'.format(x * 2 + child_x))
+                if not os.path.isfile(child_path):
+                    continue
+                with open(child_path, 'rb') as child_file:
+                    child = DecodePNG(child_file.read())
+                children[child_y * TILE_SIZE:(child_y + 1) * TILE_SIZE,
+                         child_x * TILE_SIZE:(child_x + 1) * TILE_SIZE] = child
+        pixels = children.reshape((TILE_SIZE, 2, TILE_SIZE, 2)).mean(
+            axis=(1, 3), dtype=numpy.float32).astype(numpy.uint8)
+        _WriteTile(output_dir, zoom, y, x, pixels)
+    return columns
+
+
+class PyramidBuilder:
+    """Builds all tiles of a dump, in a directory viz_http.py can serve.
+
+    The most detailed zoom level is rendered from the memory mapped dump, then every other
+    level is computed from the previous one. Rows of tiles are spread over a pool of processes.
+    """
+
+    def __init__(self, dump_path, page_size, output_dir, splits=8, extra_zoom=1, workers=None):
+        """Initializes a PyramidBuilder object.
+
+        Args:
+            dump_path(str): path to the raw dump.
+            page_size(int): length of a page (userdata + oob).
+            output_dir(str): where to write tiles, as {output_dir}/{z}/{y}/{x}.png.
+            splits(int): number of columns.
+            extra_zoom(int): number of zoom levels to build after the one where one byte is one
+                pixel.
+            workers(int): number of worker processes. Default is the number of CPUs.
+        """
+        self.dump_path = dump_path
+        self.page_size = page_size
+        self.output_dir = output_dir
+        self.splits = splits
+        self.extra_zoom = extra_zoom
+        self.workers = workers
+
+        with DumpImage(dump_path, page_size, splits=splits) as image:
+            self.width = image.width
+            self.height = image.height
+            self.max_zoom = image.max_zoom + extra_zoom
+
+    def GetTileCount(self, zoom):
+        """Returns the number of tiles rows & columns at a zoom level.
+
+        Args:
+            zoom(int): the zoom level.
+        Returns:
+            tuple(int, int): the number of tile rows and columns.
+        """
+        shift = self.max_zoom - self.extra_zoom - zoom
+        if shift >= 0:
+            return (-(-self.height // (TILE_SIZE << shift)),
+                    -(-self.width // (TILE_SIZE << shift)))
+        return (-(-(self.height << -shift) // TILE_SIZE),
+                -(-(self.width << -shift) // TILE_SIZE))
+
+    def GetTotalTiles(self):
+        """Returns the number of tiles the pyramid is made of."""
+        return sum(
+            rows * columns for rows, columns in (
+                self.GetTileCount(zoom) for zoom in range(self.max_zoom + 1)))
+
+    def Build(self, progress_callback=None):
+        """Builds all tiles.
+
+        Args:
+            progress_callback(callable): called with the number of tiles written after each
+                row of tiles.
+        Returns:
+            tuple(int, float): the number of tiles written, and the time it took, in seconds.
+        """
+        start_time = time.monotonic()
+        total_tiles = 0
+        with concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.workers, initializer=_InitPyramidWorker,
+                initargs=(self.dump_path, self.page_size, self.splits)) as executor:
+            for zoom in range(self.max_zoom, -1, -1):
+                render_function = _RenderBaseRow if zoom == self.max_zoom else _RenderParentRow
+                rows, columns = self.GetTileCount(zoom)
+                futures = [
+                    executor.submit(render_function, self.output_dir, zoom, y, columns)
+                    for y in range(rows)]
+                # Each level needs the previous one to be complete.
+                for future in concurrent.futures.as_completed(futures):
+                    tiles_written = future.result()
+                    total_tiles += tiles_written
+                    if progress_callback:
+                        progress_callback(tiles_written)
+        return total_tiles, time.monotonic() - start_time
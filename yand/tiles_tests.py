@@ -0,0 +1,120 @@
+"""Tests for the tiles module."""
+
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+import zlib
+
+import numpy
+
+from yand import tiles
+
+
+class TilesTest(unittest.TestCase):
+    """Tests for the tiles module"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.dump_path = os.path.join(self.temp_dir, 'dump.bin')
+        # 2 columns of 600 pages of 200 bytes.
+        self.data = numpy.random.default_rng(0).integers(
+            0, 256, size=2 * 600 * 200, dtype=numpy.uint8)
+        self.data.tofile(self.dump_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def testRenderTile(self):
+        """Tests DumpImage.RenderTile."""
+        with tiles.DumpImage(self.dump_path, 200, splits=2) as image:
+            self.assertEqual((image.width, image.height), (400, 600))
+            self.assertEqual(image.max_zoom, 2)
+            picture = numpy.zeros((1024, 1024), dtype=numpy.uint8)
+            columns = self.data.reshape(2, 600, 200)
+            picture[:600, :200] = columns[0]
+            picture[:600, 200:400] = columns[1]
+
+            tile = image.RenderTile(2, 1, 0)
+            numpy.testing.assert_array_equal(tile, picture[256:512, 0:256])
+            tile = image.RenderTile(3, 2, 1)
+            numpy.testing.assert_array_equal(
+                tile, picture[256:384, 128:256].repeat(2, axis=0).repeat(2, axis=1))
+            tile = image.RenderTile(1, 0, 0, samples=2)
+            expected = picture[:512, :512].reshape(256, 2, 256, 2).mean(axis=(1, 3))
+            numpy.testing.assert_array_equal(tile, expected.astype(numpy.uint8))
+            tile = image.RenderTile(0, -1, 0)
+            self.assertFalse(tile.any())
+
+    def testOverlayImage(self):
+        """Tests OverlayImage has the layout of DumpImage, with pages not a multiple of splits."""
+        # 9 pages of 10 bytes: the second column starts in the middle of page 4.
+        page_numbers = numpy.arange(9, dtype=numpy.uint8).repeat(10)
+        dump_path = os.path.join(self.temp_dir, 'pages.bin')
+        page_numbers.tofile(dump_path)
+        page_colors = numpy.zeros((9, 4), dtype=numpy.uint8)
+        page_colors[:, 0] = numpy.arange(9)
+        page_colors[:, 3] = 0xFF
+
+        overlay = tiles.OverlayImage(page_colors, 10, splits=2)
+        with tiles.DumpImage(dump_path, 10, splits=2) as image:
+            self.assertEqual((overlay.width, overlay.height), (image.width, image.height))
+            tile = overlay.RenderTile(overlay.max_zoom, 0, 0)
+            numpy.testing.assert_array_equal(
+                tile[..., 0], image.RenderTile(image.max_zoom, 0, 0))
+        self.assertEqual(tuple(tile[0, 10]), (4, 0, 0, 0xFF))
+        self.assertFalse(tile[4:].any())
+
+    def testTileCache(self):
+        """Tests TileCache and EncodePNG."""
+        rendered = []
+        with tiles.DumpImage(self.dump_path, 200, splits=2) as image:
+
+            def _Render(zoom, y, x):
+                rendered.append((zoom, y, x))
+                return tiles.EncodePNG(image.RenderTile(zoom, y, x))
+
+            cache_dir = os.path.join(self.temp_dir, 'tiles')
+            cache = tiles.TileCache(_Render, max_tiles=1, cache_dir=cache_dir)
+            self.assertIsNone(cache.GetTileSize(2, 0, 0))
+            tile = cache.GetTile(2, 0, 0)
+            self.assertEqual(cache.GetTileSize(2, 0, 0), len(tile))
+            self.assertEqual(cache.GetTile(2, 0, 0), tile)
+            cache.GetTile(2, 0, 1)
+            self.assertEqual(cache.GetTile(2, 0, 0), tile)
+            self.assertEqual(rendered, [(2, 0, 0), (2, 0, 1)])
+            self.assertEqual(cache.GetTileSize(2, 0, 1), len(cache.GetTile(2, 0, 1)))
+            self.assertTrue(os.path.isfile(os.path.join(cache_dir, '2', '0', '1.png')))
+
+        self.assertEqual(tile[:8], b'\x89PNG\r\n\x1a\n')
+        length, chunk_type = struct.unpack('>I4s', tile[8:16])
+        self.assertEqual(chunk_type, b'IHDR')
+        self.assertEqual(struct.unpack('>II', tile[16:24]), (256, 256))
+        idat_offset = 16 + length + 4
+        length, chunk_type = struct.unpack('>I4s', tile[idat_offset:idat_offset + 8])
+        self.assertEqual(chunk_type, b'IDAT')
+        rows = numpy.frombuffer(
+            zlib.decompress(tile[idat_offset + 8:idat_offset + 8 + length]),
+            dtype=numpy.uint8).reshape(256, 257)
+        numpy.testing.assert_array_equal(rows[:, 1:201], self.data.reshape(2, 600, 200)[0, :256])
+
+    def testPyramidBuilder(self):
+        """Tests PyramidBuilder and DecodePNG."""
+        output_dir = os.path.join(self.temp_dir, 'tiles')
+        builder = tiles.PyramidBuilder(
+            self.dump_path, 200, output_dir, splits=2, extra_zoom=1, workers=2)
+        self.assertEqual(builder.max_zoom, 3)
+        self.assertEqual(builder.GetTileCount(3), (5, 4))
+        self.assertEqual(builder.GetTileCount(2), (3, 2))
+        self.assertEqual(builder.GetTileCount(0), (1, 1))
+        tiles_count, _ = builder.Build()
+        self.assertEqual(tiles_count, 20 + 6 + 2 + 1)
+        self.assertEqual(tiles_count, builder.GetTotalTiles())
+
+        with tiles.DumpImage(self.dump_path, 200, splits=2) as image:
+            for zoom, y, x in [(3, 4, 3), (2, 1, 1)]:
+                tile_path = os.path.join(output_dir, str(zoom), str(y), '{0:d}.png'.format(x))
+                with open(tile_path, 'rb') as tile_file:
+                    numpy.testing.assert_array_equal(
+                        tiles.DecodePNG(tile_file.read()), image.RenderTile(zoom, y, x))
@@ -0,0 +1,100 @@
+"""Bitwise majority voting over several reads of unstable pages."""
+
+import logging
+
+import numpy
+
+from yand import errors
+
+
+def MajorityVote(reads):
+    """Returns the bitwise majority of several reads of a page.
+
+    Bits with as many 0s as 1s (with an even number of reads) keep the value of the first read.
+
+    Args:
+        reads(list(bytes)): the content of every read of the page.
+    Returns:
+        tuple(bytearray, int): the voted content, and the number of bits which were not the same
+            in every read.
+    """
+    pages = numpy.frombuffer(b''.join(reads), dtype=numpy.uint8).reshape((len(reads), -1))
+    ones = numpy.unpackbits(pages, axis=1).sum(axis=0, dtype=numpy.int32)
+    bits = (2 * ones > len(reads)).astype(numpy.uint8)
+    ties = 2 * ones == len(reads)
+    if ties.any():
+        bits[ties] = numpy.unpackbits(pages[0])[ties]
+    unstable_bits = int(numpy.count_nonzero((ones > 0) & (ones < len(reads))))
+    return bytearray(numpy.packbits(bits).tobytes()), unstable_bits
+
+
+class PageVoter:
+    """Reads unstable pages several times, and keeps the majority of every bit.
+
+    Attributes:
+        instability(dict): for every voted page number, the number of bits which were not the
+            same in every read.
+    """
+
+    def __init__(self, nand, reads=5, double_read=True):
+        """Initializes a PageVoter object.
+
+        Args:
+            nand(NandInterface): the NAND Flash to read from.
+            reads(int): the number of reads to vote on.
+            double_read(bool): whether to read every page twice, to find unstable pages.
+        Raises:
+            errors.YandException: if there are not enough reads for a vote.
+        """
+        if reads < 3:
+            raise errors.YandException('Majority voting needs at least 3 reads')
+        self.nand = nand
+        self.reads = reads
+        self.double_read = double_read
+        self.instability = {}
+        self.logger = logging.getLogger()
+
+    def VotePage(self, page_number, reads=None):
+        """Reads a page until there are enough reads, and votes.
+
+        Args:
+            page_number(int): the page to read.
+            reads(list(bytes)): reads of the page already done.
+        Returns:
+            bytearray: the voted content of the page.
+        """
+        reads = list(reads or [])
+        while len(reads) < self.reads:
+            reads.append(self.nand.ReadPage(page_number))
+        data, unstable_bits = MajorityVote(reads)
+        self.instability[page_number] = unstable_bits
+        self.logger.debug('Page {0:d}: voted over {1:d} reads, {2:d} unstable bits'.format(
+            page_number, len(reads), unstable_bits))
+        return data
+
+    def VoteUnstablePages(self, start_page, data):
+        """Reads consecutive pages again, and votes on the ones which changed.
+
+        Does nothing if double reads are disabled.
+
+        Args:
+            start_page(int): the number of the first page.
+            data(bytearray): the content of the pages, replaced in place by voted content.
+        Returns:
+            list(int): the numbers of the pages voted on.
+        """
+        if not self.double_read:
+            return []
+        page_size = self.nand.page_size
+        count = len(data) // page_size
+        second_data = b''.join(self.nand.ReadPages(start_page, count))
+        first_pages = numpy.frombuffer(data, dtype=numpy.uint8).reshape((count, page_size))
+        second_pages = numpy.frombuffer(second_data, dtype=numpy.uint8).reshape(
+            (count, page_size))
+        unstable_indexes = numpy.flatnonzero((first_pages != second_pages).any(axis=1))
+        for index in unstable_indexes:
+            offset = index * page_size
+            data[offset:offset + page_size] = self.VotePage(
+                start_page + int(index),
+                [data[offset:offset + page_size], second_data[offset:offset + page_size]])
+        return [start_page + int(index) for index in unstable_indexes]
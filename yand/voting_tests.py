@@ -0,0 +1,111 @@
+"""Tests for the voting module."""
+
+import os
+import tempfile
+import unittest
+
+import numpy
+
+from yand import ecc
+from yand import errors
+from yand import test_lib
+from yand import voting
+
+
+class FlakyNand(test_lib.FakeNand):
+    """FakeNand where some bits flip on some reads."""
+
+    def __init__(self, pages, flaky_bits):
+        """Initializes a FlakyNand object.
+
+        Args:
+            pages(numpy.ndarray): the content of the pages.
+            flaky_bits(dict): for a page number, a list of (byte offset, mask) to XOR the
+                page with, one per read, in turn.
+        """
+        super().__init__(pages.shape[1], len(pages), 1, data=pages)
+        self.flaky_bits = flaky_bits
+        self.reads = {}
+
+    def ReadPage(self, page_number):
+        """Returns the content of a page."""
+        page = super().ReadPage(page_number)
+        read = self.reads.get(page_number, 0)
+        self.reads[page_number] = read + 1
+        flips = self.flaky_bits.get(page_number)
+        if flips:
+            offset, mask = flips[read % len(flips)]
+            page[offset] ^= mask
+        return page
+
+
+class VotingTest(unittest.TestCase):
+    """Tests for the voting module"""
+
+    def testMajorityVote(self):
+        """Tests MajorityVote."""
+        data, unstable_bits = voting.MajorityVote([b'\x0f\x00', b'\x0e\x01', b'\x0b\x00'])
+        self.assertEqual(data, b'\x0f\x00')
+        self.assertEqual(unstable_bits, 3)
+
+        data, unstable_bits = voting.MajorityVote([b'\x01', b'\x02', b'\x03', b'\x00'])
+        self.assertEqual(data, b'\x01')
+        self.assertEqual(unstable_bits, 2)
+
+        self.assertEqual(voting.MajorityVote([b'ab'] * 3), (b'ab', 0))
+
+        with self.assertRaises(errors.YandException):
+            voting.PageVoter(None, reads=2)
+
+    def testDoubleRead(self):
+        """Tests voting on pages which read differently twice."""
+        pages = numpy.arange(10 * 32, dtype=numpy.uint8).reshape((10, 32))
+        # Page 2 has a bitflip on one read in 3, page 7 on the fifth read only.
+        nand = FlakyNand(pages, {2: [(1, 0x10), (0, 0), (0, 0)], 7: [(0, 0)] * 4 + [(3, 0x01)]})
+        voter = voting.PageVoter(nand, reads=5)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            dump_path = os.path.join(temp_dir, 'dump.bin')
+            nand.DumpFlashToFile(dump_path, page_voter=voter)
+            with open(dump_path, 'rb') as dump_file:
+                self.assertEqual(dump_file.read(), pages.tobytes())
+        self.assertEqual(voter.instability, {2: 1})
+        self.assertEqual(nand.reads[2], 5)
+        self.assertEqual(nand.reads[7], 2)
+        self.assertEqual(nand.reads[0], 2)
+
+    def testEccFailure(self):
+        """Tests voting on pages with uncorrectable ECC errors."""
+        engine = ecc.EccEngine.FromString('hamming', 256 + 8, 8)
+        pages = numpy.full((4, 256 + 8), 0xFF, dtype=numpy.uint8)
+        pages[:, :256] = numpy.random.default_rng(0).integers(
+            0, 256, (4, 256), dtype=numpy.uint8)
+        pages[:, -3:] = engine.scheme.CalculateEcc(pages[:, :256])
+        # Page 1 reads with 2 bitflips first, then has a bitflip on one read in 3.
+        nand = FlakyNand(pages, {1: [(10, 0x81), (0, 0), (10, 0x01), (0, 0)]})
+        voter = voting.PageVoter(nand, reads=3, double_read=False)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            dump_path = os.path.join(temp_dir, 'dump.bin')
+            self.assertEqual(
+                nand.DumpFlashToFile(dump_path, ecc_engine=engine, page_voter=voter), 0)
+            with open(dump_path, 'rb') as dump_file:
+                self.assertEqual(dump_file.read(), pages.tobytes())
+        self.assertEqual(voter.instability, {1: 1})
+        self.assertEqual(nand.reads, {0: 1, 1: 4, 2: 1, 3: 1})
+
+    def testEccFailureAfterVote(self):
+        """Tests pages still uncorrectable after a vote are not voted on again."""
+        engine = ecc.EccEngine.FromString('hamming', 256 + 8, 8)
+        pages = numpy.full((2, 256 + 8), 0xFF, dtype=numpy.uint8)
+        pages[:, :256] = numpy.random.default_rng(0).integers(
+            0, 256, (2, 256), dtype=numpy.uint8)
+        pages[:, -3:] = engine.scheme.CalculateEcc(pages[:, :256])
+        # Page 1 reads with 2 bitflips twice in 3, so the voted page is uncorrectable.
+        nand = FlakyNand(pages, {1: [(10, 0x81), (0, 0), (10, 0x81)]})
+        voter = voting.PageVoter(nand, reads=3)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            dump_path = os.path.join(temp_dir, 'dump.bin')
+            with self.assertLogs(level='WARNING'):
+                self.assertEqual(
+                    nand.DumpFlashToFile(dump_path, ecc_engine=engine, page_voter=voter), 1)
+        self.assertEqual(voter.instability, {1: 2})
+        self.assertEqual(nand.reads, {0: 2, 1: 3})